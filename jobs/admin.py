@@ -0,0 +1,16 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'kind', 'status', 'attempts', 'run_at',
+                    'locked_by', 'finished')
+    list_filter = ('status', 'kind')
+    search_fields = ('kind',)
+    readonly_fields = ('locked_by', 'locked_until', 'last_error', 'created',
+                       'finished')
+    empty_value_display = '-пусто-'
+
+
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from .queue import enqueue
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """Почтовый бэкенд, который не отправляет письма, а ставит задачу
+    jobs.send_email. Письмо уходит из воркера через JOBS_EMAIL_BACKEND.
+
+    Письма с вложениями в JSON не укладываются и отправляются сразу.
+    """
+
+    def send_messages(self, email_messages):
+        sent = 0
+        direct = []
+        for message in email_messages:
+            if message.attachments:
+                direct.append(message)
+                continue
+            enqueue('jobs.send_email', messages=[serialize(message)])
+            sent += 1
+        if direct:
+            connection = get_connection(settings.JOBS_EMAIL_BACKEND,
+                                        fail_silently=self.fail_silently)
+            sent += connection.send_messages(direct) or 0
+        return sent
+
+
+def serialize(message):
+    return {
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': message.to,
+        'cc': message.cc,
+        'bcc': message.bcc,
+        'reply_to': message.reply_to,
+        'headers': message.extra_headers,
+        'alternatives': getattr(message, 'alternatives', []),
+    }
@@ -0,0 +1,105 @@
+import os
+import signal
+import socket
+import time
+from concurrent.futures import (BrokenExecutor, ProcessPoolExecutor,
+                                ThreadPoolExecutor)
+from multiprocessing import get_context
+
+from django.core.management.base import BaseCommand
+
+from jobs.pool import run_in_pool, setup_process
+from jobs.queue import claim, schedule_periodic
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди jobs.Job.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=4,
+            help='Размер пула: сколько задач выполнять одновременно.'
+        )
+        parser.add_argument(
+            '--pool', choices=('thread', 'process'), default='thread',
+            help='Пул потоков для задач с вводом-выводом или пул '
+                 'процессов для задач, нагружающих процессор.'
+        )
+        parser.add_argument(
+            '--lease', type=int, default=300,
+            help='Через сколько секунд зависшую задачу заберёт другой '
+                 'воркер.'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Пауза в секундах, если очередь пуста.'
+        )
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Выйти, когда очередь опустеет.'
+        )
+
+    def make_pool(self, options):
+        if options['pool'] == 'process':
+            # spawn, а не fork: дочерние процессы не должны наследовать
+            # открытые соединения с БД родителя
+            return ProcessPoolExecutor(
+                options['concurrency'],
+                mp_context=get_context('spawn'),
+                initializer=setup_process,
+            )
+        return ThreadPoolExecutor(options['concurrency'])
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        pool = self.make_pool(options)
+
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.stdout.write(f'Воркер {worker_id} запущен')
+        for scheduled in schedule_periodic():
+            self.stdout.write(f'Запланирована задача {scheduled}')
+
+        running = set()
+        done = 0
+        try:
+            while not self.stopping:
+                if self.reap(running):
+                    # Процесс пула умер (OOM, сигнал): пул больше не
+                    # принимает задачи. Его задачи заберут после аренды
+                    pool.shutdown(wait=False)
+                    pool = self.make_pool(options)
+                    running.clear()
+                    self.stderr.write('Пул воркера пересоздан')
+                free = concurrency - len(running)
+                claimed = []
+                if free:
+                    claimed = claim(worker_id, free, options['lease'])
+                for pk in claimed:
+                    running.add(pool.submit(run_in_pool, pk, worker_id))
+                done += len(claimed)
+                if claimed:
+                    continue
+                if options['burst'] and not running:
+                    break
+                time.sleep(options['poll_interval'])
+        finally:
+            pool.shutdown()
+        self.stdout.write(self.style.SUCCESS(
+            f'Воркер {worker_id} остановлен, взято задач: {done}'))
+
+    def reap(self, running):
+        """Убирает завершённые задачи из running; True, если пул сломан."""
+        broken = False
+        for future in [f for f in running if f.done()]:
+            running.discard(future)
+            if future.exception() is not None:
+                self.stderr.write(
+                    f'Сбой пула воркера: {future.exception()!r}')
+                broken |= isinstance(future.exception(), BrokenExecutor)
+        return broken
+
+    def stop(self, signum, frame):
+        self.stopping = True
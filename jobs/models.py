@@ -0,0 +1,73 @@
+import json
+
+from django.db import models
+from django.db.models import Q
+
+
+class JobQuerySet(models.QuerySet):
+    def claimable(self, now):
+        """Задачи, которые можно взять в работу: ждущие своего времени
+        и зависшие, у которых истекла аренда."""
+        return self.filter(
+            Q(status=Job.QUEUED, run_at__lte=now)
+            | Q(status=Job.RUNNING, locked_until__lt=now)
+        )
+
+
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    kind = models.CharField(max_length=100,
+                            verbose_name='Тип задачи')
+    payload = models.TextField(default='{}',
+                               verbose_name='Аргументы (JSON)')
+    status = models.CharField(max_length=10,
+                              choices=STATUS_CHOICES,
+                              default=QUEUED,
+                              verbose_name='Статус')
+    attempts = models.PositiveIntegerField(default=0,
+                                           verbose_name='Попыток')
+    max_attempts = models.PositiveIntegerField(default=5,
+                                               verbose_name='Максимум '
+                                                            'попыток')
+    run_at = models.DateTimeField(verbose_name='Запустить не раньше')
+    locked_by = models.CharField(max_length=100,
+                                 blank=True,
+                                 verbose_name='Воркер')
+    locked_until = models.DateTimeField(blank=True,
+                                        null=True,
+                                        verbose_name='Аренда до')
+    last_error = models.TextField(blank=True,
+                                  verbose_name='Последняя ошибка')
+    created = models.DateTimeField(auto_now_add=True,
+                                   verbose_name='Дата создания')
+    finished = models.DateTimeField(blank=True,
+                                    null=True,
+                                    verbose_name='Дата завершения')
+
+    objects = JobQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['run_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at'],
+                         name='job_status_run_at_idx'),
+            models.Index(fields=['kind', 'status'],
+                         name='job_kind_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} #{self.pk}'
+
+    @property
+    def kwargs(self):
+        return json.loads(self.payload)
@@ -0,0 +1,27 @@
+"""Точки входа для пула воркера.
+
+Модуль не импортирует модели на верхнем уровне: процессы пула
+запускаются через spawn и импортируют его до django.setup().
+"""
+import os
+
+
+def setup_process():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    import django
+    django.setup()
+
+
+def run_in_pool(pk, worker_id=None):
+    """Запуск задачи в потоке или процессе пула.
+
+    У каждого потока своё соединение с БД, поэтому после задачи его
+    закрываем, чтобы простаивающий пул не держал открытые соединения.
+    """
+    from django.db import connections
+
+    from .queue import run_job
+    try:
+        return run_job(pk, worker_id)
+    finally:
+        connections.close_all()
@@ -0,0 +1,181 @@
+import json
+import logging
+import random
+import traceback
+from collections import Counter, namedtuple
+from datetime import timedelta
+
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY = 60 * 60
+
+Handler = namedtuple('Handler',
+                     'func concurrency max_attempts retry_delay every')
+
+registry = {}
+
+
+def job(kind, concurrency=None, max_attempts=5, retry_delay=30, every=None):
+    """Регистрирует функцию как обработчик задач типа kind.
+
+    concurrency ограничивает число одновременно выполняемых задач этого
+    типа по всем воркерам, retry_delay - базовая задержка перед повтором,
+    которая удваивается с каждой неудачной попыткой. Задача с every
+    периодическая: после завершения она сама ставится снова через every
+    секунд, а воркер при старте ставит её, если в очереди её нет.
+    """
+    def decorator(func):
+        registry[kind] = Handler(func, concurrency, max_attempts,
+                                 retry_delay, every)
+        return func
+    return decorator
+
+
+def enqueue(kind, run_at=None, **kwargs):
+    """Ставит задачу в очередь; аргументы должны сериализоваться в JSON."""
+    handler = registry.get(kind)
+    return Job.objects.create(
+        kind=kind,
+        payload=json.dumps(kwargs),
+        run_at=run_at or timezone.now(),
+        max_attempts=handler.max_attempts if handler else 5,
+    )
+
+
+def schedule_periodic():
+    """Ставит в очередь периодические задачи, которых там ещё нет."""
+    scheduled = []
+    for kind, handler in registry.items():
+        if handler.every is None:
+            continue
+        pending = Job.objects.filter(
+            kind=kind, status__in=(Job.QUEUED, Job.RUNNING)).exists()
+        if not pending:
+            scheduled.append(enqueue(kind))
+    return scheduled
+
+
+def saturated_kinds(now):
+    """Типы задач, для которых уже выбран лимит одновременных запусков."""
+    running = Job.objects.filter(
+        status=Job.RUNNING, locked_until__gte=now
+    ).values('kind').annotate(total=Count('pk')).order_by()
+    counts = Counter({row['kind']: row['total'] for row in running})
+    return counts, {
+        kind for kind, total in counts.items()
+        if kind in registry and registry[kind].concurrency is not None
+        and total >= registry[kind].concurrency
+    }
+
+
+def claim(worker_id, limit, lease):
+    """Забирает до limit задач под аренду на lease секунд.
+
+    Каждая задача захватывается условным UPDATE, поэтому два воркера не
+    получат одну и ту же задачу: проигравший просто увидит 0 обновлённых
+    строк. Лимит по типу задач мягкий - гонка между воркерами может
+    ненадолго превысить его на единицу.
+    """
+    now = timezone.now()
+    running, saturated = saturated_kinds(now)
+    candidates = Job.objects.claimable(now).exclude(
+        kind__in=saturated
+    ).order_by('run_at', 'pk').values_list('pk', 'kind')[:limit * 4]
+    claimed = []
+    for pk, kind in candidates:
+        if len(claimed) >= limit:
+            break
+        handler = registry.get(kind)
+        if (handler and handler.concurrency is not None
+                and running[kind] >= handler.concurrency):
+            continue
+        updated = Job.objects.claimable(now).filter(pk=pk).update(
+            status=Job.RUNNING,
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=lease),
+            attempts=F('attempts') + 1,
+        )
+        if updated:
+            claimed.append(pk)
+            running[kind] += 1
+    return claimed
+
+
+def retry_delay(handler, attempts):
+    base = handler.retry_delay if handler else 30
+    delay = min(base * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+    return delay * random.uniform(0.9, 1.1)
+
+
+def run_job(pk, worker_id=None):
+    """Выполняет захваченную задачу и записывает результат: DONE,
+    QUEUED с отложенным повтором или FAILED после последней попытки.
+
+    Результат записывается, только если аренда всё ещё у этого запуска:
+    задачу, которая выполнялась дольше аренды, мог забрать другой
+    воркер (или этот же - повторно), и тогда результат последнего
+    запуска не должен затирать результат нового. Запуск определяют
+    locked_by и attempts, которые claim увеличивает при каждом захвате.
+    Если аренда потеряна, возвращает None.
+    """
+    current = Job.objects.get(pk=pk)
+    if worker_id is not None and current.locked_by != worker_id:
+        logger.warning('Задача %s уже захвачена воркером %s',
+                       current, current.locked_by)
+        return None
+    leased = Job.objects.filter(pk=pk, locked_by=current.locked_by,
+                                attempts=current.attempts)
+    handler = registry.get(current.kind)
+    try:
+        if handler is None:
+            raise LookupError(f'Нет обработчика для задачи {current.kind}')
+        handler.func(**current.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning('Задача %s завершилась ошибкой', current, exc_info=True)
+        if handler is not None and current.attempts < current.max_attempts:
+            delay = retry_delay(handler, current.attempts)
+            updated = leased.update(
+                status=Job.QUEUED,
+                run_at=timezone.now() + timedelta(seconds=delay),
+                locked_by='',
+                locked_until=None,
+                last_error=error,
+            )
+            return Job.QUEUED if updated else lease_lost(current)
+        updated = leased.update(
+            status=Job.FAILED,
+            finished=timezone.now(),
+            locked_until=None,
+            last_error=error,
+        )
+        if not updated:
+            return lease_lost(current)
+        reschedule(current.kind, handler)
+        return Job.FAILED
+    updated = leased.update(
+        status=Job.DONE,
+        finished=timezone.now(),
+        locked_until=None,
+    )
+    if not updated:
+        return lease_lost(current)
+    reschedule(current.kind, handler)
+    return Job.DONE
+
+
+def lease_lost(current):
+    logger.warning('Аренда задачи %s истекла до завершения, результат '
+                   'не записан', current)
+    return None
+
+
+def reschedule(kind, handler):
+    if handler is not None and handler.every is not None:
+        enqueue(kind,
+                run_at=timezone.now() + timedelta(seconds=handler.every))
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+
+from .queue import job
+
+
+@job('jobs.send_email', concurrency=2, max_attempts=8, retry_delay=60)
+def send_email(messages):
+    """Отправляет письма через настоящий бэкенд одним соединением."""
+    connection = get_connection(settings.JOBS_EMAIL_BACKEND)
+    emails = []
+    for data in messages:
+        alternatives = data.pop('alternatives', [])
+        email = EmailMultiAlternatives(connection=connection, **data)
+        for content, mimetype in alternatives:
+            email.attach_alternative(content, mimetype)
+        emails.append(email)
+    connection.send_messages(emails)
@@ -0,0 +1,151 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core import mail
+from django.core.mail import EmailMultiAlternatives
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import (claim, enqueue, job, registry, run_job,
+                        schedule_periodic)
+
+calls = []
+
+
+@job('tests.record', concurrency=1, max_attempts=2, retry_delay=10)
+def record(value):
+    calls.append(value)
+
+
+@job('tests.broken', max_attempts=2)
+def broken():
+    raise ValueError('сломалось')
+
+
+@job('tests.periodic', every=60)
+def periodic():
+    calls.append('periodic')
+
+
+class QueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_enqueue_claim_and_run(self):
+        """Задача из очереди захватывается и выполняется."""
+        created = enqueue('tests.record', value=1)
+        self.assertEqual(claim('w1', 10, lease=60), [created.pk])
+        self.assertEqual(run_job(created.pk), Job.DONE)
+        self.assertEqual(calls, [1])
+        self.assertEqual(Job.objects.get(pk=created.pk).status, Job.DONE)
+
+    def test_claimed_job_is_not_claimed_twice(self):
+        """Захваченную задачу не получит другой воркер, пока жива аренда."""
+        enqueue('tests.broken')
+        self.assertEqual(len(claim('w1', 10, lease=60)), 1)
+        self.assertEqual(claim('w2', 10, lease=60), [])
+
+    def test_expired_lease_is_reclaimed(self):
+        """Задачу с истёкшей арендой забирает другой воркер."""
+        created = enqueue('tests.broken')
+        claim('w1', 10, lease=60)
+        Job.objects.filter(pk=created.pk).update(
+            locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(claim('w2', 10, lease=60), [created.pk])
+        self.assertEqual(Job.objects.get(pk=created.pk).attempts, 2)
+
+    def test_concurrency_limit_per_kind(self):
+        """Одновременно выполняется не больше concurrency задач типа."""
+        enqueue('tests.record', value=1)
+        enqueue('tests.record', value=2)
+        enqueue('tests.broken')
+        claimed = Job.objects.filter(pk__in=claim('w1', 10, lease=60))
+        self.assertEqual(
+            sorted(claimed.values_list('kind', flat=True)),
+            ['tests.broken', 'tests.record']
+        )
+
+    def test_failed_job_is_retried_with_backoff_then_failed(self):
+        """Упавшая задача повторяется позже, а после лимита - FAILED."""
+        created = enqueue('tests.broken')
+        claim('w1', 10, lease=60)
+        self.assertEqual(run_job(created.pk), Job.QUEUED)
+        retried = Job.objects.get(pk=created.pk)
+        self.assertGreater(retried.run_at, timezone.now())
+        self.assertIn('сломалось', retried.last_error)
+
+        Job.objects.filter(pk=created.pk).update(run_at=timezone.now())
+        claim('w1', 10, lease=60)
+        self.assertEqual(run_job(created.pk), Job.FAILED)
+
+    def test_run_after_lost_lease_does_not_overwrite_result(self):
+        """Запуск, у которого истекла аренда, не записывает результат
+        поверх нового захвата той же задачи."""
+        created = enqueue('tests.record', value=1)
+        claim('w1', 10, lease=60)
+
+        def reclaimed(value):
+            Job.objects.filter(pk=created.pk).update(
+                locked_until=timezone.now() - timedelta(seconds=1))
+            claim('w2', 10, lease=60)
+
+        with mock.patch.dict('jobs.queue.registry', {
+                'tests.record': registry['tests.record']._replace(
+                    func=reclaimed)}):
+            self.assertIsNone(run_job(created.pk, 'w1'))
+        stale = Job.objects.get(pk=created.pk)
+        self.assertEqual(stale.status, Job.RUNNING)
+        self.assertEqual(stale.locked_by, 'w2')
+        self.assertEqual(run_job(created.pk, 'w2'), Job.DONE)
+
+    def test_job_claimed_by_other_worker_is_not_run(self):
+        created = enqueue('tests.record', value=1)
+        claim('w2', 10, lease=60)
+        self.assertIsNone(run_job(created.pk, 'w1'))
+        self.assertEqual(calls, [])
+
+    def test_periodic_job_is_scheduled_once_and_rescheduled(self):
+        """Периодическая задача ставится один раз и после запуска снова."""
+        schedule_periodic()
+        schedule_periodic()
+        periodic_jobs = Job.objects.filter(kind='tests.periodic')
+        self.assertEqual(periodic_jobs.count(), 1)
+        pk = periodic_jobs.get().pk
+        Job.objects.filter(pk=pk).update(status=Job.RUNNING)
+        run_job(pk)
+        following = periodic_jobs.get(status=Job.QUEUED)
+        self.assertGreater(following.run_at, timezone.now())
+
+    @override_settings(
+        EMAIL_BACKEND='jobs.backends.QueuedEmailBackend',
+        JOBS_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    )
+    def test_email_is_queued_and_sent_by_worker(self):
+        """Письмо ставится в очередь и уходит при выполнении задачи."""
+        message = EmailMultiAlternatives('Тема', 'Текст', to=['a@yatube.ru'])
+        message.attach_alternative('<p>Текст</p>', 'text/html')
+        message.send()
+        self.assertEqual(len(mail.outbox), 0)
+        queued = Job.objects.get(kind='jobs.send_email')
+        claim('w1', 10, lease=60)
+        self.assertEqual(run_job(queued.pk), Job.DONE)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+
+
+class WorkerCommandTest(TransactionTestCase):
+    def test_worker_burst_drains_queue(self):
+        """manage.py worker --burst выполняет задачи и выходит."""
+        calls.clear()
+        for value in range(3):
+            enqueue('tests.record', value=value)
+        with mock.patch('signal.signal'):
+            call_command('worker', burst=True, poll_interval=0.01,
+                         stdout=StringIO())
+        self.assertEqual(
+            sorted(call for call in calls if call != 'periodic'), [0, 1, 2])
+        self.assertFalse(Job.objects.filter(kind='tests.record').exclude(
+            status=Job.DONE).exists())
@@ -0,0 +1,75 @@
+import os
+import sys
+from collections import Counter, defaultdict
+
+from django.db import connection
+
+from yatube.slow_queries import call_site, template_stack
+from yatube.timing import fingerprint
+
+PERF_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class QueryRecorder:
+    """Записывает запросы к БД внутри блока with вместе с местом вызова
+    и стеком шаблонов, из которого они пришли.
+
+        with QueryRecorder() as recorder:
+            client.get(url)
+        recorder.counts  # Counter отпечатков SQL
+    """
+
+    def __init__(self, using=connection):
+        self.connection = using
+        self.counts = Counter()
+        self.samples = {}
+        self.stacks = defaultdict(Counter)
+
+    def __enter__(self):
+        self._wrapper = self.connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._wrapper.__exit__(*exc_info)
+
+    def __call__(self, execute, sql, params, many, context):
+        key = fingerprint(sql)
+        self.counts[key] += 1
+        self.samples.setdefault(key, sql)
+        frame = sys._getframe(1)
+        self.stacks[key][(call_site(frame, skip=(PERF_DIR,)),
+                          tuple(template_stack(frame)))] += 1
+        return execute(sql, params, many, context)
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+
+def growth(small, large):
+    """Запросы, число которых выросло вместе с данными.
+
+    Разовый запрос, появившийся только на большом наборе (например,
+    проверка «есть ли следующая страница»), ростом не считается:
+    подозрителен лишь отпечаток, выполненный больше одного раза и чаще,
+    чем на малом наборе, - это и есть N+1.
+    """
+    return {
+        key: (small.counts.get(key, 0), count)
+        for key, count in large.counts.items()
+        if count > max(small.counts.get(key, 0), 1)
+    }
+
+
+def format_report(name, small, large):
+    """Текст для сообщения об ошибке: SQL и стеки шаблонов каждого N+1."""
+    lines = [f'{name}: {small.total} запросов на малом наборе, '
+             f'{large.total} на большом']
+    for key, (before, after) in growth(small, large).items():
+        lines.append(f'  {after} раз (было {before}): {large.samples[key]}')
+        for (site, stack), count in large.stacks[key].most_common(3):
+            lines.append(f'    x{count} {site}')
+            for entry in stack:
+                lines.append(f'      {entry}')
+    return '\n'.join(lines)
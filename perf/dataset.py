@@ -0,0 +1,171 @@
+"""Синтетический набор данных с перекосами, как на живом сайте.
+
+Все случайные решения принимает один random.Random(seed), поэтому при
+одинаковых параметрах получаются одни и те же строки. Модели
+импортируются внутри функций: hash_passwords выполняется в процессах
+пула, которые при запуске через spawn импортируют модуль до
+django.setup().
+"""
+import itertools
+from contextlib import contextmanager
+from datetime import timedelta
+
+WORDS = (
+    'сегодня вчера город утро вечер дорога книга море лес дом друг '
+    'работа кофе музыка фильм поезд дождь снег солнце проект идея '
+    'встреча письмо фото кот собака весна осень лето зима мост река '
+    'история вопрос ответ план путь поле небо окно сад'
+).split()
+
+# Префиксы только для имён: созданный набор учитывается в
+# perf.models.SeededObject
+USERNAME_PREFIX = 'seed'
+GROUP_PREFIX = 'seed-group-'
+
+
+def power_law_weights(count, exponent, rng):
+    """Веса 1 / rank^exponent, разложенные по случайной перестановке:
+    популярны не первые по pk, а случайные объекты."""
+    ranks = list(range(1, count + 1))
+    rng.shuffle(ranks)
+    return [1 / rank ** exponent for rank in ranks]
+
+
+def sampler(population, weights, rng):
+    """Функция выбора k элементов с возвращением по весам."""
+    cumulative = list(itertools.accumulate(weights))
+
+    def sample(k=1):
+        return rng.choices(population, cum_weights=cumulative, k=k)
+    return sample
+
+
+def sentence(rng, low=5, high=30):
+    return ' '.join(rng.choice(WORDS)
+                    for _ in range(rng.randint(low, high))).capitalize()
+
+
+def hash_passwords(items):
+    """Хеширует пары (пароль, соль); вызывается в процессах пула."""
+    from django.contrib.auth.hashers import make_password
+    return [make_password(password, salt) for password, salt in items]
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Даёт записать свои значения в поля auto_now_add: bulk_create
+    иначе заменит их текущим временем."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Plan:
+    """Строки будущего набора данных без обращения к БД.
+
+    Пользователи, группы и записи нумеруются по порядку вставки, внешние
+    ключи хранятся как эти номера и превращаются в pk после bulk_create.
+    """
+
+    def __init__(self, rng, end, users, groups, posts, comments,
+                 follows, skew=1.2, days=365, ungrouped=0.2,
+                 hot_posts=0.02, burst_share=0.5):
+        self.rng = rng
+        self.end = end
+        self.users = [
+            {'username': f'{USERNAME_PREFIX}{i:06d}',
+             'salt': f'{rng.getrandbits(64):016x}',
+             'date_joined': end - timedelta(days=days + rng.random() * 30)}
+            for i in range(users)
+        ]
+        self.groups = [
+            {'title': f'Сообщество {i}', 'slug': f'{GROUP_PREFIX}{i}',
+             'description': sentence(rng)}
+            for i in range(groups)
+        ]
+        popularity = power_law_weights(users, skew, rng)
+        pick_author = sampler(range(users), popularity, rng)
+        pick_group = sampler(range(groups),
+                             power_law_weights(groups, skew, rng), rng)
+
+        self.posts = sorted(
+            ({'author': pick_author()[0],
+              'group': (pick_group()[0]
+                        if groups and rng.random() >= ungrouped else None),
+              'text': sentence(rng),
+              'pub_date': end - timedelta(seconds=rng.random() * days
+                                          * 86400),
+              'comment_count': 0}
+             for _ in range(posts)),
+            key=lambda post: post['pub_date']
+        )
+        self.follows = self.plan_follows(users, follows, pick_author)
+        self.comments = self.plan_comments(
+            users, comments, hot_posts, burst_share)
+
+    def plan_follows(self, users, mean, pick_author):
+        """Число подписок у пользователя распределено экспоненциально,
+        а выбор авторов - по степенному закону популярности, поэтому у
+        немногих авторов оказывается большинство подписчиков."""
+        follows = []
+        for user in range(users):
+            want = min(users - 1, int(self.rng.expovariate(1 / mean))
+                       if mean else 0)
+            chosen = {}
+            for _ in range(4):
+                if len(chosen) >= want:
+                    break
+                for author in pick_author(want * 2):
+                    if author != user:
+                        chosen.setdefault(author, None)
+            follows.extend((user, author)
+                           for author in itertools.islice(chosen, want))
+        return follows
+
+    def plan_comments(self, users, count, hot_posts, burst_share):
+        """Часть комментариев приходится на всплески под немногими
+        «горячими» записями в первые часы после публикации, остальные
+        размазаны по записям с экспоненциальной задержкой."""
+        if not self.posts or not users:
+            return []
+        rng = self.rng
+        hot = rng.sample(range(len(self.posts)),
+                         max(1, int(len(self.posts) * hot_posts)))
+        comments = []
+        for _ in range(count):
+            if rng.random() < burst_share:
+                index = rng.choice(hot)
+                delay = rng.random() * 7200
+            else:
+                index = rng.randrange(len(self.posts))
+                delay = rng.expovariate(1 / 86400)
+            post = self.posts[index]
+            created = min(post['pub_date'] + timedelta(seconds=delay),
+                          self.end)
+            post['comment_count'] += 1
+            comments.append({'post': index,
+                             'author': rng.randrange(users),
+                             'text': sentence(rng, 2, 20),
+                             'created': created})
+        comments.sort(key=lambda comment: comment['created'])
+        return comments
+
+
+def chunked(items, size):
+    iterator = iter(items)
+    return iter(lambda: list(itertools.islice(iterator, size)), [])
+
+
+def follower_percentiles(counts, points=(50, 90, 99, 100)):
+    """Перцентили числа подписчиков для сводки команды."""
+    counts = sorted(counts)
+    if not counts:
+        return {point: 0 for point in points}
+    return {
+        point: counts[min(len(counts) - 1, point * len(counts) // 100)]
+        for point in points
+    }
@@ -0,0 +1,312 @@
+"""Нагрузочный прогон страниц Yatube.
+
+Сервер - WSGI-приложение Django в потоках этого же процесса (или
+внешний адрес), клиенты - потоки со своими cookie, которые ходят по
+маршрутам в заданной пропорции. Число запросов к БД сервер отдаёт в
+заголовке X-Queries, поэтому для внешнего сервера оно неизвестно.
+
+Приложение в процессе работает с текущим DEBUG: для замеров как в
+продакшене запускайте команды с переменной окружения DEBUG=0.
+"""
+import http.client
+import json
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY
+from django.contrib.auth import SESSION_KEY
+from django.core.servers.basehttp import ThreadedWSGIServer
+from django.core.servers.basehttp import WSGIRequestHandler
+from django.db import connections
+from django.urls import reverse
+
+QUERIES_HEADER = 'X-Queries'
+MIN_SAMPLES = 20
+# Разовые запросы зависят от данных (есть ли следующая страница
+# комментариев), поэтому максимум может колебаться на один
+QUERY_SLACK = 1
+# DEBUG копит все SQL в connection.queries и включает debug toolbar для
+# 127.0.0.1 - замер приложения в процессе был бы не о том
+DEBUG_WARNING = ('DEBUG включён: замеры включают накладные расходы debug '
+                 'toolbar, запустите команду с DEBUG=0.')
+CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+# Доли маршрутов по умолчанию; анонимные клиенты ходят только туда,
+# где не нужен вход
+DEFAULT_MIX = {
+    'index': 40, 'profile': 15, 'post': 20, 'follow_index': 15,
+    'new_post': 5, 'add_comment': 5,
+}
+LOGIN_REQUIRED = {'follow_index', 'new_post', 'add_comment'}
+
+
+def parse_mix(value):
+    """'index=40,post=20' -> {'index': 40, 'post': 20}."""
+    mix = {}
+    for part in filter(None, value.split(',')):
+        name, _, weight = part.partition('=')
+        if name not in DEFAULT_MIX:
+            raise ValueError(f'Неизвестный маршрут {name!r}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def counting_queries(application):
+    """WSGI-обёртка: число запросов к БД за запрос в X-Queries.
+
+    Считаются запросы ко всем подключениям, включая реплику. Ответ
+    дочитывается до отправки заголовков: у потокового ответа
+    (STREAMING_LISTINGS) записи читаются уже после возврата из view.
+    """
+    def wrapper(environ, start_response):
+        queries = [0]
+        started = []
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        def start(status, headers, exc_info=None):
+            started[:] = [status, headers, exc_info]
+
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(count))
+            result = application(environ, start)
+            try:
+                body = b''.join(result)
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+        status, headers, exc_info = started
+        start_response(status, headers + [(QUERIES_HEADER, str(queries[0]))],
+                       exc_info)
+        return [body]
+    return wrapper
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start_server(application):
+    """Поднимает многопоточный WSGI-сервер на свободном порту."""
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler,
+                                allow_reuse_address=False)
+    server.set_app(application)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def session_cookie(user):
+    """Cookie сессии вошедшего пользователя, как после логина."""
+    from importlib import import_module
+    store = import_module(settings.SESSION_ENGINE).SessionStore()
+    store[SESSION_KEY] = user._meta.pk.value_to_string(user)
+    store[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    store.save()
+    return {settings.SESSION_COOKIE_NAME: store.session_key}
+
+
+class Targets:
+    """Откуда клиенты берут авторов и записи для адресов."""
+
+    def __init__(self, posts):
+        # posts: список (username, post_id)
+        self.posts = posts
+
+    def url(self, route, rng):
+        username, post_id = rng.choice(self.posts)
+        if route == 'profile':
+            return reverse('posts:profile', args=[username])
+        if route == 'post':
+            return reverse('posts:post', args=[username, post_id])
+        if route == 'add_comment':
+            return reverse('posts:add_comment', args=[username, post_id])
+        return reverse(f'posts:{route}')
+
+
+class Client:
+    """Один виртуальный пользователь: свои cookie и CSRF-токен."""
+
+    def __init__(self, base_url, cookies=None):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port
+        self.cookies = dict(cookies or {})
+        self.csrf_token = None
+
+    def request(self, method, path, data=None):
+        """Возвращает (статус, секунды, число запросов к БД или None)."""
+        headers = {}
+        body = None
+        if self.cookies:
+            headers['Cookie'] = '; '.join(
+                f'{key}={value}' for key, value in self.cookies.items())
+        if data is not None:
+            body = urlencode(dict(data,
+                                  csrfmiddlewaretoken=self.csrf_token))
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        started = time.perf_counter()
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            content = response.read()
+        finally:
+            conn.close()
+        elapsed = time.perf_counter() - started
+        for header in response.headers.get_all('Set-Cookie') or ():
+            cookie = SimpleCookie(header)
+            self.cookies.update(
+                (key, morsel.value) for key, morsel in cookie.items())
+        match = CSRF_INPUT.search(content.decode('utf-8', 'replace'))
+        if match:
+            self.csrf_token = match.group(1)
+        queries = response.getheader(QUERIES_HEADER)
+        return (response.status, elapsed,
+                int(queries) if queries is not None else None)
+
+    def visit(self, route, targets, rng):
+        path = targets.url(route, rng)
+        if route == 'new_post':
+            if self.csrf_token is None:
+                self.request('GET', path)
+            return self.request('POST', path, {'text': 'Нагрузочный пост'})
+        if route == 'add_comment':
+            if self.csrf_token is None:
+                self.request('GET', reverse('posts:new_post'))
+            return self.request('POST', path, {'text': 'Комментарий'})
+        return self.request('GET', path)
+
+
+def plan_clients(clients, sessions, mix, anonymous, seed):
+    """Для каждого клиента: свой генератор, cookie сессии или None и
+    доступные ему маршруты."""
+    master = random.Random(seed)
+    plans = []
+    for number in range(clients):
+        rng = random.Random(master.random())
+        cookies = None
+        if sessions and rng.random() >= anonymous:
+            cookies = sessions[number % len(sessions)]
+        routes = [route for route in mix
+                  if cookies or route not in LOGIN_REQUIRED]
+        plans.append((rng, cookies, routes))
+    return plans
+
+
+def run(base_url, targets, sessions, mix, clients, seconds,
+        anonymous=0.5, seed=None):
+    """Гоняет clients потоков seconds секунд; возвращает сырые замеры
+    по маршрутам: список (статус, секунды, запросы)."""
+    samples = defaultdict(list)
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def client(rng, cookies, routes):
+        if not routes:
+            return
+        weights = [mix[route] for route in routes]
+        local = defaultdict(list)
+        agent = Client(base_url, cookies)
+        while not stop.is_set():
+            route = rng.choices(routes, weights)[0]
+            try:
+                local[route].append(agent.visit(route, targets, rng))
+            except OSError:
+                local[route].append((0, 0.0, None))
+        with lock:
+            for route, values in local.items():
+                samples[route].extend(values)
+
+    threads = [
+        threading.Thread(target=client, args=plan)
+        for plan in plan_clients(clients, sessions, mix, anonymous, seed)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def percentile(values, point):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * point / 100))]
+
+
+def summarize(samples, seconds):
+    """Сводка по маршрутам: p50/p95/p99 в мс, запросов в секунду,
+    среднее число запросов к БД и число ошибок (5xx и сбои сети)."""
+    summary = {}
+    for route, values in sorted(samples.items()):
+        latencies = [elapsed for status, elapsed, _ in values if status]
+        queries = [count for _, _, count in values if count is not None]
+        summary[route] = {
+            'requests': len(values),
+            'rps': len(values) / seconds,
+            'p50': percentile(latencies, 50) * 1000,
+            'p95': percentile(latencies, 95) * 1000,
+            'p99': percentile(latencies, 99) * 1000,
+            'queries': (sum(queries) / len(queries)) if queries else None,
+            'max_queries': max(queries) if queries else None,
+            'errors': sum(1 for status, _, _ in values
+                          if not status or status >= 500),
+        }
+    return summary
+
+
+def compare(summary, baseline, threshold):
+    """Регрессии относительно baseline: p95 вырос или rps упал больше
+    чем на threshold процентов, либо выросло наибольшее число запросов
+    к БД. Среднее число запросов зависит от доли анонимов и попаданий в
+    кеш, поэтому сравнивается максимум; задержки - только при
+    MIN_SAMPLES замерах в обоих прогонах."""
+    regressions = []
+    for route, current in summary.items():
+        before = baseline.get(route)
+        if not before:
+            continue
+        if (before['max_queries'] is not None
+                and current['max_queries'] is not None
+                and current['max_queries']
+                > before['max_queries'] + QUERY_SLACK):
+            regressions.append(f'{route}: запросов к БД до '
+                               f'{before["max_queries"]} -> '
+                               f'{current["max_queries"]}')
+        if min(before['requests'], current['requests']) < MIN_SAMPLES:
+            continue
+        if before['p95'] and (current['p95'] / before['p95'] - 1) * 100 \
+                > threshold:
+            regressions.append(f'{route}: p95 {before["p95"]:.1f} -> '
+                               f'{current["p95"]:.1f} мс')
+        if before['rps'] and (1 - current['rps'] / before['rps']) * 100 \
+                > threshold:
+            regressions.append(f'{route}: {before["rps"]:.1f} -> '
+                               f'{current["rps"]:.1f} запросов/с')
+    return regressions
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as source:
+        return json.load(source)
+
+
+def save_baseline(path, summary):
+    with open(path, 'w', encoding='utf-8') as target:
+        json.dump(summary, target, ensure_ascii=False, indent=2)
@@ -0,0 +1,111 @@
+import json
+
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.base import SessionBase
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import RequestFactory
+from django.urls import reverse
+
+from perf import micro
+from posts.models import Group, Post, User
+
+
+class Command(BaseCommand):
+    help = ('Микробенчмарки страниц: отдельно выполнение запросов, сборка '
+            'контекста, рендер шаблона и его include. Медиана по повторам, '
+            'сравнение с baseline по порогу в процентах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('pages', nargs='*',
+                            help='Какие страницы замерять: '
+                                 f'{", ".join(micro.PAGES)}; по '
+                                 'умолчанию все.')
+        parser.add_argument('--repeat', type=int, default=15)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--baseline', default=None,
+                            help='JSON прошлого прогона для сравнения.')
+        parser.add_argument('--save-baseline', default=None,
+                            help='Куда сохранить результат как baseline.')
+        parser.add_argument('--threshold', type=float, default=15.0,
+                            help='Допустимое замедление составляющей, '
+                                 'в процентах.')
+
+    def handle(self, *args, **options):
+        unknown = set(options['pages']) - set(micro.PAGES)
+        if unknown:
+            raise CommandError(f'Неизвестные страницы: {", ".join(unknown)}')
+        targets = self.targets()
+        results = {'calibration': micro.calibrate(options['repeat']),
+                   'pages': {}}
+        for page in options['pages'] or micro.PAGES:
+            if page not in targets:
+                self.stdout.write(f'{page}: нет данных для страницы, '
+                                  'пропущена')
+                continue
+            view, includes = micro.PAGES[page]
+            path, kwargs = targets[page]
+            request = RequestFactory().get(path)
+            request.user = targets['user']
+            request.session = SessionBase()
+            results['pages'][page] = micro.benchmark(
+                view, request, kwargs, includes,
+                repeat=options['repeat'], warmup=options['warmup'])
+        self.report(results)
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w',
+                      encoding='utf-8') as target:
+                json.dump(results, target, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as source:
+                baseline = json.load(source)
+            regressions = micro.compare(results, baseline,
+                                        options['threshold'])
+            if regressions:
+                raise CommandError('Замедления относительно baseline:\n'
+                                   + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS(
+                'Замедлений относительно baseline нет.'))
+
+    def targets(self):
+        """Самые тяжёлые объекты набора: крупнейшая группа, самый
+        плодовитый автор, самая обсуждаемая запись и пользователь с
+        наибольшим числом подписок. Страницы без данных (group, если
+        групп нет) в словарь не попадают."""
+        post = Post.objects.select_related('author').order_by(
+            '-comment_count', '-pk').first()
+        if post is None:
+            raise CommandError('В базе нет записей: создайте их командой '
+                               'generate_dataset.')
+        group = Group.objects.annotate(total=Count('posts')).order_by(
+            '-total', 'pk').first()
+        author = User.objects.annotate(total=Count('posts')).order_by(
+            '-total', 'pk').first()
+        reader = User.objects.annotate(total=Count('follower')).order_by(
+            '-total', 'pk').first()
+        targets = {
+            'user': reader or AnonymousUser(),
+            'index': (reverse('posts:index'), {}),
+            'follow_index': (reverse('posts:follow_index'), {}),
+            'profile': (reverse('posts:profile', args=[author.username]),
+                        {'username': author.username}),
+            'post': (reverse('posts:post',
+                             args=[post.author.username, post.pk]),
+                     {'username': post.author.username, 'post_id': post.pk}),
+        }
+        if group is not None:
+            targets['group'] = (reverse('posts:group', args=[group.slug]),
+                                {'slug': group.slug})
+        return targets
+
+    def report(self, results):
+        self.stdout.write(f'{"страница":<14}{"составляющая":<26}'
+                          f'{"медиана, мс":>12}{"IQR, мс":>9}')
+        for page, components in results['pages'].items():
+            for component, stats in components.items():
+                self.stdout.write(
+                    f'{page:<14}{component:<26}{stats["median"]:>12.3f}'
+                    f'{stats["iqr"]:>9.3f}')
+        self.stdout.write(f'Эталонная нагрузка: '
+                          f'{results["calibration"]:.3f} мс')
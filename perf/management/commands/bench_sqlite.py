@@ -0,0 +1,147 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from yatube.sqlite.base import DEFAULT_PRAGMAS, apply_pragmas
+
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, author_id INTEGER, '
+    'text TEXT, pub_date REAL)',
+    'CREATE INDEX post_pub_date ON post (pub_date)',
+)
+READ_SQL = ('SELECT id, author_id, text FROM post '
+            'ORDER BY pub_date DESC LIMIT 10')
+WRITE_SQL = 'INSERT INTO post (author_id, text, pub_date) VALUES (?, ?, ?)'
+
+# Как работал проект до профиля: стандартный sqlite3 (журнал DELETE,
+# synchronous=FULL, таймаут 5 секунд), новое соединение на каждый
+# запрос (CONN_MAX_AGE=0) и отложенный BEGIN.
+PROFILES = {
+    'baseline': {'pragmas': {}, 'persistent': False, 'begin': 'BEGIN'},
+    'tuned': {'pragmas': DEFAULT_PRAGMAS, 'persistent': True,
+              'begin': 'BEGIN IMMEDIATE'},
+}
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность SQLite со стандартными '
+            'настройками и с профилем yatube.sqlite при конкурентных '
+            'чтениях и записях.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--write-ratio', type=float, default=0.2,
+                            help='Доля записей среди операций.')
+        parser.add_argument('--rows', type=int, default=10000,
+                            help='Сколько строк создать перед замером.')
+
+    def handle(self, *args, **options):
+        results = {}
+        for name, profile in PROFILES.items():
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                prepare(path, options['rows'])
+                results[name] = run(path, profile, options)
+        self.stdout.write(
+            f'{"профиль":<10}{"оп/с":>10}{"чтений/с":>10}{"записей/с":>11}'
+            f'{"locked":>8}{"p99, мс":>9}')
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<10}{result["ops"]:>10.0f}{result["reads"]:>10.0f}'
+                f'{result["writes"]:>11.0f}{result["locked"]:>8}'
+                f'{result["p99"]:>9.1f}')
+        if results['baseline']['ops']:
+            ratio = results['tuned']['ops'] / results['baseline']['ops']
+            self.stdout.write(self.style.SUCCESS(
+                f'Ускорение пропускной способности: x{ratio:.2f}'))
+
+
+def prepare(path, rows):
+    connection = sqlite3.connect(path)
+    for statement in SCHEMA:
+        connection.execute(statement)
+    now = time.time()
+    connection.executemany(WRITE_SQL, (
+        (i % 100, f'Пост {i}', now - i) for i in range(rows)
+    ))
+    connection.commit()
+    connection.close()
+
+
+def connect(path, profile):
+    connection = sqlite3.connect(path, timeout=5, isolation_level=None,
+                                 check_same_thread=False)
+    apply_pragmas(connection, profile['pragmas'])
+    return connection
+
+
+def operation(connection, profile, rng, options):
+    """Одно чтение ленты или запись поста; возвращает вид операции."""
+    try:
+        if rng.random() >= options['write_ratio']:
+            connection.execute(READ_SQL).fetchall()
+            return 'reads'
+        connection.execute(profile['begin'])
+        connection.execute(READ_SQL).fetchall()
+        connection.execute(WRITE_SQL,
+                           (rng.randrange(100), 'Текст', time.time()))
+        connection.execute('COMMIT')
+        return 'writes'
+    except sqlite3.OperationalError:
+        if connection.in_transaction:
+            connection.execute('ROLLBACK')
+        return 'locked'
+
+
+def run(path, profile, options):
+    stop = threading.Event()
+    lock = threading.Lock()
+    totals = {'reads': 0, 'writes': 0, 'locked': 0}
+    latencies = []
+
+    def client():
+        rng = random.Random()
+        connection = None
+        if profile['persistent']:
+            connection = connect(path, profile)
+        counts = {'reads': 0, 'writes': 0, 'locked': 0}
+        timings = []
+        while not stop.is_set():
+            current = connection or connect(path, profile)
+            started = time.perf_counter()
+            counts[operation(current, profile, rng, options)] += 1
+            timings.append(time.perf_counter() - started)
+            if connection is None:
+                current.close()
+        if connection is not None:
+            connection.close()
+        with lock:
+            for key, value in counts.items():
+                totals[key] += value
+            latencies.extend(timings)
+
+    threads = [threading.Thread(target=client)
+               for _ in range(options['threads'])]
+    for thread in threads:
+        thread.start()
+    time.sleep(options['seconds'])
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    seconds = options['seconds']
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0
+    return {
+        'ops': (totals['reads'] + totals['writes']) / seconds,
+        'reads': totals['reads'] / seconds,
+        'writes': totals['writes'] / seconds,
+        'locked': totals['locked'],
+        'p99': p99 * 1000,
+    }
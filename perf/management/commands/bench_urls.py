@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from perf import micro
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = ('Стоимость адресов одной карточки записи: reverse против '
+            'заранее собранных шаблонов posts.links, в микросекундах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=2000,
+                            help='Карточек в одном прогоне.')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        post = Post.objects.select_related('author', 'group').filter(
+            group__isnull=False).first()
+        if post is None:
+            raise CommandError('В базе нет записей в группах: создайте их '
+                               'командой generate_dataset.')
+        cost = micro.url_cost(post, options['number'], options['repeat'])
+        urls = len(micro.card_urls(post))
+        for label in ('reverse', 'links'):
+            self.stdout.write(f'{label:<8}{cost[label]:>8.1f} мкс на '
+                              f'карточку ({urls} адреса)')
+        self.stdout.write(f'Быстрее в {cost["reverse"] / cost["links"]:.1f} '
+                          'раза.')
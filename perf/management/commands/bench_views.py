@@ -0,0 +1,93 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+from django.db.models import Count
+
+from perf import load
+from posts.models import Post, User
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон страниц: конкурентные анонимные и '
+            'вошедшие клиенты, p50/p95/p99, запросов в секунду и запросов '
+            'к БД на маршрут, сравнение с сохранённым baseline. Пишет в '
+            'БД (new_post, add_comment) - запускайте на копии данных, '
+            'например созданных generate_dataset.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=16)
+        parser.add_argument('--seconds', type=float, default=10.0)
+        parser.add_argument('--mix', type=load.parse_mix,
+                            default=load.DEFAULT_MIX,
+                            help='Доли маршрутов, например '
+                                 '"index=40,post=20,add_comment=5".')
+        parser.add_argument('--anonymous', type=float, default=0.5,
+                            help='Доля анонимных клиентов.')
+        parser.add_argument('--users', type=int, default=50,
+                            help='Сколько пользователей залогинить.')
+        parser.add_argument('--url', default=None,
+                            help='Адрес уже запущенного сервера; без него '
+                                 'приложение поднимается в этом процессе.')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--baseline', default=None,
+                            help='JSON прошлого прогона для сравнения.')
+        parser.add_argument('--save-baseline', default=None,
+                            help='Куда сохранить результат как baseline.')
+        parser.add_argument('--threshold', type=float, default=10.0,
+                            help='Допустимое ухудшение, в процентах.')
+
+    def handle(self, *args, **options):
+        posts = list(Post.objects.order_by('-pub_date').values_list(
+            'author__username', 'pk')[:1000])
+        if not posts:
+            raise CommandError('В базе нет записей: создайте их командой '
+                               'generate_dataset.')
+        # Вошедшие клиенты - самые активные подписчики, чтобы лента
+        # подписок не была пустой
+        users = User.objects.annotate(
+            follows=Count('follower')).order_by('-follows', 'pk')
+        sessions = [load.session_cookie(user)
+                    for user in users[:options['users']]]
+
+        server = None
+        base_url = options['url']
+        if base_url is None:
+            if settings.DEBUG:
+                self.stderr.write(load.DEBUG_WARNING)
+            server, base_url = load.start_server(
+                load.counting_queries(get_wsgi_application()))
+        try:
+            samples = load.run(
+                base_url, load.Targets(posts), sessions, options['mix'],
+                options['clients'], options['seconds'],
+                anonymous=options['anonymous'], seed=options['seed'])
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+        summary = load.summarize(samples, options['seconds'])
+        self.report(summary)
+        if options['save_baseline']:
+            load.save_baseline(options['save_baseline'], summary)
+        if options['baseline']:
+            regressions = load.compare(
+                summary, load.load_baseline(options['baseline']),
+                options['threshold'])
+            if regressions:
+                raise CommandError('Регрессии относительно baseline:\n'
+                                   + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS(
+                'Регрессий относительно baseline нет.'))
+
+    def report(self, summary):
+        self.stdout.write(
+            f'{"маршрут":<14}{"запросов":>9}{"в сек":>8}{"p50, мс":>9}'
+            f'{"p95, мс":>9}{"p99, мс":>9}{"SQL":>6}{"ошибок":>8}')
+        for route, row in summary.items():
+            queries = ('-' if row['queries'] is None
+                       else f'{row["queries"]:.1f}')
+            self.stdout.write(
+                f'{route:<14}{row["requests"]:>9}{row["rps"]:>8.1f}'
+                f'{row["p50"]:>9.1f}{row["p95"]:>9.1f}{row["p99"]:>9.1f}'
+                f'{queries:>6}{row["errors"]:>8}')
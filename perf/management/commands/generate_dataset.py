@@ -0,0 +1,194 @@
+import os
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, time
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from jobs.pool import setup_process
+from perf.dataset import (Plan, chunked, explicit_dates,
+                          follower_percentiles, hash_passwords)
+from perf.models import SeededObject
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class Command(BaseCommand):
+    help = ('Создаёт синтетический набор пользователей, групп, записей, '
+            'комментариев и подписок с перекосами живого сайта. Один и '
+            'тот же --seed даёт одни и те же строки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=30)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=60000)
+        parser.add_argument('--follows', type=float, default=20,
+                            help='Среднее число подписок пользователя.')
+        parser.add_argument('--skew', type=float, default=1.2,
+                            help='Показатель степенного закона '
+                                 'популярности авторов и групп.')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней распределить записи.')
+        parser.add_argument('--end', type=str, default=None,
+                            help='Дата последней записи, YYYY-MM-DD; '
+                                 'по умолчанию сегодня.')
+        parser.add_argument('--password', default='password',
+                            help='Пароль всех созданных пользователей.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Процессов для хеширования паролей; '
+                                 '0 - хешировать в текущем процессе.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--replace', action='store_true',
+                            help='Удалить ранее созданный набор.')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь.')
+        seeded_users = User.objects.filter(
+            pk__in=SeededObject.objects.of(User))
+        seeded_groups = Group.objects.filter(
+            pk__in=SeededObject.objects.of(Group))
+        if seeded_users.exists() or seeded_groups.exists():
+            if not options['replace']:
+                raise CommandError('Набор уже создан, запустите команду '
+                                   'с --replace, чтобы пересоздать его.')
+            with transaction.atomic():
+                seeded_users.delete()
+                seeded_groups.delete()
+                SeededObject.objects.all().delete()
+
+        plan = Plan(
+            random.Random(options['seed']), self.end(options['end']),
+            options['users'], options['groups'], options['posts'],
+            options['comments'], options['follows'],
+            skew=options['skew'], days=options['days'],
+        )
+        self.check_free(plan)
+        passwords = self.hash(plan, options['password'], options['workers'])
+        with transaction.atomic():
+            self.insert(plan, passwords, options['batch_size'])
+
+        followers = Counter(author for _, author in plan.follows)
+        percentiles = follower_percentiles(
+            followers.get(user, 0) for user in range(len(plan.users)))
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: пользователей {len(plan.users)}, групп '
+            f'{len(plan.groups)}, записей {len(plan.posts)}, комментариев '
+            f'{len(plan.comments)}, подписок {len(plan.follows)}'))
+        self.stdout.write('Подписчиков у автора: ' + ', '.join(
+            f'p{point}={value}' for point, value in percentiles.items()))
+
+    def end(self, value):
+        """Конец периода: от него отсчитываются все даты набора."""
+        if value is None:
+            day = timezone.localdate()
+        else:
+            try:
+                day = datetime.strptime(value, '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('--end ожидается в виде YYYY-MM-DD.')
+        return timezone.make_aware(datetime.combine(day, time()))
+
+    def check_free(self, plan):
+        """Имена и метки набора не должны быть заняты настоящими
+        пользователями и группами."""
+        for model, field, values in (
+                (User, 'username', [user['username'] for user in plan.users]),
+                (Group, 'slug', [group['slug'] for group in plan.groups])):
+            taken = [value for chunk in chunked(values, 500)
+                     for value in model.objects.filter(
+                         **{f'{field}__in': chunk}).values_list(
+                         field, flat=True)]
+            if taken:
+                raise CommandError(
+                    f'{model._meta.verbose_name_plural} уже существуют: '
+                    f'{", ".join(sorted(taken)[:5])}')
+
+    def hash(self, plan, password, workers):
+        """Хеширует пароли в пуле процессов: PBKDF2 занимает основную
+        часть времени создания пользователей."""
+        items = [(password, user['salt']) for user in plan.users]
+        if not workers:
+            return hash_passwords(items)
+        size = max(1, len(items) // (workers * 4))
+        with ProcessPoolExecutor(workers, initializer=setup_process) as pool:
+            hashed = pool.map(hash_passwords, chunked(items, size))
+            return [value for chunk in hashed for value in chunk]
+
+    def insert(self, plan, passwords, batch_size):
+        bulk_create(User, (
+            User(username=user['username'], password=password,
+                 date_joined=user['date_joined'])
+            for user, password in zip(plan.users, passwords)
+        ), batch_size)
+        users = created_pks(User, 'username',
+                            [user['username'] for user in plan.users])
+
+        bulk_create(Group, (Group(**group) for group in plan.groups),
+                    batch_size)
+        groups = created_pks(Group, 'slug',
+                             [group['slug'] for group in plan.groups])
+        record_seeded(User, users, batch_size)
+        record_seeded(Group, groups, batch_size)
+
+        with explicit_dates(Post._meta.get_field('pub_date'),
+                            Comment._meta.get_field('created')):
+            bulk_create(Post, (
+                Post(text=post['text'], pub_date=post['pub_date'],
+                     author_id=users[post['author']],
+                     group_id=(None if post['group'] is None
+                               else groups[post['group']]),
+                     comment_count=post['comment_count'])
+                for post in plan.posts
+            ), batch_size)
+            # Записи вставлены в порядке плана, значит и pk идут по нему.
+            # Авторы перебираются порциями: старые SQLite допускают не
+            # больше 999 параметров в запросе
+            posts = sorted(
+                pk for chunk in chunked(users, 500)
+                for pk in Post.objects.filter(
+                    author_id__in=chunk).values_list('pk', flat=True))
+            bulk_create(Comment, (
+                Comment(post_id=posts[comment['post']],
+                        author_id=users[comment['author']],
+                        text=comment['text'], created=comment['created'])
+                for comment in plan.comments
+            ), batch_size)
+
+        bulk_create(Follow, (
+            Follow(user_id=users[user], author_id=users[author])
+            for user, author in plan.follows
+        ), batch_size)
+
+
+def created_pks(model, field, values):
+    """pk только что вставленных строк model в порядке values: строки
+    находятся по точному совпадению уникального поля field."""
+    pks = {}
+    for chunk in chunked(values, 500):
+        pks.update(model.objects.filter(
+            **{f'{field}__in': chunk}).values_list(field, 'pk'))
+    return [pks[value] for value in values]
+
+
+def record_seeded(model, pks, batch_size):
+    content_type = ContentType.objects.get_for_model(model)
+    bulk_create(SeededObject, (
+        SeededObject(content_type=content_type, object_id=pk)
+        for pk in pks
+    ), batch_size)
+
+
+def bulk_create(model, objects, batch_size):
+    """bulk_create с пачкой не больше, чем допускает СУБД: Django 2.2 не
+    ограничивает явно заданный batch_size лимитами SQLite."""
+    objects = list(objects)
+    fields = [field for field in model._meta.concrete_fields
+              if not field.primary_key]
+    limit = connection.ops.bulk_batch_size(fields, objects)
+    model.objects.bulk_create(objects, batch_size=min(batch_size, limit))
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from yatube.memory import summarize
+from yatube.slow_queries import read_log
+
+SORT_KEYS = {'retained': 'retained_kb', 'peak': 'max_peak_kb',
+             'average': 'average_retained_kb'}
+
+
+class Command(BaseCommand):
+    help = ('Какие view отвечают за рост памяти воркеров: сводка по '
+            'журналу выборочных замеров tracemalloc - пик и остаток '
+            'памяти по маршрутам и места выделения с наибольшим '
+            'остатком.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=settings.MEMORY_LOG,
+                            help='Журнал; ротированные копии .1, .2... '
+                                 'читаются вместе с ним.')
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument('--sites', type=int, default=5,
+                            help='Сколько мест выделения показать на view.')
+        parser.add_argument('--sort', choices=SORT_KEYS, default='retained',
+                            help='retained - суммарный остаток (рост), '
+                                 'peak - наибольший пик, average - '
+                                 'средний остаток на запрос.')
+
+    def handle(self, *args, **options):
+        views = sorted(summarize(read_log(options['log'])),
+                       key=lambda entry: entry[SORT_KEYS[options['sort']]],
+                       reverse=True)
+        if not views:
+            self.stdout.write('Замеров памяти в журнале нет.')
+            return
+        for entry in views[:options['top']]:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{entry["view"]}: остаток {entry["retained_kb"]:.0f} КиБ '
+                f'за {entry["samples"]} замеров '
+                f'({entry["average_retained_kb"]:.1f} КиБ на запрос), '
+                f'пик в среднем {entry["average_peak_kb"]:.0f} КиБ, '
+                f'наибольший {entry["max_peak_kb"]:.0f} КиБ'))
+            for (site, caller), size in entry['sites'].most_common(
+                    options['sites']):
+                via = f' <- {caller}' if caller and caller != site else ''
+                self.stdout.write(f'   {size:>9.1f} КиБ  {site}{via}')
+            self.stdout.write('')
@@ -0,0 +1,62 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from perf.micro import index_fragment_key
+from posts.cards import fragment_cache
+from posts.models import User
+from yatube.template_profiler import Profiler, profiling
+
+
+class Command(BaseCommand):
+    help = ('Профиль рендера шаблонов страницы по узлам: полное и '
+            'собственное время каждого шаблона, include и тега. Стеки '
+            'можно сохранить в формате folded для flamegraph.pl или '
+            'speedscope.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Адрес страницы, например /.')
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--user', default=None,
+                            help='Имя пользователя, от которого ходить.')
+        parser.add_argument('--output', default=None,
+                            help='Файл для стеков в формате folded.')
+        parser.add_argument('--top', type=int, default=20)
+
+    def handle(self, *args, **options):
+        client = Client()
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(
+                    f'Нет пользователя {options["user"]!r}')
+            client.force_login(user)
+        debug = settings.DEBUG
+        # В DEBUG debug toolbar добавил бы в профиль свои шаблоны
+        settings.DEBUG = False
+        try:
+            profiler = Profiler()
+            for _ in range(options['repeat']):
+                fragment_cache().delete(index_fragment_key(user))
+                with profiling(profiler):
+                    response = client.get(options['path'])
+                if response.status_code != 200:
+                    raise CommandError(
+                        f'{options["path"]}: ответ {response.status_code}')
+        finally:
+            settings.DEBUG = debug
+        self.report(profiler.table()[:options['top']], options['repeat'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as target:
+                target.write(profiler.folded())
+
+    def report(self, rows, repeat):
+        self.stdout.write(f'{"self, мс":>9}{"всего, мс":>10}'
+                          f'{"вызовов":>9}  узел (на один рендер)')
+        for name, calls, cumulative, own in rows:
+            self.stdout.write(
+                f'{own * 1000 / repeat:>9.2f}'
+                f'{cumulative * 1000 / repeat:>10.2f}'
+                f'{calls / repeat:>9.0f}  {name}')
@@ -0,0 +1,108 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+
+from perf import load, replay
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = ('Воспроизводит записанные запросы (CAPTURE_SAMPLE_RATE) '
+            'против локального экземпляра с исходными интервалами или в '
+            'rate раз быстрее и сравнивает задержки с прогоном другой '
+            'сборки. Сессии вошедших пользователей создаются в БД этого '
+            'проекта: внешний сервер должен работать с той же БД.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=settings.CAPTURE_LOG,
+                            help='Журнал; ротированные копии .1, .2... '
+                                 'читаются вместе с ним.')
+        parser.add_argument('--url', default=None,
+                            help='Адрес уже запущенного сервера; без него '
+                                 'приложение поднимается в этом процессе.')
+        parser.add_argument('--rate', type=float, default=1.0,
+                            help='Во сколько раз быстрее исходного '
+                                 'трафика; 0 - без пауз.')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Сколько первых записей проиграть.')
+        parser.add_argument('--users', type=int, default=20,
+                            help='Сколько сессий на класс пользователя.')
+        parser.add_argument('--baseline', default=None,
+                            help='JSON прогона другой сборки для '
+                                 'сравнения.')
+        parser.add_argument('--save-baseline', default=None,
+                            help='Куда сохранить результат как baseline.')
+        parser.add_argument('--threshold', type=float, default=10.0,
+                            help='Допустимое ухудшение, в процентах.')
+
+    def handle(self, *args, **options):
+        records = replay.read_capture(options['log'], options['limit'])
+        if not records:
+            raise CommandError(f'В {options["log"]} нет записанных '
+                               'запросов: включите CAPTURE_SAMPLE_RATE.')
+        sessions = replay.Sessions(
+            [load.session_cookie(user) for user in User.objects.filter(
+                is_staff=False).order_by('pk')[:options['users']]],
+            [load.session_cookie(user) for user in User.objects.filter(
+                is_staff=True).order_by('pk')[:options['users']]])
+
+        server = None
+        base_url = options['url']
+        if base_url is None:
+            if settings.DEBUG:
+                self.stderr.write(load.DEBUG_WARNING)
+            server, base_url = load.start_server(
+                load.counting_queries(get_wsgi_application()))
+        started = records[0]['t']
+        seconds = records[-1]['t'] - started
+        try:
+            samples, lag, skipped = replay.replay(
+                base_url, records, sessions, options['rate'],
+                options['concurrency'])
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+        duration = (seconds / options['rate'] if options['rate']
+                    else 0) or 1
+        summary = load.summarize(samples, duration)
+        self.report(summary, replay.captured_latency(records))
+        self.stdout.write(f'Записей: {len(records)}, маршрут не найден: '
+                          f'{skipped}, наибольшее опоздание старта: '
+                          f'{lag * 1000:.0f} мс')
+        if options['save_baseline']:
+            load.save_baseline(options['save_baseline'], summary)
+        if options['baseline']:
+            baseline = load.load_baseline(options['baseline'])
+            self.report_differences(replay.differences(summary, baseline))
+            regressions = load.compare(summary, baseline,
+                                       options['threshold'])
+            if regressions:
+                raise CommandError('Регрессии относительно baseline:\n'
+                                   + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS(
+                'Регрессий относительно baseline нет.'))
+
+    def report(self, summary, captured):
+        self.stdout.write(
+            f'{"маршрут":<22}{"запросов":>9}{"p50, мс":>9}{"p95, мс":>9}'
+            f'{"исх. p50":>10}{"исх. p95":>10}{"SQL":>6}{"ошибок":>8}')
+        for route, row in summary.items():
+            queries = ('-' if row['queries'] is None
+                       else f'{row["queries"]:.1f}')
+            original = captured.get(route, {'p50': 0.0, 'p95': 0.0})
+            self.stdout.write(
+                f'{route:<22}{row["requests"]:>9}{row["p50"]:>9.1f}'
+                f'{row["p95"]:>9.1f}{original["p50"]:>10.1f}'
+                f'{original["p95"]:>10.1f}{queries:>6}{row["errors"]:>8}')
+
+    def report_differences(self, rows):
+        self.stdout.write('')
+        self.stdout.write(f'{"маршрут":<22}{"p50 до":>9}{"после":>9}'
+                          f'{"p95 до":>9}{"после":>9}{"p95, %":>9}')
+        for route, p50_before, p50, p95_before, p95, change in rows:
+            self.stdout.write(
+                f'{route:<22}{p50_before:>9.1f}{p50:>9.1f}'
+                f'{p95_before:>9.1f}{p95:>9.1f}{change:>+9.0f}')
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from yatube.slow_queries import read_log, summarize
+
+SORT_KEYS = {'total': 'total_ms', 'count': 'count', 'max': 'max_ms'}
+
+
+class Command(BaseCommand):
+    help = ('Самые дорогие запросы из журнала медленных запросов: '
+            'суммарное время, число, худший случай, view, место вызова '
+            'и план SQLite.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=settings.SLOW_QUERY_LOG,
+                            help='Журнал; ротированные копии .1, .2... '
+                                 'читаются вместе с ним.')
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument('--sort', choices=SORT_KEYS, default='total')
+        parser.add_argument('--view', default=None,
+                            help='Только запросы этого view, например '
+                                 'posts:index.')
+
+    def handle(self, *args, **options):
+        records = read_log(options['log'])
+        if options['view']:
+            records = (record for record in records
+                       if record.get('view') == options['view'])
+        offenders = sorted(summarize(records),
+                           key=lambda entry: entry[SORT_KEYS[options['sort']]],
+                           reverse=True)
+        if not offenders:
+            self.stdout.write('Медленных запросов в журнале нет.')
+            return
+        for place, entry in enumerate(offenders[:options['top']], 1):
+            self.report(place, entry)
+
+    def report(self, place, entry):
+        write = self.stdout.write
+        write(self.style.MIGRATE_HEADING(
+            f'{place}. {entry["total_ms"]:.0f} мс всего, '
+            f'{entry["count"]:.0f} раз, в среднем '
+            f'{entry["total_ms"] / entry["count"]:.1f} мс, '
+            f'худший {entry["max_ms"]:.1f} мс'))
+        write(f'   {entry["fingerprint"]}')
+        if entry['params'] is not None:
+            write(f'   параметры худшего: {entry["params"]}')
+        views = ', '.join(f'{view} x{count}'
+                          for view, count in entry['views'].most_common(3))
+        write(f'   view: {views}')
+        for site, count in entry['call_sites'].most_common(3):
+            write(f'   вызов x{count}: {site}')
+        for template, count in entry['templates'].most_common(3):
+            write(f'   шаблон x{count}: {template}')
+        for line in entry['plan'] or ():
+            write(f'   план: {line}')
+        write('')
@@ -0,0 +1,260 @@
+"""Микробенчмарки страниц по составляющим.
+
+Для каждой страницы отдельно замеряются:
+
+- queryset - выполнение запросов view вместе с созданием объектов
+  моделей (QuerySet._fetch_all и запросы вне его: count, aggregate);
+- context - остальной Python-код view: пагинатор, сборка контекста;
+- render - рендер шаблона целиком, render_sql - запросы, которые
+  шаблон сделал сам (их быть не должно);
+- include:<шаблон> - рендер отдельных include с контекстом страницы,
+  для post_item.html - суммарно по всем записям страницы.
+
+render вызывается у шаблона напрямую, поэтому view запускается с
+подменённым render: так получаем ровно тот контекст, который view
+передала бы в шаблон.
+"""
+import gc
+import statistics
+import time
+import timeit
+from contextlib import contextmanager
+from unittest import mock
+
+from django.core.cache.utils import make_template_fragment_key
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.template.loader import get_template
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from posts import links, views
+from posts.cards import fragment_cache
+
+PAGINATOR = 'includes/paginator.html'
+POST_ITEM = 'includes/post_item.html'
+AUTHOR_CARD = 'includes/author_card.html'
+COMMENTS = 'includes/comments.html'
+
+# Страница -> (view, include, которые замеряются отдельно)
+PAGES = {
+    'index': (views.index, (POST_ITEM, PAGINATOR)),
+    'group': (views.group_posts, (POST_ITEM, PAGINATOR)),
+    'profile': (views.profile, (AUTHOR_CARD, POST_ITEM, PAGINATOR)),
+    'follow_index': (views.follow_index, (POST_ITEM, PAGINATOR)),
+    'post': (views.post_view, (AUTHOR_CARD, POST_ITEM, COMMENTS)),
+}
+
+
+# Составляющие короче этого порога в сравнении с baseline не участвуют:
+# их относительный шум больше любого разумного порога
+MIN_MILLISECONDS = 0.5
+
+
+def index_fragment_key(user):
+    """Ключ фрагмента index_page для user: vary_on как в index.html, а
+    request.page_shell вне режима оболочек не задан и даёт пустую
+    строку."""
+    return make_template_fragment_key('index_page',
+                                      ['', getattr(user, 'pk', None)])
+
+
+class Stopwatch:
+    """Время в запросах к БД и в вычислении QuerySet.
+
+    Вложенные вызовы (prefetch внутри _fetch_all, запросы внутри
+    _fetch_all) учитываются один раз - во внешнем.
+    """
+
+    def __init__(self):
+        self.queryset = 0.0
+        self.sql = 0.0
+        self.depth = 0
+
+    def fetch_all(self, original):
+        stopwatch = self
+
+        def _fetch_all(queryset):
+            if stopwatch.depth or queryset._result_cache is not None:
+                return original(queryset)
+            stopwatch.depth += 1
+            started = time.perf_counter()
+            try:
+                return original(queryset)
+            finally:
+                stopwatch.queryset += time.perf_counter() - started
+                stopwatch.depth -= 1
+        return _fetch_all
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.sql += elapsed
+            if not self.depth:
+                self.queryset += elapsed
+
+    @contextmanager
+    def running(self):
+        with mock.patch.object(QuerySet, '_fetch_all',
+                               self.fetch_all(QuerySet._fetch_all)):
+            with connection.execute_wrapper(self):
+                yield
+
+
+@contextmanager
+def captured_render():
+    """Подменяет render во views: вызовы копятся в списке, а view
+    возвращает пустой ответ. Страницы-оболочки и потоковые списки
+    выключены: с ними view не дошла бы до render."""
+    calls = []
+
+    def render(request, template_name, context=None, **kwargs):
+        calls.append((template_name, context or {}))
+        return HttpResponse()
+
+    with mock.patch.object(views, 'render', render), \
+            override_settings(PAGE_SHELLS=False, STREAMING_LISTINGS=False):
+        yield calls
+
+
+def measure(view, request, kwargs, includes):
+    """Один прогон страницы: секунды по составляющим."""
+    gc.collect()
+    gc.disable()
+    try:
+        stopwatch = Stopwatch()
+        with captured_render() as calls, stopwatch.running():
+            started = time.perf_counter()
+            view(request, **kwargs)
+            elapsed = time.perf_counter() - started
+        timings = {'queryset': stopwatch.queryset,
+                   'context': elapsed - stopwatch.queryset}
+        template_name, context = calls[0]
+
+        # Фрагмент сбрасывается перед рендером, иначе замерялось бы
+        # чтение из кеша
+        fragment_cache().delete(index_fragment_key(request.user))
+        template = get_template(template_name)
+        stopwatch = Stopwatch()
+        with stopwatch.running():
+            started = time.perf_counter()
+            template.render(context, request)
+            timings['render'] = time.perf_counter() - started
+        timings['render_sql'] = stopwatch.sql
+
+        context = dict(context, items=context.get('page'))
+        for name in includes:
+            template = get_template(name)
+            posts = ([context['post']] if 'post' in context
+                     else list(context.get('page') or ()))
+            started = time.perf_counter()
+            if name == POST_ITEM:
+                for post in posts:
+                    template.render(dict(context, post=post), request)
+            else:
+                template.render(context, request)
+            timings[f'include:{name.split("/")[-1]}'] = (
+                time.perf_counter() - started)
+        return timings
+    finally:
+        gc.enable()
+
+
+def benchmark(view, request, kwargs, includes, repeat=15, warmup=3):
+    """Медиана и межквартильный размах каждой составляющей, в мс."""
+    for _ in range(warmup):
+        measure(view, request, kwargs, includes)
+    samples = {}
+    for _ in range(repeat):
+        for component, seconds in measure(view, request, kwargs,
+                                          includes).items():
+            samples.setdefault(component, []).append(seconds * 1000)
+    return {component: summarize(values)
+            for component, values in samples.items()}
+
+
+def calibrate(repeat=15):
+    """Медиана эталонной нагрузки (рендер шаблона-цикла без БД), в мс.
+
+    Сохраняется вместе с baseline: отношение эталонов двух прогонов
+    показывает, насколько быстрее или медленнее стала сама машина, и на
+    него делятся медианы перед сравнением.
+    """
+    template = Template('{% for i in items %}<li>{{ i|add:1 }}</li>'
+                        '{% endfor %}')
+    context = Context({'items': range(2000)})
+    template.render(context)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        template.render(context)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def summarize(values):
+    if len(values) > 1:
+        quartiles = statistics.quantiles(values, n=4)
+    else:
+        quartiles = values * 3
+    return {'median': statistics.median(values),
+            'iqr': quartiles[2] - quartiles[0]}
+
+
+def compare(results, baseline, threshold):
+    """Составляющие, медиана которых с поправкой на скорость машины
+    выросла больше чем на threshold процентов и больше, чем на разброс
+    (IQR) baseline. results и baseline - словари с ключами calibration
+    и pages."""
+    speed = results['calibration'] / baseline['calibration']
+    regressions = []
+    for page, components in results['pages'].items():
+        for component, current in components.items():
+            before = baseline['pages'].get(page, {}).get(component)
+            if not before or before['median'] < MIN_MILLISECONDS:
+                continue
+            median = current['median'] / speed
+            growth = (median / before['median'] - 1) * 100
+            if growth > threshold and median - before['median'] \
+                    > before['iqr']:
+                regressions.append(
+                    f'{page} {component}: {before["median"]:.2f} -> '
+                    f'{median:.2f} мс (+{growth:.0f}%)')
+    return regressions
+
+
+def card_urls(post):
+    """Адреса, которые строит карточка записи includes/post_item.html."""
+    username = post.author.username
+    urls = [('posts:profile', username), ('posts:post', username, post.id),
+            ('posts:post_edit', username, post.id)]
+    if post.group_id:
+        urls.append(('posts:group', post.group.slug))
+    return urls
+
+
+def url_cost(post, number=2000, repeat=5):
+    """Построение адресов одной карточки, мкс: через reverse и через
+    posts.links. Лучший из repeat прогонов по number карточек."""
+    urls = card_urls(post)
+
+    def with_reverse():
+        for name, *args in urls:
+            reverse(name, args=args)
+
+    def with_links():
+        for name, *args in urls:
+            links.url(name, *args)
+
+    with_links()
+    return {
+        label: min(timeit.repeat(function, number=number, repeat=repeat))
+        / number * 1_000_000
+        for label, function in (('reverse', with_reverse),
+                                ('links', with_links))
+    }
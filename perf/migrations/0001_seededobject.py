@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-19 09:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeededObject',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField(verbose_name='pk строки')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.ContentType', verbose_name='Тип строки')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='seededobject',
+            constraint=models.UniqueConstraint(fields=('content_type', 'object_id'), name='unique_seeded_object'),
+        ),
+    ]
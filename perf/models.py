@@ -0,0 +1,33 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import models
+
+
+class SeededObjectQuerySet(models.QuerySet):
+    def of(self, model):
+        """pk строк model, созданных generate_dataset."""
+        return self.filter(
+            content_type=ContentType.objects.get_for_model(model)
+        ).values('object_id')
+
+
+class SeededObject(models.Model):
+    """Строка, созданная generate_dataset.
+
+    По этим записям --replace удаляет ровно созданный набор: по префиксу
+    имени под удаление попал бы и настоящий пользователь «seedling».
+    """
+    content_type = models.ForeignKey(ContentType,
+                                     on_delete=models.CASCADE,
+                                     verbose_name='Тип строки')
+    object_id = models.PositiveIntegerField(verbose_name='pk строки')
+
+    objects = SeededObjectQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'object_id'],
+                                    name='unique_seeded_object'),
+        ]
+
+    def __str__(self):
+        return f'{self.content_type} #{self.object_id}'
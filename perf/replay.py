@@ -0,0 +1,137 @@
+"""Воспроизведение записанных запросов (см. yatube.capture).
+
+Запросы идут в исходном порядке и с исходными интервалами, делёнными на
+rate; rate=0 - без пауз. Класс пользователя сохраняется: запрос
+вошедшего пользователя уходит с cookie одной из заранее созданных
+сессий, запрос сотрудника - с сессией сотрудника. Результат - такие же
+сырые замеры, как у нагрузочного прогона (perf.load), поэтому сводка и
+сравнение сборок общие.
+"""
+import queue
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlencode
+
+from django.urls import NoReverseMatch, reverse
+
+from perf import load
+from yatube.capture import ANONYMOUS, STAFF, USER
+from yatube.slow_queries import read_log
+
+
+def read_capture(path, limit=None):
+    """Записи журнала по времени начала запроса."""
+    records = sorted(read_log(path), key=lambda record: record['t'])
+    return records[:limit] if limit else records
+
+
+def request_path(record):
+    path = reverse(record['r'], kwargs=record.get('k') or None)
+    if record.get('q'):
+        path = f'{path}?{urlencode(record["q"])}'
+    return path
+
+
+def schedule(records, rate):
+    """[(секунды от начала прогона, запись)]."""
+    if not records:
+        return []
+    first = records[0]['t']
+    return [((record['t'] - first) / rate if rate else 0.0, record)
+            for record in records]
+
+
+def prepare(records, rate):
+    """Очередь (смещение, запись, адрес) и число записей, для которых
+    маршрута в этой сборке нет."""
+    tasks = queue.Queue()
+    skipped = 0
+    for offset, record in schedule(records, rate):
+        try:
+            tasks.put((offset, record, request_path(record)))
+        except NoReverseMatch:
+            skipped += 1
+    return tasks, skipped
+
+
+class Sessions:
+    """Cookie сессий по классу пользователя; сотрудников без сессий
+    заменяют обычные пользователи."""
+
+    def __init__(self, users, staff):
+        self.pools = {ANONYMOUS: [None], USER: users or [None],
+                      STAFF: staff or users or [None]}
+        self.counters = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def next(self, kind):
+        pool = self.pools.get(kind, self.pools[ANONYMOUS])
+        with self.lock:
+            self.counters[kind] += 1
+            return pool[self.counters[kind] % len(pool)]
+
+
+def replay(base_url, records, sessions, rate=1.0, concurrency=8):
+    """Проигрывает записи; возвращает (замеры по маршрутам как у
+    load.run, наибольшее опоздание старта в секундах, число записей,
+    для которых маршрута больше нет)."""
+    samples = defaultdict(list)
+    lock = threading.Lock()
+    tasks, skipped = prepare(records, rate)
+    lag = [0.0]
+    started = time.perf_counter()
+
+    def worker():
+        while True:
+            try:
+                offset, record, path = tasks.get_nowait()
+            except queue.Empty:
+                return
+            delay = started + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            result = visit(base_url, record, path, sessions)
+            with lock:
+                lag[0] = max(lag[0], -delay)
+                samples[record['r']].append(result)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, lag[0], skipped
+
+
+def visit(base_url, record, path, sessions):
+    client = load.Client(base_url, sessions.next(record.get('u')))
+    try:
+        return client.request(record.get('m', 'GET'), path)
+    except OSError:
+        return (0, 0.0, None)
+
+
+def captured_latency(records):
+    """p50 и p95 исходных задержек по маршрутам, в мс."""
+    latencies = defaultdict(list)
+    for record in records:
+        latencies[record['r']].append(record['ms'])
+    return {route: {'p50': load.percentile(values, 50),
+                    'p95': load.percentile(values, 95)}
+            for route, values in latencies.items()}
+
+
+def differences(summary, baseline):
+    """[(маршрут, p50 до, p50 после, p95 до, p95 после, изменение p95
+    в процентах)] для маршрутов, которые есть в обоих прогонах."""
+    rows = []
+    for route, current in summary.items():
+        before = baseline.get(route)
+        if not before:
+            continue
+        change = ((current['p95'] / before['p95'] - 1) * 100
+                  if before['p95'] else 0.0)
+        rows.append((route, before['p50'], current['p50'], before['p95'],
+                     current['p95'], change))
+    return rows
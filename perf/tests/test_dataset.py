@@ -0,0 +1,106 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Count, F
+from django.test import TestCase, override_settings
+
+from posts.models import Comment, Follow, Group, Post, User
+
+
+@override_settings(PASSWORD_HASHERS=[
+    'django.contrib.auth.hashers.MD5PasswordHasher'])
+class GenerateDatasetTest(TestCase):
+    options = {'users': 40, 'groups': 5, 'posts': 200, 'comments': 600,
+               'follows': 5, 'end': '2024-01-01', 'workers': 0,
+               'stdout': StringIO()}
+
+    def snapshot(self):
+        return (
+            list(User.objects.order_by('username').values_list(
+                'username', 'password', 'date_joined')),
+            list(Post.objects.order_by('pk').values_list(
+                'author__username', 'group__slug', 'text', 'pub_date',
+                'comment_count')),
+            list(Comment.objects.order_by('pk').values_list(
+                'post__text', 'author__username', 'created')),
+            sorted(Follow.objects.values_list('user__username',
+                                              'author__username')),
+        )
+
+    def test_volumes_and_counters(self):
+        """Создаются заданные объёмы, счётчики комментариев сходятся."""
+        call_command('generate_dataset', **self.options)
+        self.assertEqual(User.objects.count(), 40)
+        self.assertEqual(Group.objects.count(), 5)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 600)
+        self.assertFalse(Post.objects.annotate(
+            actual=Count('comments')).exclude(
+            comment_count=F('actual')).exists())
+        self.assertFalse(Follow.objects.filter(user=F('author')).exists())
+        self.assertTrue(User.objects.first().check_password('password'))
+
+    def test_queries_fit_old_sqlite_parameter_limit(self):
+        """Ни один запрос не передаёт больше 999 параметров, даже когда
+        пользователей больше."""
+        params = []
+
+        def record(execute, sql, values, many, context):
+            params.append(len(values or ()))
+            return execute(sql, values, many, context)
+
+        options = dict(self.options, users=1200)
+        with connection.execute_wrapper(record):
+            call_command('generate_dataset', **options)
+        self.assertEqual(User.objects.count(), 1200)
+        self.assertLessEqual(max(params), 999)
+
+    def test_same_seed_gives_same_rows(self):
+        """Повторный запуск с тем же seed воспроизводит набор."""
+        call_command('generate_dataset', seed=7, **self.options)
+        first = self.snapshot()
+        call_command('generate_dataset', seed=7, replace=True,
+                     **self.options)
+        self.assertEqual(self.snapshot(), first)
+        call_command('generate_dataset', seed=8, replace=True,
+                     **self.options)
+        self.assertNotEqual(self.snapshot(), first)
+
+    def test_follower_counts_are_skewed(self):
+        """Подписчики сосредоточены у немногих популярных авторов."""
+        call_command('generate_dataset', **self.options)
+        counts = sorted(Follow.objects.values('author').annotate(
+            total=Count('pk')).values_list('total', flat=True))
+        self.assertGreater(counts[-1], 3 * counts[len(counts) // 2])
+
+    def test_existing_dataset_requires_replace(self):
+        call_command('generate_dataset', **self.options)
+        with self.assertRaises(CommandError):
+            call_command('generate_dataset', **self.options)
+
+    def test_replace_keeps_real_users_and_groups(self):
+        """--replace удаляет только созданный набор, даже если имя
+        настоящего пользователя начинается с того же префикса."""
+        User.objects.create_user(username='seedling')
+        Group.objects.create(title='Своя', slug='seed-group-own')
+        call_command('generate_dataset', **self.options)
+        call_command('generate_dataset', replace=True, **self.options)
+        self.assertTrue(User.objects.filter(username='seedling').exists())
+        self.assertTrue(Group.objects.filter(slug='seed-group-own').exists())
+        self.assertEqual(User.objects.count(), 41)
+        self.assertFalse(Post.objects.filter(
+            author__username='seedling').exists())
+
+    def test_taken_name_is_reported(self):
+        User.objects.create_user(username='seed000003')
+        with self.assertRaises(CommandError):
+            call_command('generate_dataset', **self.options)
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_passwords_hashed_in_process_pool(self):
+        options = dict(self.options, users=8, posts=10, comments=10,
+                       workers=2)
+        call_command('generate_dataset', **options)
+        self.assertTrue(User.objects.last().check_password('password'))
@@ -0,0 +1,100 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from perf.load import QUERIES_HEADER, compare, counting_queries
+from posts.models import Comment, Follow, Post, User
+
+
+class BenchViewsTest(TransactionTestCase):
+    def setUp(self):
+        author = User.objects.create_user(username='author')
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=author)
+        for i in range(3):
+            Post.objects.create(text=f'Запись {i}', author=author)
+
+    def test_reports_routes_and_compares_with_baseline(self):
+        """Прогон сообщает задержки и SQL по маршрутам и сохраняет
+        baseline, с которым затем сравнивается следующий прогон."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            out = StringIO()
+            # Тестовая БД SQLite в памяти с общим кешем блокирует таблицы
+            # целиком, поэтому конкурентный прогон - только на чтение
+            call_command('bench_views', clients=4, seconds=1, anonymous=0.5,
+                         users=2, seed=1, save_baseline=path, stdout=out,
+                         mix={'index': 2, 'profile': 1, 'post': 1,
+                              'follow_index': 1})
+            with open(path, encoding='utf-8') as source:
+                baseline = json.load(source)
+            self.assertIn('index', baseline)
+            self.assertEqual(baseline['index']['errors'], 0)
+            self.assertGreater(baseline['index']['queries'], 0)
+            self.assertIn('p99', out.getvalue())
+
+            out = StringIO()
+            call_command('bench_views', clients=2, seconds=0.5,
+                         mix={'index': 1}, baseline=path, threshold=10000,
+                         seed=1, stdout=out)
+            self.assertIn('Регрессий относительно baseline нет',
+                          out.getvalue())
+
+    def test_writes_submit_forms_with_csrf(self):
+        """Клиент публикует записи и комментарии через формы с CSRF."""
+        call_command('bench_views', clients=1, seconds=0.5, anonymous=0,
+                     users=1, mix={'new_post': 1, 'add_comment': 1},
+                     stdout=StringIO())
+        self.assertTrue(Post.objects.filter(
+            text='Нагрузочный пост').exists())
+        self.assertTrue(Comment.objects.filter(text='Комментарий').exists())
+
+    def test_empty_database_is_reported(self):
+        Post.objects.all().delete()
+        with self.assertRaises(CommandError):
+            call_command('bench_views', seconds=0.1, stdout=StringIO())
+
+
+class CompareTest(SimpleTestCase):
+    row = {'requests': 100, 'rps': 50.0, 'p50': 10.0, 'p95': 20.0,
+           'p99': 30.0, 'queries': 4.0, 'max_queries': 5, 'errors': 0}
+
+    def test_slower_p95_and_more_queries_are_regressions(self):
+        current = dict(self.row, p95=30.0, max_queries=7)
+        regressions = compare({'index': current}, {'index': self.row}, 10)
+        self.assertEqual(len(regressions), 2)
+
+    def test_small_samples_do_not_compare_latency(self):
+        current = dict(self.row, requests=3, p95=300.0)
+        self.assertEqual(
+            compare({'index': current}, {'index': self.row}, 10), [])
+
+
+class CountingQueriesTest(TestCase):
+    databases = '__all__'
+
+    def test_streamed_and_all_database_queries_are_counted(self):
+        """Запросы из тела потокового ответа и ко всем БД попадают в
+        X-Queries."""
+        def application(environ, start_response):
+            start_response('200 OK', [])
+            for alias in connections:
+                with connections[alias].cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                yield b'row'
+
+        headers = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            headers.update(response_headers)
+
+        body = counting_queries(application)({}, start_response)
+        self.assertEqual(b''.join(body), b'row' * len(connections.all()))
+        self.assertEqual(headers[QUERIES_HEADER],
+                         str(len(connections.all())))
@@ -0,0 +1,121 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+from yatube import memory
+
+# Остаётся живым между запросами, как глобальный кеш в воркере
+LEAK = []
+
+
+def leaky():
+    LEAK.append(bytearray(256 * 1024))
+
+
+class SampleTest(TestCase):
+    def tearDown(self):
+        LEAK.clear()
+
+    def test_peak_and_retained(self):
+        with memory.Sample() as sample:
+            temporary = bytearray(512 * 1024)
+            del temporary
+            leaky()
+        self.assertGreaterEqual(sample.peak, 512 * 1024)
+        self.assertGreaterEqual(sample.retained, 256 * 1024)
+        self.assertLess(sample.retained, 512 * 1024)
+        top = sample.sites[0]
+        self.assertTrue(top['site'].startswith('perf/tests/test_memory.py'))
+        self.assertGreaterEqual(top['size_kb'], 256)
+
+
+@override_settings(MEMORY_SAMPLE_RATE=1.0)
+class MemorySamplingMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(text='Запись', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_sampled_request_is_logged_by_url_name(self):
+        with self.assertLogs('yatube.memory', 'INFO') as logs:
+            self.client.get(reverse('posts:index'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['peak_kb'], 0)
+        self.assertIn('retained_kb', record)
+
+    @override_settings(STREAMING_LISTINGS=True)
+    def test_streamed_response_is_sampled_to_the_end(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(memory.try_lock())
+        with self.assertLogs('yatube.memory', 'INFO'):
+            b''.join(response.streaming_content)
+        self.assertTrue(memory.try_lock())
+        memory.release()
+
+    def test_concurrent_sample_is_skipped(self):
+        """tracemalloc общий на процесс: пока идёт один замер, второй
+        запрос не замеряется."""
+        self.assertTrue(memory.try_lock())
+        try:
+            with self.assertRaises(AssertionError):
+                with self.assertLogs('yatube.memory', 'INFO'):
+                    self.client.get(reverse('posts:index'))
+        finally:
+            memory.release()
+
+
+class MemoryReportTest(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'memory.log')
+
+    def record(self, view, peak, retained, site):
+        return {'view': view, 'path': '/', 'status': 200, 'peak_kb': peak,
+                'retained_kb': retained,
+                'sites': [{'site': site, 'caller': 'posts/views.py:10',
+                           'size_kb': retained, 'count': 1}]}
+
+    def test_views_are_ordered_by_retained_memory(self):
+        with open(self.path, 'w', encoding='utf-8') as target:
+            for record in (
+                    self.record('posts:index', 900, 1, 'a.py:1'),
+                    self.record('posts:post', 100, 300, 'b.py:2'),
+                    self.record('posts:post', 100, 200, 'b.py:2')):
+                target.write(json.dumps(record) + '\n')
+        offenders = {entry['view']: entry
+                     for entry in memory.summarize(memory_records(self.path))}
+        self.assertEqual(offenders['posts:post']['retained_kb'], 500)
+        self.assertEqual(offenders['posts:post']['average_retained_kb'],
+                         250)
+        self.assertEqual(offenders['posts:index']['max_peak_kb'], 900)
+
+        out = StringIO()
+        call_command('memory_report', log=self.path, stdout=out)
+        text = out.getvalue()
+        self.assertLess(text.index('posts:post'), text.index('posts:index'))
+        self.assertIn('b.py:2 <- posts/views.py:10', text)
+
+        out = StringIO()
+        call_command('memory_report', log=self.path, sort='peak',
+                     stdout=out)
+        text = out.getvalue()
+        self.assertLess(text.index('posts:index'), text.index('posts:post'))
+
+
+def memory_records(path):
+    with open(path, encoding='utf-8') as source:
+        return [json.loads(line) for line in source]
@@ -0,0 +1,144 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+from yatube import metrics
+
+TEMP_METRICS_DIR = tempfile.mkdtemp()
+
+
+@override_settings(METRICS_DIR=TEMP_METRICS_DIR, METRICS_FLUSH_SECONDS=0,
+                   METRICS_TOKEN='secret')
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.staff = User.objects.create_user(username='staff',
+                                             is_staff=True)
+        Post.objects.create(text='Запись', author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_METRICS_DIR, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        metrics.registry.values.clear()
+        metrics.query_id.cache_clear()
+        for name in os.listdir(TEMP_METRICS_DIR):
+            os.remove(os.path.join(TEMP_METRICS_DIR, name))
+
+    def scrape(self):
+        response = self.client.get(reverse('metrics'),
+                                   HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith(
+            'text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    def test_request_histogram_by_url_name(self):
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        text = self.scrape()
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram',
+                      text)
+        self.assertIn('yatube_request_duration_seconds_count'
+                      '{method="GET",url_name="posts:index"} 2', text)
+        self.assertIn('yatube_request_duration_seconds_bucket'
+                      '{method="GET",url_name="posts:index",le="+Inf"} 2',
+                      text)
+
+    def test_query_histogram_is_keyed_by_fingerprint(self):
+        """Запросы с разными значениями попадают в один ряд, а текст
+        отпечатка отдаётся отдельной метрикой info."""
+        self.client.get(reverse('posts:profile', args=['author']))
+        self.client.get(reverse('posts:profile', args=['staff']))
+        text = self.scrape()
+        info = [line for line in text.splitlines()
+                if line.startswith('yatube_db_query_info{')]
+        self.assertTrue(info)
+        self.assertTrue(all("'author'" not in line and "'staff'" not in line
+                            for line in info))
+        self.assertIn('yatube_db_query_duration_seconds_count{query="',
+                      text)
+
+    def test_cache_hits_and_misses(self):
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        text = self.scrape()
+        self.assertIn('yatube_cache_requests_total{result="hit"}', text)
+        self.assertIn('yatube_cache_requests_total{result="miss"}', text)
+
+    def test_snapshots_of_all_workers_are_summed(self):
+        self.client.get(reverse('posts:index'))
+        metrics.registry.flush()
+        own = os.path.join(TEMP_METRICS_DIR, f'{os.getpid()}.json')
+        with open(own, encoding='utf-8') as source:
+            snapshot = json.load(source)
+        # Снимок «другого воркера» с теми же рядами
+        with open(os.path.join(TEMP_METRICS_DIR, '1.json'), 'w',
+                  encoding='utf-8') as target:
+            json.dump(snapshot, target)
+        collected = metrics.collect()
+        series = collected['yatube_request_duration_seconds']
+        for key, value in series.items():
+            own_value = snapshot['yatube_request_duration_seconds'][key]
+            self.assertEqual(sum(value['buckets']),
+                             2 * sum(own_value['buckets']))
+
+    def test_dead_process_snapshots_are_folded(self):
+        """Снимки завершившихся процессов остаются в сумме, но их файлы
+        сворачиваются в один."""
+        snapshot = {'yatube_cache_requests_total':
+                    {metrics._key({'result': 'hit'}): 3}}
+        for pid in (999999998, 999999999):
+            with open(os.path.join(TEMP_METRICS_DIR, f'{pid}.json'), 'w',
+                      encoding='utf-8') as target:
+                json.dump(snapshot, target)
+        for _ in range(2):
+            collected = metrics.collect()
+            self.assertEqual(
+                list(collected['yatube_cache_requests_total'].values()),
+                [6])
+        self.assertEqual(
+            sorted(name for name in os.listdir(TEMP_METRICS_DIR)
+                   if name.endswith('.json')),
+            [metrics.DEAD_SNAPSHOT])
+
+    @override_settings(METRICS_DIR=None)
+    def test_without_directory_process_metrics_are_served(self):
+        self.client.get(reverse('posts:index'))
+        self.assertIn('url_name="posts:index"', self.scrape())
+        self.assertEqual(os.listdir(TEMP_METRICS_DIR), [])
+
+    def test_access_requires_staff_or_token(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(
+            self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong')
+            .status_code, 403)
+        self.client.force_login(self.author)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(METRICS_TOKEN=None)
+    def test_empty_token_is_not_accepted(self):
+        response = self.client.get(reverse('metrics'),
+                                   HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, 403)
+
+
+class RenderTest(TestCase):
+    def test_label_values_are_escaped(self):
+        text = metrics.render({'yatube_db_query_info': {
+            json.dumps([['query', 'x'], ['sql', 'a "b"\\\n']]): 1}})
+        self.assertIn('yatube_db_query_info{query="x",sql="a \\"b\\"\\\\\\n"}'
+                      ' 1', text)
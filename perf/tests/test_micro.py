@@ -0,0 +1,100 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import RequestFactory, SimpleTestCase, TestCase
+
+from perf import micro
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class BenchPagesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        group = Group.objects.create(title='Группа', slug='group')
+        for i in range(12):
+            post = Post.objects.create(text=f'Запись {i}', author=cls.author,
+                                       group=group)
+            Comment.objects.create(post=post, author=cls.reader,
+                                   text='Комментарий')
+
+    def test_components_are_measured_for_every_page(self):
+        """Для каждой страницы есть запросы, контекст, рендер и include."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'baseline.json')
+            call_command('bench_pages', repeat=3, warmup=1,
+                         save_baseline=path, stdout=StringIO())
+            with open(path, encoding='utf-8') as source:
+                results = json.load(source)
+        self.assertEqual(set(results['pages']), set(micro.PAGES))
+        self.assertLessEqual(
+            {'queryset', 'context', 'render', 'render_sql',
+             'include:post_item.html', 'include:paginator.html'},
+            set(results['pages']['index']))
+        self.assertIn('include:author_card.html', results['pages']['post'])
+
+    def test_shells_and_streaming_are_off_while_measuring(self):
+        for mode in ('PAGE_SHELLS', 'STREAMING_LISTINGS'):
+            with self.subTest(mode=mode), self.settings(**{mode: True}):
+                out = StringIO()
+                call_command('bench_pages', 'index', 'group', repeat=2,
+                             warmup=1, stdout=out)
+                self.assertIn('include:post_item.html', out.getvalue())
+
+    def test_page_without_data_is_skipped(self):
+        Group.objects.all().delete()
+        out = StringIO()
+        call_command('bench_pages', 'group', 'index', repeat=1, warmup=0,
+                     stdout=out)
+        self.assertIn('group: нет данных', out.getvalue())
+        self.assertIn('index', out.getvalue())
+
+    def test_render_uses_context_from_view(self):
+        """Шаблон рендерится с тем контекстом, что собрала view."""
+        request = RequestFactory().get('/')
+        request.user = self.reader
+        with micro.captured_render() as calls:
+            micro.PAGES['follow_index'][0](request)
+        template_name, context = calls[0]
+        self.assertEqual(template_name, 'follow.html')
+        self.assertEqual(len(context['page']), 10)
+
+    def test_card_url_cost(self):
+        out = StringIO()
+        call_command('bench_urls', number=50, repeat=2, stdout=out)
+        self.assertIn('reverse', out.getvalue())
+        self.assertIn('links', out.getvalue())
+
+
+class CompareTest(SimpleTestCase):
+    baseline = {'calibration': 10.0, 'pages': {'index': {
+        'render': {'median': 20.0, 'iqr': 1.0},
+        'render_sql': {'median': 0.01, 'iqr': 0.0},
+    }}}
+
+    def results(self, calibration, render, render_sql=0.01):
+        return {'calibration': calibration, 'pages': {'index': {
+            'render': {'median': render, 'iqr': 1.0},
+            'render_sql': {'median': render_sql, 'iqr': 0.0},
+        }}}
+
+    def test_slowdown_past_threshold_is_reported(self):
+        regressions = micro.compare(self.results(10.0, 30.0),
+                                    self.baseline, 15)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('index render', regressions[0])
+
+    def test_slower_machine_is_not_a_regression(self):
+        """Если эталон тоже замедлился, составляющая не регрессировала."""
+        self.assertEqual(
+            micro.compare(self.results(15.0, 30.0), self.baseline, 15), [])
+
+    def test_tiny_components_are_ignored(self):
+        self.assertEqual(micro.compare(
+            self.results(10.0, 20.0, render_sql=0.05), self.baseline, 15),
+            [])
@@ -0,0 +1,165 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import URLResolver, get_resolver, reverse
+
+from perf.budget import QueryRecorder, format_report, growth
+from perf.micro import index_fragment_key
+from posts.cards import fragment_cache
+from posts.models import Comment, Follow, Group, Post, User
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
+
+# Малый набор - по паре записей и комментариев, большой - больше
+# страницы ленты (10) и страницы комментариев (20)
+SMALL, LARGE = 2, 25
+
+CHECKED_APPS = ('posts', 'about')
+
+
+def named_routes():
+    """Имена всех маршрутов приложений из CHECKED_APPS."""
+    names = set()
+    for resolver in get_resolver().url_patterns:
+        if (isinstance(resolver, URLResolver)
+                and resolver.app_name in CHECKED_APPS):
+            names.update(f'{resolver.app_name}:{pattern.name}'
+                         for pattern in resolver.url_patterns)
+    return names
+
+
+class QueryBudgetTest(TestCase):
+    """Число запросов страницы не зависит от объёма данных на ней.
+
+    Каждый именованный маршрут posts и about открывается на малом и на
+    большом наборе данных; запрос, который стал выполняться многократно
+    и чаще, чем на малом наборе, считается N+1 и выводится вместе с SQL
+    и стеком шаблонов.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.media = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.media.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(text='Первая запись',
+                                       author=cls.author, group=cls.group)
+
+    def seed(self, size):
+        """Доводит число записей, комментаторов и комментариев до size."""
+        for i in range(Post.objects.count(), size):
+            Post.objects.create(
+                text=f'Запись {i}', author=self.author, group=self.group,
+                image=SimpleUploadedFile(f'small_{i}.gif', SMALL_GIF,
+                                         content_type='image/gif'))
+        for i in range(User.objects.filter(
+                username__startswith='commenter').count(), size):
+            commenter = User.objects.create_user(username=f'commenter{i}')
+            for post in Post.objects.all()[:size]:
+                Comment.objects.create(post=post, author=commenter,
+                                       text=f'Комментарий {i}')
+
+    def routes(self):
+        """Маршрут -> (аргументы URL, пользователь или None)."""
+        post = {'username': self.author.username, 'post_id': self.post.pk}
+        author = {'username': self.author.username}
+        return {
+            'posts:index': ({}, None),
+            'posts:404': ({}, None),
+            'posts:500': ({}, None),
+            'posts:group': ({'slug': self.group.slug}, None),
+            'posts:new_post': ({}, self.author),
+            'posts:follow_index': ({}, self.reader),
+            'posts:digest': ({}, self.reader),
+            'posts:new_posts': ({}, self.reader),
+            'posts:viewer': ({}, self.reader),
+            'posts:profile': (author, self.reader),
+            'posts:post': (post, self.reader),
+            'posts:post_edit': (post, self.author),
+            'posts:add_comment': (post, self.reader),
+            'posts:post_comments': (post, None),
+            'posts:profile_follow': (author, self.reader),
+            'posts:profile_unfollow': (author, self.reader),
+            'about:author': ({}, None),
+            'about:tech': ({}, None),
+        }
+
+    def measure(self):
+        """Открывает все маршруты и возвращает их QueryRecorder."""
+        recorders = {}
+        for name, (kwargs, user) in self.routes().items():
+            if user is None:
+                self.client.logout()
+            else:
+                self.client.force_login(user)
+            url = reverse(name, kwargs=kwargs)
+            # Первый запрос прогревает миниатюры, как это делает задача
+            # posts.warm_thumbnail; фрагмент главной сбрасывается, чтобы
+            # замерить её рендер, а не кеш
+            self.client.get(url)
+            fragment_cache().delete(index_fragment_key(user))
+            with QueryRecorder() as recorder:
+                response = self.client.get(url)
+            self.assertLess(response.status_code, 500, name)
+            recorders[name] = recorder
+        return recorders
+
+    def test_every_named_route_has_budget(self):
+        """Новый маршрут нельзя добавить, не включив его в проверку."""
+        self.assertEqual(named_routes(), set(self.routes()))
+
+    def test_query_count_does_not_grow_with_data(self):
+        self.seed(SMALL)
+        small = self.measure()
+        self.seed(LARGE)
+        large = self.measure()
+        reports = [
+            format_report(name, small[name], large[name])
+            for name in large if growth(small[name], large[name])
+        ]
+        self.assertFalse(reports, '\n\n'.join(reports))
+
+
+class QueryRecorderTest(TestCase):
+    def test_n_plus_one_reported_with_template_stack(self):
+        """В отчёте есть SQL лишнего запроса и строка шаблона с ним."""
+        author = User.objects.create_user(username='author')
+        template = Template('{% for post in posts %}\n'
+                            '{{ post.author.username }}\n'
+                            '{% endfor %}')
+        recorders = []
+        for size in (1, 3):
+            while Post.objects.count() < size:
+                Post.objects.create(text='Запись', author=author)
+            with QueryRecorder() as recorder:
+                template.render(Context({'posts': Post.objects.all()}))
+            recorders.append(recorder)
+        self.assertTrue(growth(*recorders))
+        report = format_report('test', *recorders)
+        self.assertIn('FROM "auth_user"', report)
+        self.assertIn(':2 post.author.username', report)
@@ -0,0 +1,116 @@
+import json
+import logging
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test import override_settings
+from django.urls import reverse
+
+from perf import replay
+from posts.models import Post, User
+
+
+@override_settings(CAPTURE_SAMPLE_RATE=1.0)
+class RequestCaptureMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='Запись', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def captured(self, *requests):
+        with self.assertLogs('yatube.capture', 'INFO') as logs:
+            for path in requests:
+                self.client.get(path)
+        return [json.loads(record.getMessage()) for record in logs.records]
+
+    def test_route_arguments_and_user_class(self):
+        self.client.force_login(self.author)
+        [record] = self.captured(
+            reverse('posts:post', args=['author', self.post.pk])
+            + '?after=5&password=secret')
+        self.assertEqual(record['r'], 'posts:post')
+        self.assertEqual(record['k'], {'username': 'author',
+                                       'post_id': self.post.pk})
+        self.assertEqual(record['q'], {'after': '5'})
+        self.assertEqual(record['u'], 'user')
+        self.assertEqual(record['s'], 200)
+        self.assertGreater(record['ms'], 0)
+        self.assertEqual(replay.request_path(record),
+                         f'/author/{self.post.pk}/?after=5')
+
+    def test_writes_and_other_namespaces_are_not_captured(self):
+        self.client.force_login(self.author)
+        logger = logging.getLogger('yatube.capture')
+        with self.assertLogs(logger, 'INFO') as logs:
+            self.client.post(reverse('posts:new_post'), {'text': 'Новая'})
+            self.client.get(reverse('signup'))
+            logger.info('граница')
+        self.assertEqual([record.getMessage() for record in logs.records],
+                         ['граница'])
+
+
+class ScheduleTest(SimpleTestCase):
+    def test_intervals_are_scaled_by_rate(self):
+        records = [{'t': 100.0}, {'t': 101.0}, {'t': 104.0}]
+        self.assertEqual([offset for offset, _ in
+                          replay.schedule(records, 2)], [0, 0.5, 2.0])
+        self.assertEqual([offset for offset, _ in
+                          replay.schedule(records, 0)], [0, 0, 0])
+
+
+class ReplayCommandTest(TransactionTestCase):
+    def setUp(self):
+        author = User.objects.create_user(username='author')
+        User.objects.create_user(username='staff', is_staff=True)
+        post = Post.objects.create(text='Запись', author=author)
+        records = [
+            {'t': 0.0, 'm': 'GET', 'r': 'posts:index', 'k': {}, 'q': {},
+             'u': 'anonymous', 's': 200, 'ms': 5},
+            {'t': 0.05, 'm': 'GET', 'r': 'posts:follow_index', 'k': {},
+             'q': {'page': '1'}, 'u': 'user', 's': 200, 'ms': 7},
+            {'t': 0.1, 'm': 'GET', 'r': 'posts:post',
+             'k': {'username': 'author', 'post_id': post.pk}, 'q': {},
+             'u': 'staff', 's': 200, 'ms': 6},
+            {'t': 0.15, 'm': 'GET', 'r': 'posts:removed', 'k': {}, 'q': {},
+             'u': 'anonymous', 's': 200, 'ms': 1},
+        ]
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.log = os.path.join(self.directory.name, 'capture.log')
+        with open(self.log, 'w', encoding='utf-8') as target:
+            for record in records:
+                target.write(json.dumps(record) + '\n')
+
+    def test_replay_and_compare_builds(self):
+        baseline = os.path.join(self.directory.name, 'baseline.json')
+        out = StringIO()
+        call_command('replay_requests', log=self.log, rate=2,
+                     concurrency=1, save_baseline=baseline, stdout=out)
+        with open(baseline, encoding='utf-8') as source:
+            summary = json.load(source)
+        self.assertEqual(set(summary), {'posts:index', 'posts:post',
+                                        'posts:follow_index'})
+        # Лента подписок отвечает 200 только вошедшему пользователю
+        self.assertEqual(summary['posts:follow_index']['errors'], 0)
+        self.assertIn('маршрут не найден: 1', out.getvalue())
+
+        out = StringIO()
+        call_command('replay_requests', log=self.log, rate=0,
+                     baseline=baseline, threshold=10000, stdout=out)
+        self.assertIn('p95, %', out.getvalue())
+        self.assertIn('Регрессий относительно baseline нет',
+                      out.getvalue())
+
+    def test_empty_log_is_reported(self):
+        with self.assertRaises(CommandError):
+            call_command('replay_requests',
+                         log=os.path.join(self.directory.name, 'none.log'),
+                         stdout=StringIO())
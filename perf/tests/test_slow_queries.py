@@ -0,0 +1,123 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+from yatube.slow_queries import SlowQueryLog, read_log, summarize
+
+
+def logged(logs):
+    return [json.loads(record.getMessage()) for record in logs.records]
+
+
+@override_settings(SLOW_QUERY_MS=0, SLOW_QUERY_SAMPLE_RATE=1.0)
+class SlowQueryLogTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(text='Запись', author=cls.author)
+
+    def test_request_queries_are_logged_with_view_and_plan(self):
+        with self.assertLogs('yatube.slow_queries', 'WARNING') as logs:
+            self.client.get(reverse('posts:profile', args=['author']))
+        records = logged(logs)
+        posts = [record for record in records
+                 if 'FROM "posts_post"' in record['sql']]
+        self.assertTrue(posts)
+        record = posts[0]
+        self.assertEqual(record['view'], 'posts:profile')
+        self.assertEqual(record['path'], '/author/')
+        self.assertIn('?', record['fingerprint'])
+        self.assertTrue(record['call_site'].startswith('posts/views.py:'))
+        self.assertTrue(record['plan'])
+        self.assertTrue(all('EXPLAIN' not in record['sql']
+                            for record in records))
+
+    @override_settings(STREAMING_LISTINGS=True)
+    def test_streamed_queries_are_logged(self):
+        response = self.client.get(reverse('posts:index'))
+        with self.assertLogs('yatube.slow_queries', 'WARNING') as logs:
+            b''.join(response.streaming_content)
+        self.assertIn('posts:index',
+                      {record['view'] for record in logged(logs)})
+
+    def test_template_line_is_recorded(self):
+        template = Template('{% for post in posts %}{{ post.text }}'
+                            '{% endfor %}')
+        log = SlowQueryLog(connection, '/')
+        with self.assertLogs('yatube.slow_queries', 'WARNING') as logs:
+            with connection.execute_wrapper(log):
+                template.render(Context({'posts': Post.objects.all()}))
+        record = logged(logs)[0]
+        self.assertEqual(len(record['templates']), 1)
+        self.assertIn('for post in posts', record['templates'][0])
+
+    def test_sensitive_params_are_hidden(self):
+        with self.assertLogs('yatube.slow_queries', 'WARNING') as logs:
+            with connection.execute_wrapper(SlowQueryLog(connection, '/')):
+                User.objects.filter(username='author').exists()
+        self.assertEqual(logged(logs)[0]['params'], '***')
+
+    @override_settings(SLOW_QUERY_SAMPLE_RATE=0)
+    def test_sampling(self):
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('yatube.slow_queries', 'WARNING'):
+                self.client.get(reverse('posts:index'))
+
+
+class SlowQueriesCommandTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'slow_queries.log')
+
+    def write(self, path, *records):
+        with open(path, 'w', encoding='utf-8') as target:
+            for record in records:
+                target.write(json.dumps(record) + '\n')
+            target.write('не JSON\n')
+
+    def record(self, fingerprint, duration, plan, rate=1.0):
+        return {'view': 'posts:index', 'path': '/',
+                'duration_ms': duration, 'sample_rate': rate,
+                'fingerprint': fingerprint, 'sql': fingerprint,
+                'params': ['1'], 'call_site': 'posts/views.py:10 in index',
+                'templates': [], 'plan': plan}
+
+    def test_rotated_logs_are_summed_and_sampling_weighted(self):
+        self.write(f'{self.path}.1',
+                   self.record('SELECT a', 100, ['SCAN old']))
+        self.write(self.path,
+                   self.record('SELECT a', 50, ['SEARCH new']),
+                   self.record('SELECT b', 30, None, rate=0.1))
+        offenders = {entry['fingerprint']: entry
+                     for entry in summarize(read_log(self.path))}
+        self.assertEqual(offenders['SELECT a']['count'], 2)
+        self.assertEqual(offenders['SELECT a']['total_ms'], 150)
+        self.assertEqual(offenders['SELECT a']['max_ms'], 100)
+        self.assertEqual(offenders['SELECT a']['plan'], ['SEARCH new'])
+        self.assertAlmostEqual(offenders['SELECT b']['total_ms'], 300)
+
+    def test_command_orders_by_total_time(self):
+        self.write(self.path,
+                   self.record('SELECT a', 100, ['SCAN posts_post']),
+                   self.record('SELECT b', 30, None, rate=0.1))
+        out = StringIO()
+        call_command('slow_queries', log=self.path, stdout=out)
+        text = out.getvalue()
+        self.assertLess(text.index('SELECT b'), text.index('SELECT a'))
+        self.assertIn('план: SCAN posts_post', text)
+        self.assertIn('posts/views.py:10 in index', text)
+
+    def test_empty_log(self):
+        out = StringIO()
+        call_command('slow_queries', log=self.path, stdout=out)
+        self.assertIn('нет', out.getvalue())
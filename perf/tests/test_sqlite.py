@@ -0,0 +1,41 @@
+import os
+import sqlite3
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from yatube.sqlite.base import DEFAULT_PRAGMAS, apply_pragmas
+
+
+class SqliteProfileTest(SimpleTestCase):
+    def test_pragmas_enable_wal(self):
+        """Профиль включает WAL и synchronous=NORMAL для файла БД."""
+        with tempfile.TemporaryDirectory() as directory:
+            db = sqlite3.connect(os.path.join(directory, 'test.sqlite3'))
+            apply_pragmas(db, DEFAULT_PRAGMAS)
+            journal_mode = db.execute('PRAGMA journal_mode').fetchone()[0]
+            synchronous = db.execute('PRAGMA synchronous').fetchone()[0]
+            db.close()
+        self.assertEqual(journal_mode, 'wal')
+        self.assertEqual(synchronous, 1)
+
+    def test_bench_sqlite_reports_both_profiles(self):
+        """bench_sqlite сравнивает стандартный и настроенный профили."""
+        out = StringIO()
+        call_command('bench_sqlite', threads=2, seconds=0.2, rows=100,
+                     stdout=out)
+        self.assertIn('baseline', out.getvalue())
+        self.assertIn('tuned', out.getvalue())
+
+
+class SqliteBackendTest(TestCase):
+    def test_connection_uses_profile(self):
+        """Соединение проекта открыто бэкендом yatube.sqlite."""
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0],
+                             DEFAULT_PRAGMAS['busy_timeout'])
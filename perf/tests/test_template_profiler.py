@@ -0,0 +1,94 @@
+import os
+import re
+import shutil
+import tempfile
+import time
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Post, User
+from yatube.template_profiler import Profiler, profiling
+
+FOLDED_LINE = re.compile(r'^[^;]+(;[^;]+)* \d+$')
+
+
+class TemplateProfilerTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(text=f'Запись {number}', author=cls.author)
+            for number in range(3))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_include_in_loop_is_a_single_stack(self):
+        """Все записи ленты рендерятся через один и тот же стек
+        index.html -> ... -> include -> includes/post_item.html."""
+        with profiling() as profiler:
+            self.client.get(reverse('posts:index'))
+        rows = {name: (calls, cumulative, own)
+                for name, calls, cumulative, own in profiler.table()}
+        self.assertEqual(rows['includes/post_item.html'][0], 3)
+        self.assertEqual(rows['index.html'][0], 1)
+        for calls, cumulative, own in rows.values():
+            self.assertGreaterEqual(cumulative + 1e-9, own)
+        stacks = [path for path in profiler.self_times
+                  if path[-1] == 'includes/post_item.html']
+        self.assertEqual(len(stacks), 1)
+        self.assertEqual(stacks[0][0], 'index.html')
+        self.assertTrue(stacks[0][-2].startswith('{% include '))
+
+    def test_folded_output(self):
+        with profiling() as profiler:
+            self.client.get(reverse('posts:profile', args=['author']))
+        lines = profiler.folded().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            self.assertRegex(line, FOLDED_LINE)
+
+    def test_self_time_excludes_children(self):
+        profiler = Profiler()
+        outer = profiler.enter('outer')
+        inner = profiler.enter('inner')
+        time.sleep(0.01)
+        profiler.exit(inner)
+        profiler.exit(outer)
+        self.assertLess(profiler.self_times[('outer',)], 0.005)
+        self.assertGreaterEqual(profiler.self_times[('outer', 'inner')],
+                                0.01)
+        self.assertGreaterEqual(profiler.cumulative['outer'], 0.01)
+
+    def test_not_profiled_outside_block(self):
+        profiler = Profiler()
+        with profiling(profiler):
+            pass
+        self.client.get(reverse('posts:index'))
+        self.assertFalse(profiler.calls)
+
+    def test_command_profiles_page(self):
+        """Фрагмент главной сбрасывается перед каждым повтором, поэтому
+        все три записи рендерятся в каждом из них."""
+        for user in (None, 'author'):
+            with self.subTest(user=user):
+                out = StringIO()
+                call_command('profile_templates', '/', repeat=2, user=user,
+                             top=100, stdout=out)
+                self.assertRegex(
+                    out.getvalue(),
+                    r"\s3  \{% include 'includes/post_item.html'")
+
+    def test_middleware_writes_file_per_request(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with self.settings(TEMPLATE_PROFILE_DIR=directory):
+            self.client.get(reverse('posts:index'))
+        names = os.listdir(directory)
+        self.assertEqual(len(names), 1)
+        self.assertTrue(names[0].startswith('posts.index-'))
+        self.assertTrue(names[0].endswith('.folded'))
@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+import re
+import tempfile
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post, User
+from yatube.logs import WatchedFileHandler
+
+
+def server_timing(response):
+    """{'sql': {'dur': '1.2', 'desc': '3 queries'}, ...}"""
+    metrics = {}
+    for entry in response['Server-Timing'].split(', '):
+        name, *params = entry.split(';')
+        metrics[name] = dict(
+            re.match(r'(\w+)="?([^"]*)"?', param).groups()
+            for param in params)
+    return metrics
+
+
+@override_settings(SERVER_TIMING_HEADER=True)
+class ServerTimingMiddlewareTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(text='Запись', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_header_reports_components(self):
+        """В Server-Timing есть SQL, шаблоны, кеш, view и весь запрос."""
+        response = self.client.get(reverse('posts:index'))
+        metrics = server_timing(response)
+        self.assertEqual(set(metrics), {'sql', 'tpl', 'cache', 'view',
+                                        'total'})
+        self.assertRegex(metrics['sql']['desc'], r'^[1-9]\d* queries$')
+        self.assertGreater(float(metrics['tpl']['dur']), 0)
+        self.assertGreaterEqual(float(metrics['total']['dur']),
+                                float(metrics['view']['dur']))
+
+    def test_cache_hits_and_misses_are_counted(self):
+        """Первый рендер главной - промах кеша фрагмента, второй - попадание,
+        и запрос ленты во второй раз не выполняется."""
+        first = server_timing(self.client.get(reverse('posts:index')))
+        second = server_timing(self.client.get(reverse('posts:index')))
+        self.assertIn('hits=0', first['cache']['desc'])
+        self.assertNotIn('hits=0', second['cache']['desc'])
+        self.assertLess(int(second['sql']['desc'].split()[0]),
+                        int(first['sql']['desc'].split()[0]))
+
+    def test_log_line_is_keyed_by_url_name(self):
+        with self.assertLogs('yatube.timing', 'INFO') as logs:
+            self.client.get(reverse('posts:profile', args=['author']))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['url_name'], 'posts:profile')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['sql_count'], 0)
+
+    @override_settings(STREAMING_LISTINGS=True)
+    def test_streamed_body_is_logged_when_read(self):
+        """Запросы и рендер карточек потокового ответа попадают в лог,
+        а заголовок помечает, что тело в нём не учтено."""
+        with self.assertLogs('yatube.timing', 'INFO') as logs:
+            response = self.client.get(reverse('posts:index'))
+            header = server_timing(response)
+            self.assertEqual(logs.output, [])
+            b''.join(response.streaming_content)
+        self.assertEqual(header['stream']['desc'], 'body not included')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertTrue(record['streamed'])
+        self.assertGreater(record['sql_count'],
+                           int(header['sql']['desc'].split()[0]))
+        self.assertGreater(record['template_ms'],
+                           float(header['tpl']['dur']))
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_header_can_be_disabled(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class ServerTimingDefaultTest(TestCase):
+    def test_header_is_off_by_default(self):
+        """Без настройки клиенты не видят Server-Timing, лог пишется."""
+        with self.assertLogs('yatube.timing', 'INFO'):
+            response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+class WatchedFileHandlerTest(SimpleTestCase):
+    def test_directory_is_created_on_first_record(self):
+        """Каталог появляется при первой записи, а после внешней
+        ротации строки идут в новый файл."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'logs', 'timing.log')
+            handler = WatchedFileHandler(path, delay=True)
+            self.assertFalse(os.path.exists(os.path.dirname(path)))
+            handler.emit(logging.makeLogRecord({'msg': 'первая'}))
+            os.rename(path, path + '.1')
+            handler.emit(logging.makeLogRecord({'msg': 'вторая'}))
+            handler.close()
+            with open(path, encoding='utf-8') as source:
+                self.assertEqual(source.read(), 'вторая\n')
@@ -1,12 +1,28 @@
 from django.contrib import admin
+from django.db import transaction
 
-from .models import Comment, Follow, Group, Post
+from .models import (Comment, Digest, Follow, Group, Post,
+                     decrement_comment_counts)
+from .paginators import EstimatedCountPaginator
 
 
-class PostAdmin(admin.ModelAdmin):
+class LargeTableAdminMixin:
+    """Режим для больших таблиц: приблизительный счётчик строк вместо
+    COUNT(*) по всей таблице и без второго COUNT для «Показать все».
+
+    date_hierarchy в этом режиме не задаётся: на каждой загрузке списка
+    он считает Min/Max и dates() по всей таблице.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class PostAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ("pk", "text", "pub_date", "author", "group")
+    list_select_related = ("author", "group")
     search_fields = ("text",)
     list_filter = ("pub_date",)
+    autocomplete_fields = ("author", "group")
     empty_value_display = "-пусто-"
 
 
@@ -17,18 +33,36 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = "-пусто-"
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('author', 'text', 'post', 'created')
+    list_select_related = ('author', 'post')
     list_filter = ('created', )
-    search_fields = ('author', 'text')
+    search_fields = ('author__username', 'text')
+    autocomplete_fields = ('author', 'post')
 
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            decrement_comment_counts(queryset)
+            super().delete_queryset(request, queryset)
 
-class FollowAdmin(admin.ModelAdmin):
+
+class FollowAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('user', 'author')
-    search_fields = ('user', 'author')
+    list_select_related = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
+    autocomplete_fields = ('user', 'author')
+
+
+class DigestAdmin(admin.ModelAdmin):
+    list_display = ('user', 'frequency', 'last_sent')
+    list_select_related = ('user',)
+    list_filter = ('frequency',)
+    search_fields = ('user__username',)
+    autocomplete_fields = ('user',)
 
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group, GroupAdmin)
 admin.site.register(Comment, CommentAdmin)
 admin.site.register(Follow, FollowAdmin)
+admin.site.register(Digest, DigestAdmin)
@@ -0,0 +1,81 @@
+"""Кеш HTML карточек записей в списках.
+
+Карточка (текст, ссылки на автора и сообщество, дата, миниатюра,
+последние комментарии) меняется, только когда запись редактируют или к
+ней добавляют или удаляют комментарий, поэтому её HTML кешируется по
+ключу (id, updated_at, comment_count): комментарии тоже сдвигают
+updated_at, иначе удаление одного и добавление другого оставили бы
+ключ прежним. Кнопка «Редактировать» зависит от того,
+кто смотрит страницу: карточка хранится двумя кусками - до и после
+кнопки, а кнопка рендерится на каждом запросе
+(includes/post_edit_button.html).
+
+Переименование автора или сообщества ключ не меняет: такие карточки
+обновятся через POST_CARD_TIMEOUT секунд.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .prefetch import prefetch_latest_comments
+
+CARD_TEMPLATE = 'includes/post_card.html'
+# Увеличивается при изменении разметки карточки, чтобы не отдавать
+# закешированный старый HTML
+VERSION = 1
+EDIT_MARKER = mark_safe('<!-- post-card-edit -->')
+
+Card = namedtuple('Card', 'head tail')
+
+
+def fragment_cache():
+    """Кеш фрагментов, как у {% cache %}: template_fragments, если он
+    настроен, иначе default."""
+    try:
+        return caches['template_fragments']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def card_key(post):
+    return (f'post_card:{VERSION}:{post.pk}:'
+            f'{post.updated_at.timestamp()}:{post.comment_count}')
+
+
+def render_card(post):
+    """(HTML до кнопки «Редактировать», HTML после неё)."""
+    html = render_to_string(CARD_TEMPLATE, {'post': post,
+                                            'edit_marker': EDIT_MARKER})
+    head, _, tail = html.partition(EDIT_MARKER)
+    return head, tail
+
+
+def attach_cards(posts, comments_limit):
+    """Кладёт в post.card карточку каждого поста.
+
+    Карточки страницы читаются из кеша одним get_many. Недостающие
+    рендерятся - последние комментарии для них выбираются одним запросом
+    (prefetch_latest_comments) - и сохраняются одним set_many. Возвращает
+    список постов, поэтому подходит для page.object_list.
+    """
+    posts = list(posts)
+    if not posts:
+        return posts
+    cache = fragment_cache()
+    keys = {post.pk: card_key(post) for post in posts}
+    cards = cache.get_many(list(keys.values()))
+    missing = [post for post in posts if keys[post.pk] not in cards]
+    rendered = {
+        keys[post.pk]: render_card(post)
+        for post in prefetch_latest_comments(missing, comments_limit)
+    }
+    if rendered:
+        cache.set_many(rendered, settings.POST_CARD_TIMEOUT)
+        cards.update(rendered)
+    for post in posts:
+        head, tail = cards[keys[post.pk]]
+        post.card = Card(mark_safe(head), mark_safe(tail))
+    return posts
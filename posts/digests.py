@@ -0,0 +1,84 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Digest, Post
+
+DIGEST_BATCH_SIZE = 200
+DIGEST_MAX_POSTS = 20
+
+
+def due_digests(now):
+    """Подписки на рассылку, у которых подошёл срок очередного письма."""
+    due = Q()
+    for frequency, interval in Digest.INTERVALS.items():
+        due |= Q(frequency=frequency, last_sent__lte=now - interval)
+    return Digest.objects.filter(due)
+
+
+def collect_posts(digests, now):
+    """Новые записи избранных авторов для пачки подписок одним запросом.
+
+    Возвращает словарь user_id -> список записей от новых к старым.
+    """
+    posts = Post.objects.filter(
+        author__following__user__digest__in=digests,
+        pub_date__gt=F('author__following__user__digest__last_sent'),
+        pub_date__lte=now,
+    ).annotate(
+        recipient=F('author__following__user_id')
+    ).select_related('author', 'group').order_by('recipient', '-pub_date')
+    by_user = defaultdict(list)
+    for post in posts:
+        by_user[post.recipient].append(post)
+    return by_user
+
+
+def build_messages(digests, posts_by_user):
+    messages = []
+    for digest in digests:
+        posts = posts_by_user.get(digest.user_id)
+        if not posts or not digest.user.email:
+            continue
+        body = render_to_string('posts/email/digest.txt', {
+            'user': digest.user,
+            'posts': posts[:DIGEST_MAX_POSTS],
+            'more': max(len(posts) - DIGEST_MAX_POSTS, 0),
+            'site_url': settings.SITE_URL,
+        })
+        messages.append(EmailMessage(
+            subject='Новые записи избранных авторов',
+            body=body,
+            to=[digest.user.email],
+        ))
+    return messages
+
+
+def send_digests():
+    """Рассылает все подошедшие по сроку письма пачками.
+
+    На пачку - один запрос за записями и одно почтовое соединение,
+    после отправки отметка last_sent сдвигается для всей пачки сразу.
+    Возвращает число отправленных писем.
+    """
+    now = timezone.now()
+    sent = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            due_digests(now).filter(pk__gt=last_pk).select_related(
+                'user').order_by('pk')[:DIGEST_BATCH_SIZE]
+        )
+        if not batch:
+            return sent
+        last_pk = batch[-1].pk
+        messages = build_messages(batch, collect_posts(batch, now))
+        if messages:
+            connection = get_connection(settings.JOBS_EMAIL_BACKEND)
+            sent += connection.send_messages(messages) or 0
+        Digest.objects.filter(
+            pk__in=[digest.pk for digest in batch]).update(last_sent=now)
@@ -2,7 +2,7 @@ from django import forms
 from django.core.exceptions import ValidationError
 from pytils.translit import slugify
 
-from .models import Comment, Post
+from .models import Comment, Digest, Post
 
 
 class PostForm(forms.ModelForm):
@@ -35,3 +35,11 @@ class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
         fields = ('text',)
+
+
+class DigestForm(forms.ModelForm):
+    """Форма настройки рассылки новых записей"""
+
+    class Meta:
+        model = Digest
+        fields = ('frequency',)
@@ -0,0 +1,76 @@
+"""Быстрое построение адресов маршрутов posts.
+
+reverse на каждом вызове ищет пространство имён, перебирает варианты
+шаблона, подставляет аргументы и проверяет результат регулярным
+выражением, а карточка записи строит так четыре-пять адресов. Здесь
+каждый маршрут один раз на процесс превращается в строку формата (её
+даёт сам reverse с аргументами-метками), и адрес собирается подстановкой.
+Для допустимых аргументов результат совпадает с reverse; регулярным
+выражением он не проверяется.
+"""
+from functools import lru_cache
+from urllib.parse import quote
+
+from django.conf import settings
+from django.urls import NoReverseMatch, get_resolver, get_script_prefix
+from django.urls import get_urlconf, reverse
+from django.utils.http import RFC3986_SUBDELIMS
+
+NAMESPACE = 'posts'
+SAFE = RFC3986_SUBDELIMS + '/~:@'
+# Метки подходят под конвертеры str, slug, int и path
+MARKER = 918273645000
+
+
+class Pattern:
+    def __init__(self, template, converters):
+        self.template = template
+        self.converters = converters
+
+    def build(self, args):
+        return self.template.format(*(
+            quote(str(converter.to_url(value) if converter else value),
+                  safe=SAFE)
+            for converter, value in zip(self.converters, args)))
+
+
+@lru_cache(maxsize=None)
+def patterns(urlconf, namespace=NAMESPACE):
+    """{имя маршрута: Pattern} пространства имён; адреса без префикса
+    скрипта."""
+    resolver = get_resolver(urlconf)
+    instances = resolver.app_dict.get(namespace, [namespace])
+    instance = namespace if namespace in instances else instances[0]
+    _, namespace_resolver = resolver.namespace_dict[instance]
+    compiled = {}
+    for name in namespace_resolver.reverse_dict:
+        if not isinstance(name, str):
+            continue
+        possibilities, _, _, converters = (
+            namespace_resolver.reverse_dict.getlist(name)[0])
+        params = possibilities[0][1]
+        markers = [str(MARKER + number) for number in range(len(params))]
+        try:
+            path = reverse(f'{namespace}:{name}', urlconf=urlconf,
+                           args=markers)
+        except NoReverseMatch:
+            continue
+        template = path[len(get_script_prefix()):]
+        template = template.replace('{', '{{').replace('}', '}}')
+        for number, marker in enumerate(markers):
+            template = template.replace(marker, f'{{{number}}}')
+        compiled[name] = Pattern(
+            template, [converters.get(param) for param in params])
+    return compiled
+
+
+def url(name, *args):
+    """Как reverse(name, args=args), но для posts:* без резолвера."""
+    namespace, _, view = name.rpartition(':')
+    pattern = None
+    if namespace == NAMESPACE:
+        urlconf = get_urlconf() or settings.ROOT_URLCONF
+        pattern = patterns(urlconf).get(view)
+    if pattern is None or len(args) != len(pattern.converters):
+        return reverse(name, args=args)
+    return get_script_prefix() + pattern.build(args)
@@ -0,0 +1,45 @@
+import threading
+import time
+from collections import deque
+
+
+class PostChannel:
+    """Канал уведомлений о новых записях внутри процесса.
+
+    Ожидающие запросы спят на Condition и просыпаются при публикации,
+    а не опрашивают БД. Канал помнит последние history записей (id и
+    автора), чтобы без запроса к БД понять, касается ли новость
+    ленты подписок конкретного пользователя.
+    """
+
+    def __init__(self, history=256):
+        self._condition = threading.Condition()
+        self._recent = deque(maxlen=history)
+
+    def publish(self, post_id, author_id):
+        with self._condition:
+            self._recent.append((post_id, author_id))
+            self._condition.notify_all()
+
+    def wait(self, since, authors=None, timeout=25):
+        """Ждёт запись новее since (от авторов authors, если заданы).
+
+        Возвращает True, если такая запись появилась, и False по таймауту.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while not self._has_news(since, authors):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+    def _has_news(self, since, authors):
+        return any(
+            post_id > since and (authors is None or author_id in authors)
+            for post_id, author_id in self._recent
+        )
+
+
+channel = PostChannel()
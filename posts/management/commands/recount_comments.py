@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает Post.comment_count порциями по диапазонам pk.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Сколько постов пересчитывать в одной транзакции.'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        bounds = Post.objects.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            self.stdout.write('Постов нет, пересчитывать нечего.')
+            return
+        counts = Comment.objects.filter(post=OuterRef('pk')).order_by(
+        ).values('post').annotate(total=Count('pk')).values('total')
+        fixed = 0
+        for start in range(bounds['low'], bounds['high'] + 1, chunk_size):
+            chunk = Post.objects.filter(
+                pk__gte=start, pk__lt=start + chunk_size)
+            with transaction.atomic():
+                # Обновляем только расходящиеся строки, чтобы не писать
+                # в таблицу лишний раз.
+                stale = chunk.annotate(
+                    actual=Coalesce(Subquery(counts), 0)
+                ).exclude(comment_count=F('actual'))
+                fixed += chunk.filter(pk__in=stale.values('pk')).update(
+                    comment_count=Coalesce(Subquery(counts), 0))
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчёт завершён, исправлено постов: {fixed}'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.replica import sync_replica
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную SQLite-базу в файл реплики для чтения.'
+
+    def handle(self, *args, **options):
+        path = sync_replica()
+        self.stdout.write(self.style.SUCCESS(f'Реплика обновлена: {path}'))
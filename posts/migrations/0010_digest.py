@@ -0,0 +1,30 @@
+# Generated by Django 2.2.28 on 2026-10-19 08:37
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0009_post_comment_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Digest',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequency', models.CharField(choices=[('off', 'Не присылать'), ('daily', 'Раз в день'), ('weekly', 'Раз в неделю')], default='off', help_text='Как часто присылать письмо с новыми записями избранных авторов', max_length=10, verbose_name='Частота рассылки')),
+                ('last_sent', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Последняя рассылка')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='digest', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='digest',
+            index=models.Index(fields=['frequency', 'last_sent'], name='digest_due_idx'),
+        ),
+    ]
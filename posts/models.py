@@ -1,6 +1,11 @@
+from datetime import timedelta
+
 from django.contrib.auth import get_user_model
-from django.db import models
-from django.db.models import UniqueConstraint
+from django.db import models, transaction
+from django.db.models import (Count, F, OuterRef, PositiveIntegerField,
+                              Subquery, UniqueConstraint)
+from django.db.models.functions import Greatest
+from django.utils import timezone
 from pytils.translit import slugify
 
 User = get_user_model()
@@ -12,14 +17,22 @@ class Post(models.Model):
     pub_date = models.DateTimeField("date Published",
                                     auto_now_add=True,
                                     db_index=True)
+    # Меняется при каждом save(), добавлении и удалении комментария; входит
+    # в ключ кеша карточки (posts.cards)
+    updated_at = models.DateTimeField(auto_now=True,
+                                      verbose_name='Дата изменения')
+    # Отдельные индексы по author и group не нужны: их покрывают
+    # составные индексы из Meta.indexes
     author = models.ForeignKey(User,
                                on_delete=models.CASCADE,
                                related_name='posts',
+                               db_index=False,
                                verbose_name='Автор',
                                help_text='Укажите автора')
     group = models.ForeignKey('Group',
                               on_delete=models.SET_NULL,
                               related_name='posts',
+                              db_index=False,
                               verbose_name='Сообщество',
                               help_text='Укажите сообщество',
                               blank=True,
@@ -29,9 +42,23 @@ class Post(models.Model):
                               null=True,
                               verbose_name='Картинка',
                               help_text='Загрузите картинку')
+    # Денормализованный счётчик: обновляется сигналами Comment,
+    # пересчитывается командой recount_comments
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число комментариев'
+    )
 
     class Meta:
         ordering = ['-pub_date']
+        # Под запросы лент: WHERE group/author = ? ORDER BY pub_date DESC
+        indexes = [
+            models.Index(fields=['group', '-pub_date'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date'],
+                         name='post_author_pub_date_idx'),
+        ]
 
     def __str__(self):
         return str(self.text[:15])
@@ -60,11 +87,30 @@ class Group(models.Model):
         super().save(*args, **kwargs)
 
 
+def decrement_comment_counts(comments):
+    """Вычитает комментарии из Post.comment_count их постов одним UPDATE.
+
+    Счётчик не ведёт сигнал post_delete: с обработчиком Django перестаёт
+    удалять комментарии одним запросом и при удалении поста загружает
+    каждый из них. Поэтому удаление выборки комментариев вызывает эту
+    функцию само; каскад от поста счётчик не трогает, пост удаляется.
+    """
+    removed = (comments.filter(post=OuterRef('pk')).order_by()
+               .values('post').annotate(total=Count('pk')).values('total'))
+    Post.objects.filter(pk__in=comments.order_by().values('post')).update(
+        comment_count=Greatest(
+            F('comment_count')
+            - Subquery(removed, output_field=PositiveIntegerField()),
+            0),
+        updated_at=timezone.now())
+
+
 class Comment(models.Model):
     post = models.ForeignKey(Post,
                              verbose_name='Пост',
                              on_delete=models.CASCADE,
-                             related_name='comments')
+                             related_name='comments',
+                             db_index=False)
     author = models.ForeignKey(User,
                                verbose_name='Автор комментария',
                                on_delete=models.CASCADE,
@@ -76,18 +122,71 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            Post.objects.filter(pk=self.post_id, comment_count__gt=0).update(
+                comment_count=F('comment_count') - 1,
+                updated_at=timezone.now())
+            return super().delete(*args, **kwargs)
 
 
 class Follow(models.Model):
     user = models.ForeignKey(User, verbose_name='Подписчик',
                              on_delete=models.CASCADE,
-                             related_name='follower')
+                             related_name='follower',
+                             db_index=False)
     author = models.ForeignKey(User, verbose_name='Автор',
                                on_delete=models.CASCADE,
                                related_name='following')
 
     class Meta:
-        UniqueConstraint(
-            name='unique_follow',
-            fields=['user', 'author']
-        )
+        constraints = [
+            UniqueConstraint(
+                name='unique_follow',
+                fields=['user', 'author']
+            ),
+        ]
+
+
+class Digest(models.Model):
+    OFF = 'off'
+    DAILY = 'daily'
+    WEEKLY = 'weekly'
+    FREQUENCY_CHOICES = (
+        (OFF, 'Не присылать'),
+        (DAILY, 'Раз в день'),
+        (WEEKLY, 'Раз в неделю'),
+    )
+    INTERVALS = {
+        DAILY: timedelta(days=1),
+        WEEKLY: timedelta(days=7),
+    }
+
+    user = models.OneToOneField(User,
+                                on_delete=models.CASCADE,
+                                related_name='digest',
+                                verbose_name='Подписчик')
+    frequency = models.CharField(max_length=10,
+                                 choices=FREQUENCY_CHOICES,
+                                 default=OFF,
+                                 verbose_name='Частота рассылки',
+                                 help_text='Как часто присылать письмо с '
+                                           'новыми записями избранных '
+                                           'авторов')
+    # Записи новее этой отметки ещё не попадали в письмо
+    last_sent = models.DateTimeField(default=timezone.now,
+                                     verbose_name='Последняя рассылка')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['frequency', 'last_sent'],
+                         name='digest_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.get_frequency_display()}'
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор для больших таблиц.
+
+    Для нефильтрованной выборки вместо полного COUNT(*) берёт оценку числа
+    строк из статистики СУБД (PostgreSQL) или максимальный первичный ключ
+    (SQLite, берётся из индекса). Если в выборке есть условия (поиск,
+    фильтры), считает точно.
+
+    После удалений оценка больше настоящего числа строк, и последние
+    страницы по ней пусты. Пустую страницу после первой пагинатор не
+    отдаёт: пересчитывает строки точно и возвращает последнюю непустую.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where:
+            return super().count
+        estimate = self._estimate(self.object_list)
+        if estimate is None:
+            return super().count
+        return estimate
+
+    def page(self, number):
+        page = super().page(number)
+        if page.number == 1 or page.object_list:
+            return page
+        self.count = Paginator.count.func(self)
+        self.__dict__.pop('num_pages', None)
+        return super().page(min(page.number, self.num_pages))
+
+    @staticmethod
+    def _estimate(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] > 0:
+                return int(row[0])
+            return None
+        if connection.vendor == 'sqlite':
+            max_pk = queryset.model._default_manager.using(
+                queryset.db).aggregate(max_pk=Max('pk'))['max_pk']
+            return max_pk or 0
+        return None
+
+
+def encode_cursor(created, pk):
+    """Курсор keyset-пагинации: время в микросекундах и pk через дефис."""
+    delta = created - EPOCH
+    microseconds = (delta.days * 86400 + delta.seconds) * 10 ** 6
+    return f'{microseconds + delta.microseconds}-{pk}'
+
+
+def decode_cursor(cursor):
+    """Разбирает курсор; для испорченного значения возвращает None."""
+    try:
+        microseconds, pk = (int(part) for part in cursor.split('-'))
+    except (AttributeError, ValueError):
+        return None
+    return EPOCH + timedelta(microseconds=microseconds), pk
+
+
+def keyset_page(queryset, cursor, per_page, field='created'):
+    """Страница выборки «от новых к старым» без OFFSET.
+
+    Возвращает срез queryset (по-прежнему QuerySet) и курсор следующей
+    страницы или None, если дальше ничего нет. Условие по (field, pk)
+    обслуживается индексом, поэтому стоимость не растёт с номером
+    страницы.
+    """
+    queryset = queryset.order_by(f'-{field}', '-pk')
+    position = decode_cursor(cursor) if cursor else None
+    if position is not None:
+        queryset = queryset.filter(_after(field, *position))
+    page = queryset[:per_page]
+    rows = list(page)
+    if len(rows) < per_page:
+        return page, None
+    last = rows[-1]
+    value = getattr(last, field)
+    if not queryset.filter(_after(field, value, last.pk)).exists():
+        return page, None
+    return page, encode_cursor(value, last.pk)
+
+
+def _after(field, value, pk):
+    return Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk})
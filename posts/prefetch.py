@@ -0,0 +1,65 @@
+from collections import defaultdict
+
+from django.db import connection
+
+from .models import Comment
+
+RANKED_SQL = (
+    'SELECT ranked.id FROM ('
+    'SELECT c.{pk} AS id, ROW_NUMBER() OVER ('
+    'PARTITION BY c.{post} ORDER BY c.{created} DESC, c.{pk} DESC'
+    ') AS position FROM {table} c WHERE c.{post} IN ({ids})'
+    ') ranked WHERE ranked.position <= %s'
+)
+
+# Для СУБД без оконных функций: коррелированный подзапрос с LIMIT
+# на каждый пост, который обслуживается индексом (post, created).
+CORRELATED_SQL = (
+    'SELECT c.{pk} FROM {table} c WHERE c.{post} IN ({ids}) '
+    'AND c.{pk} IN (SELECT latest.{pk} FROM {table} latest '
+    'WHERE latest.{post} = c.{post} '
+    'ORDER BY latest.{created} DESC, latest.{pk} DESC LIMIT %s)'
+)
+
+
+def supports_window_functions():
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 25, 0)
+    return connection.features.supports_over_clause
+
+
+def prefetch_latest_comments(posts, limit):
+    """Кладёт в post.latest_comments до limit последних комментариев
+    каждого поста.
+
+    Все комментарии для страницы выбираются одним запросом (ROW_NUMBER()
+    по постам) вместе с авторами. Возвращает список постов, поэтому
+    подходит для page.object_list.
+    """
+    posts = list(posts)
+    if not posts:
+        return posts
+    opts = Comment._meta
+    quote = connection.ops.quote_name
+    template = (RANKED_SQL if supports_window_functions()
+                else CORRELATED_SQL)
+    sql = template.format(
+        table=quote(opts.db_table),
+        pk=quote(opts.pk.column),
+        post=quote(opts.get_field('post').column),
+        created=quote(opts.get_field('created').column),
+        ids=', '.join(['%s'] * len(posts)),
+    )
+    params = [post.pk for post in posts] + [limit]
+    # pk__in=RawSQL(...) оборачивает подзапрос в двойные скобки, и SQLite
+    # считает его скалярным, поэтому условие передаётся через extra().
+    comments = Comment.objects.extra(
+        where=[f'{quote(opts.db_table)}.{quote(opts.pk.column)} IN ({sql})'],
+        params=params
+    ).select_related('author').order_by('-created', '-pk')
+    by_post = defaultdict(list)
+    for comment in comments:
+        by_post[comment.post_id].append(comment)
+    for post in posts:
+        post.latest_comments = by_post[post.pk]
+    return posts
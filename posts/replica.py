@@ -0,0 +1,35 @@
+import os
+import sqlite3
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+
+
+def sync_replica():
+    """Снимает консистентную копию default в REPLICA_PATH.
+
+    Копия пишется во временный файл через sqlite3 backup API и
+    подменяет реплику атомарно, поэтому читатели видят либо старую,
+    либо новую копию целиком. Читатели видят новую копию со следующего
+    соединения, поэтому у реплики CONN_MAX_AGE = 0.
+    """
+    if connections['default'].vendor != 'sqlite':
+        raise ImproperlyConfigured(
+            'Реплика-копия поддерживается только для SQLite')
+    source_path = settings.DATABASES['default']['NAME']
+    target_path = settings.REPLICA_PATH
+    temp_path = f'{target_path}.tmp'
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(temp_path)
+    try:
+        source.backup(target)
+        target.execute('PRAGMA journal_mode = DELETE')
+    finally:
+        target.close()
+        source.close()
+    os.replace(temp_path, target_path)
+    # Открытое соединение читало бы подменённый старый файл
+    if 'replica' in connections:
+        connections['replica'].close()
+    return target_path
@@ -0,0 +1,75 @@
+"""Страницы-оболочки: общий кеш списков записей для всех пользователей.
+
+Главная, группа и профиль отличаются у разных пользователей только
+навигацией, вкладками, кнопкой подписки и кнопками «Редактировать». В
+режиме PAGE_SHELLS view рендерится как для анонима, но с
+request.page_shell = True: шаблоны выводят все варианты этих частей
+скрытыми (includes/nav_shell.html, classes js-*), и страница
+кешируется на PAGE_SHELL_TIMEOUT секунд одна на всех по адресу. Данные
+пользователя страница получает одним запросом к posts:viewer
+(includes/viewer.html) и показывает нужные варианты сама.
+
+Оболочка рендерится по чистому запросу (shell_request): в нём только
+адрес и параметры, без cookie, сессии, сообщений и CSRF-токена, поэтому
+в общий кеш не попадает ничего от пользователя, открывшего страницу
+первым. Фрагмент index_page внутри главной кешируется ещё на 20 секунд,
+так что новая запись появляется в оболочке главной с задержкой до
+PAGE_SHELL_TIMEOUT + 20 секунд.
+
+Пользователь, который только что писал в БД (ReplicaPinMiddleware),
+получает обычную страницу без кеша и сразу видит свои изменения.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpRequest
+from django.utils.cache import patch_cache_control
+
+
+def shell_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'page_shell:{path}'
+
+
+# Заголовки запроса, без которых не собрать адреса и не проверить хост
+SHELL_META = ('HTTP_HOST', 'SERVER_NAME', 'SERVER_PORT', 'SCRIPT_NAME',
+              'QUERY_STRING', 'wsgi.url_scheme')
+
+
+def shell_request(request):
+    """Анонимный GET-запрос с теми же адресом и параметрами."""
+    shell = HttpRequest()
+    shell.method = 'GET'
+    shell.path = request.path
+    shell.path_info = request.path_info
+    shell.META = {key: request.META[key] for key in SHELL_META
+                  if key in request.META}
+    shell.GET = request.GET.copy()
+    shell.resolver_match = request.resolver_match
+    shell.user = AnonymousUser()
+    shell.page_shell = True
+    return shell
+
+
+def page_shell(view):
+    """Декоратор view списка записей для режима PAGE_SHELLS."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (not settings.PAGE_SHELLS
+                or request.method not in ('GET', 'HEAD')
+                or getattr(request, 'replica_pinned', False)):
+            return view(request, *args, **kwargs)
+        key = shell_key(request)
+        response = cache.get(key)
+        if response is None:
+            response = view(shell_request(request), *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            patch_cache_control(response, public=True,
+                                max_age=settings.PAGE_SHELL_TIMEOUT)
+            cache.set(key, response, settings.PAGE_SHELL_TIMEOUT)
+        return response
+    return wrapper
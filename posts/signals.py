@@ -0,0 +1,32 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .live import channel
+from .models import Comment, Post, User, decrement_comment_counts
+
+
+@receiver(post_save, sender=Comment)
+def increment_comment_count(sender, instance, created, raw=False, **kwargs):
+    """Новый комментарий увеличивает счётчик поста на стороне БД."""
+    if created and not raw:
+        Post.objects.filter(pk=instance.post_id).update(
+            comment_count=F('comment_count') + 1, updated_at=timezone.now())
+
+
+@receiver(pre_delete, sender=User)
+def forget_user_comments(sender, instance, **kwargs):
+    """Комментарии пользователя удаляются каскадом мимо
+    CommentQuerySet.delete(): вычитаем их из счётчиков чужих постов."""
+    decrement_comment_counts(
+        Comment.objects.filter(author=instance).exclude(post__author=instance))
+
+
+@receiver(post_save, sender=Post)
+def announce_new_post(sender, instance, created, raw=False, **kwargs):
+    """Будит ожидающие запросы «новые записи» после коммита."""
+    if created and not raw:
+        transaction.on_commit(
+            lambda: channel.publish(instance.pk, instance.author_id))
@@ -0,0 +1,60 @@
+"""Потоковый рендер списков записей (настройка STREAMING_LISTINGS).
+
+Страница рендерится обычным шаблоном, но вместо цикла по записям
+выводит метку stream_marker. Всё до метки - head, base.html, навигация,
+шапка списка - уходит клиенту первым куском, затем записи страницы
+читаются итератором queryset порциями по STREAM_CHUNK_SIZE, и каждая
+карточка (includes/post_item.html, через кеш posts.cards) отправляется
+по готовности, а за ними - остаток страницы после метки.
+
+Всё, кроме карточек, рендерится до возврата из view. Карточки
+рендерятся позже, когда CsrfViewMiddleware и MessageMiddleware уже
+отработали, поэтому в них не должно быть {% csrf_token %} и сообщений.
+Замеры middleware (yatube.middleware.measure_stream) включаются заново
+на время чтения каждого куска и записываются, когда тело дочитано;
+заголовок Server-Timing уходит раньше и тело не учитывает.
+Ошибка при рендере карточки обрывает уже начатый ответ со статусом 200.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.template.loader import get_template, render_to_string
+from django.utils.safestring import mark_safe
+
+from yatube.routers import replica_reads
+
+from .cards import attach_cards
+
+POST_ITEM = 'includes/post_item.html'
+STREAM_MARKER = mark_safe('<!-- stream:posts -->')
+
+
+def streams(request):
+    """Отдавать ли страницу потоком: страницы-оболочки (posts.shells)
+    кешируются целиком и не стримятся."""
+    return (settings.STREAMING_LISTINGS
+            and not getattr(request, 'page_shell', False))
+
+
+def stream_listing(request, template_name, context, comments_limit):
+    html = render_to_string(template_name,
+                            dict(context, stream_marker=STREAM_MARKER),
+                            request)
+    head, _, tail = html.partition(STREAM_MARKER)
+    return StreamingHttpResponse(
+        chunks(request, head, tail, context, comments_limit))
+
+
+def chunks(request, head, tail, context, comments_limit):
+    yield head
+    template = get_template(POST_ITEM)
+    with replica_reads(request):
+        posts = context['page'].object_list.iterator(
+            chunk_size=settings.STREAM_CHUNK_SIZE)
+        for batch in iter(
+                lambda: list(islice(posts, settings.STREAM_CHUNK_SIZE)), []):
+            for post in attach_cards(batch, comments_limit):
+                yield template.render(dict(context, post=post),
+                                      request) + '\n'
+    yield tail
@@ -0,0 +1,35 @@
+from django.conf import settings
+from sorl.thumbnail import get_thumbnail
+
+from jobs.queue import job
+
+from . import digests, replica
+from .models import Post
+
+# Геометрия должна совпадать с {% thumbnail %} в includes/post_card.html,
+# иначе sorl посчитает миниатюру другой и сгенерирует её при рендере.
+CARD_THUMBNAIL = ('960x339', {'crop': 'center', 'upscale': True})
+
+
+@job('posts.warm_thumbnail', concurrency=2)
+def warm_thumbnail(post_id):
+    """Заранее нарезает миниатюру картинки поста для ленты."""
+    post = Post.objects.filter(pk=post_id).only('image').first()
+    if post is None or not post.image:
+        return
+    geometry, options = CARD_THUMBNAIL
+    get_thumbnail(post.image, geometry, **options)
+
+
+@job('posts.send_digests', concurrency=1, every=60 * 60)
+def send_digests():
+    """Раз в час рассылает письма тем, у кого подошёл срок."""
+    digests.send_digests()
+
+
+if 'replica' in settings.DATABASES:
+    @job('posts.sync_replica', concurrency=1,
+         every=settings.REPLICA_SYNC_SECONDS)
+    def sync_replica():
+        """Обновляет локальную копию-реплику."""
+        replica.sync_replica()
@@ -0,0 +1,12 @@
+from django import template
+
+from posts import links
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_url(name, *args):
+    """{% post_url 'posts:post' username post_id %} - как {% url %}, но
+    через заранее собранные шаблоны адресов posts.links."""
+    return links.url(name, *args)
@@ -0,0 +1,105 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.paginators import EstimatedCountPaginator
+
+
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@yatube.ru', password='pass'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Описание тестовой группы'
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def create_rows(self, count):
+        authors = User.objects.bulk_create(
+            User(username=f'author_{Post.objects.count()}_{i}')
+            for i in range(count)
+        )
+        authors = list(User.objects.filter(
+            username__in=[author.username for author in authors]))
+        for author in authors:
+            post = Post.objects.create(
+                text='Тестовый пост', author=author, group=self.group)
+            Comment.objects.create(post=post, author=author, text='Коммент')
+            Follow.objects.create(user=self.admin, author=author)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Число запросов списка в админке не зависит от числа строк."""
+        for model in ('post', 'comment', 'follow'):
+            with self.subTest(model=model):
+                url = reverse(f'admin:posts_{model}_changelist')
+                self.create_rows(2)
+                queries_small = self.count_queries(url)
+                self.create_rows(10)
+                queries_large = self.count_queries(url)
+                self.assertEqual(queries_small, queries_large)
+
+    def test_estimated_paginator_counts_exactly_when_filtered(self):
+        """Для выборки с условиями пагинатор считает строки точно."""
+        self.create_rows(3)
+        Post.objects.filter(pk=Post.objects.first().pk).delete()
+        paginator = EstimatedCountPaginator(
+            Post.objects.filter(group=self.group), 10)
+        self.assertEqual(paginator.count, 2)
+        paginator = EstimatedCountPaginator(Post.objects.all(), 10)
+        self.assertGreaterEqual(paginator.count, 2)
+
+    def test_last_page_after_deletes_is_not_empty(self):
+        """Оценка по MAX(pk) после удалений завышена, но последняя
+        страница списка всё равно показывает записи."""
+        author = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(text=f'Запись {number}', author=author)
+            for number in range(120))
+        Post.objects.filter(
+            pk__in=Post.objects.order_by('pk').values('pk')[:110]).delete()
+        url = reverse('admin:posts_post_changelist')
+        response = self.client.get(url, {'p': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'class="action-select"', count=10)
+        self.assertEqual(response.context['cl'].paginator.num_pages, 1)
+
+    def test_post_changelist_has_no_date_hierarchy(self):
+        """Список записей не считает Min/Max дат по всей таблице."""
+        self.create_rows(2)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertFalse([query for query in context.captured_queries
+                          if 'MIN(' in query['sql']
+                          or 'django_date_trunc' in query['sql']])
+
+    def test_delete_selected_comments_updates_counters(self):
+        """Действие «Удалить выбранные» уменьшает счётчики постов."""
+        self.create_rows(3)
+        post = Post.objects.first()
+        extra = Comment.objects.create(post=post, author=self.admin,
+                                       text='Ещё один')
+        other = Comment.objects.exclude(post=post).first()
+        response = self.client.post(
+            reverse('admin:posts_comment_changelist'),
+            {'action': 'delete_selected', 'post': 'yes',
+             '_selected_action': [extra.pk, other.pk]})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Comment.objects.count(), 2)
+        for post in Post.objects.all():
+            with self.subTest(post=post.pk):
+                self.assertEqual(post.comment_count, post.comments.count())
@@ -0,0 +1,111 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import cards
+from posts.models import Comment, Group, Post, User
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='leo')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.posts = [Post.objects.create(text=f'Запись {number}',
+                                         author=cls.author, group=cls.group)
+                     for number in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('posts:group', args=['group'])
+
+    def test_cards_are_rendered_once(self):
+        with mock.patch.object(cards, 'render_card',
+                               wraps=cards.render_card) as render_card:
+            self.client.get(self.url)
+            self.client.get(self.url)
+        self.assertEqual(render_card.call_count, len(self.posts))
+
+    def test_index_fragment_keeps_edit_buttons_per_user(self):
+        """Закешированная главная не показывает кнопки первого зрителя
+        другим пользователям."""
+        url = reverse('posts:index')
+        self.client.force_login(self.author)
+        self.assertContains(self.client.get(url), 'Редактировать')
+        for user in (self.reader, None):
+            with self.subTest(user=user):
+                if user is None:
+                    self.client.logout()
+                else:
+                    self.client.force_login(user)
+                self.assertNotContains(self.client.get(url),
+                                       'Редактировать')
+
+    def test_page_reads_cards_with_one_get_many(self):
+        self.client.get(self.url)
+        fragments = cards.fragment_cache()
+        with mock.patch.object(fragments, 'get_many',
+                               wraps=fragments.get_many) as get_many:
+            response = self.client.get(self.url)
+        get_many.assert_called_once()
+        self.assertEqual(len(get_many.call_args[0][0]), len(self.posts))
+        self.assertContains(response, 'Запись 2')
+
+    def test_cached_cards_skip_latest_comments_query(self):
+        self.client.get(self.url)
+        with mock.patch.object(cards, 'prefetch_latest_comments',
+                               wraps=cards.prefetch_latest_comments) as (
+                prefetch):
+            self.client.get(self.url)
+        prefetch.assert_called_once_with([], mock.ANY)
+
+    def test_edit_button_is_rendered_per_viewer(self):
+        self.client.get(self.url)
+        edit = reverse('posts:post_edit', args=['leo', self.posts[0].pk])
+        self.client.force_login(self.author)
+        self.assertContains(self.client.get(self.url), edit)
+        self.client.force_login(self.reader)
+        response = self.client.get(self.url)
+        self.assertNotContains(response, edit)
+        self.assertNotContains(response, cards.EDIT_MARKER)
+
+    def test_edit_changes_card(self):
+        self.client.get(self.url)
+        post = self.posts[0]
+        post.text = 'Исправленная запись'
+        post.save()
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Исправленная запись')
+
+    def test_new_comment_changes_card(self):
+        self.client.get(self.url)
+        Comment.objects.create(post=self.posts[0], author=self.reader,
+                               text='Свежий комментарий')
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Свежий комментарий')
+        self.assertContains(response, 'Комментариев: 1')
+
+    def test_replaced_comment_changes_card(self):
+        """Удалили один комментарий и добавили другой: число комментариев
+        прежнее, но карточка показывает новый."""
+        post = self.posts[0]
+        old = Comment.objects.create(post=post, author=self.reader,
+                                     text='Старый комментарий')
+        self.assertContains(self.client.get(self.url), 'Старый комментарий')
+        old.delete()
+        Comment.objects.create(post=post, author=self.reader,
+                               text='Свежий комментарий')
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Свежий комментарий')
+        self.assertNotContains(response, 'Старый комментарий')
+        self.assertContains(response, 'Комментариев: 1')
+
+    def test_cached_card_matches_live_render(self):
+        """Карточка из кеша выдаёт тот же HTML, что и рендер без кеша."""
+        self.client.force_login(self.author)
+        live = self.client.get(self.url).content
+        cached = self.client.get(self.url).content
+        self.assertEqual(cached, live)
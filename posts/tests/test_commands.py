@@ -0,0 +1,71 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Comment, Post, User
+
+
+class RecountCommentsCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='leo')
+        cls.posts = [
+            Post.objects.create(text=f'Пост {i}', author=cls.user)
+            for i in range(5)
+        ]
+        Comment.objects.bulk_create(
+            Comment(post=post, author=cls.user, text='Комментарий')
+            for post in cls.posts
+            for _ in range(post.pk % 3)
+        )
+
+    def test_recount_fixes_stale_counters(self):
+        """Команда recount_comments восстанавливает счётчики порциями."""
+        call_command('recount_comments', chunk_size=2, stdout=StringIO())
+        for post in Post.objects.all():
+            with self.subTest(post=post.text):
+                self.assertEqual(post.comment_count, post.comments.count())
+
+    def test_comment_create_and_delete_update_counter(self):
+        """Создание и удаление комментария меняют счётчик поста."""
+        post = self.posts[0]
+        call_command('recount_comments', stdout=StringIO())
+        before = Post.objects.get(pk=post.pk).comment_count
+        comment = Comment.objects.create(post=post, author=self.user,
+                                         text='Новый')
+        self.assertEqual(Post.objects.get(pk=post.pk).comment_count,
+                         before + 1)
+        comment.delete()
+        self.assertEqual(Post.objects.get(pk=post.pk).comment_count, before)
+
+    def test_user_delete_updates_counters_of_other_posts(self):
+        """Каскадное удаление комментариев вместе с автором уменьшает
+        счётчики чужих постов."""
+        reader = User.objects.create(username='reader')
+        post = self.posts[0]
+        for _ in range(2):
+            Comment.objects.create(post=post, author=reader, text='Ответ')
+        call_command('recount_comments', stdout=StringIO())
+        before = Post.objects.get(pk=post.pk).comment_count
+        reader.delete()
+        self.assertEqual(Post.objects.get(pk=post.pk).comment_count,
+                         before - 2)
+
+    def test_post_delete_queries_do_not_grow_with_comments(self):
+        """Комментарии удаляются вместе с постом одним запросом, без
+        загрузки и UPDATE счётчика на каждый комментарий."""
+        def count_queries(comments):
+            post = Post.objects.create(text='Пост', author=self.user)
+            for _ in range(comments):
+                Comment.objects.create(post=post, author=self.user,
+                                       text='Комментарий')
+            with CaptureQueriesContext(connection) as context:
+                post.delete()
+            self.assertFalse(Comment.objects.filter(post=post.pk).exists())
+            return len(context)
+
+        self.assertEqual(count_queries(1), count_queries(10))
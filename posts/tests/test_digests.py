@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from django.core import mail
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.digests import collect_posts, send_digests
+from posts.models import Digest, Follow, Post, User
+
+
+@override_settings(
+    JOBS_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class DigestTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='author')
+        cls.other_author = User.objects.create(username='other')
+        cls.daily = User.objects.create(username='daily',
+                                        email='daily@yatube.ru')
+        cls.weekly = User.objects.create(username='weekly',
+                                         email='weekly@yatube.ru')
+        for user in (cls.daily, cls.weekly):
+            Follow.objects.create(user=user, author=cls.author)
+        long_ago = timezone.now() - timedelta(days=2)
+        Digest.objects.create(user=cls.daily, frequency=Digest.DAILY,
+                              last_sent=long_ago)
+        Digest.objects.create(user=cls.weekly, frequency=Digest.WEEKLY,
+                              last_sent=long_ago)
+        Post.objects.create(text='Пост избранного автора', author=cls.author)
+        Post.objects.create(text='Пост чужого автора',
+                            author=cls.other_author)
+
+    def test_collect_posts_in_one_query(self):
+        """Записи для пачки подписок собираются одним запросом."""
+        digests = Digest.objects.all()
+        with self.assertNumQueries(1):
+            by_user = collect_posts(digests, timezone.now())
+        self.assertEqual(
+            [post.text for post in by_user[self.daily.pk]],
+            ['Пост избранного автора']
+        )
+        self.assertEqual(len(by_user[self.weekly.pk]), 1)
+
+    def test_send_digests_only_to_due_users(self):
+        """Письмо получает только тот, у кого подошёл срок рассылки."""
+        self.assertEqual(send_digests(), 1)
+        self.assertEqual(mail.outbox[0].to, ['daily@yatube.ru'])
+        self.assertIn('Пост избранного автора', mail.outbox[0].body)
+        self.assertNotIn('Пост чужого автора', mail.outbox[0].body)
+
+    def test_sent_posts_are_not_repeated(self):
+        """Уже отправленные записи не попадают в следующее письмо."""
+        send_digests()
+        mail.outbox.clear()
+        now = timezone.now()
+        Post.objects.update(pub_date=now - timedelta(days=3))
+        Digest.objects.update(last_sent=now - timedelta(days=2))
+        self.assertEqual(send_digests(), 0)
+
+    def test_digest_settings_page(self):
+        """Пользователь может выбрать частоту рассылки."""
+        client = Client()
+        client.force_login(self.author)
+        client.post(reverse('posts:digest'), {'frequency': Digest.WEEKLY})
+        self.assertEqual(self.author.digest.frequency, Digest.WEEKLY)
@@ -0,0 +1,127 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+from posts.thumbnails import CountingThumbnailBackend
+from yatube.middleware import REPLICA_PIN_COOKIE
+
+from .test_views import SMALL_GIF
+
+MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class Jinja2ParityTest(TestCase):
+    """Шаблоны Jinja2 для списков записей выдают тот же HTML, что и
+    шаблоны Django."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='leo', first_name='Лев', last_name='"Толстой"')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.staff = User.objects.create_user(username='staff',
+                                             is_staff=True)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.staff, author=cls.author)
+        cls.group = Group.objects.create(
+            title='Группа <b>"жирная"</b>', slug='group',
+            description="Описание & 'кавычки'")
+        posts = [Post.objects.create(
+            text=f'Запись {number}\nвторая строка <script>&\'"',
+            author=cls.author,
+            group=cls.group if number % 2 else None)
+            for number in range(12)]
+        posts[-1].image = SimpleUploadedFile(
+            'small.gif', SMALL_GIF, content_type='image/gif')
+        posts[-1].save()
+        Comment.objects.create(post=posts[-1], author=cls.reader,
+                               text='Комментарий "в кавычках" ' * 10)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        # Масштабирование не проверяется: миниатюрой становится исходный
+        # файл, сравнивается разметка с её адресом
+        patcher = mock.patch.object(
+            CountingThumbnailBackend, '_create_thumbnail', autospec=True,
+            side_effect=lambda backend, source, geometry, options,
+            thumbnail: thumbnail.write(SMALL_GIF))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def render_both(self, url, user=None):
+        if user is not None:
+            self.client.force_login(user)
+        cache.clear()
+        django = self.client.get(url)
+        cache.clear()
+        # Первый рендер пишет миниатюру в БД; без закрепления за основной
+        # базой второй запрос получает ту же страницу-оболочку
+        self.client.cookies.pop(REPLICA_PIN_COOKIE, None)
+        with self.settings(TEMPLATES=[settings.JINJA2_ENGINE]
+                           + settings.TEMPLATES):
+            jinja = self.client.get(url)
+        self.assertEqual(django.status_code, 200)
+        self.assertTrue(django.templates)
+        # Шаблоны Jinja2 не посылают сигнал template_rendered
+        self.assertFalse(jinja.templates)
+        return django.content.decode(), jinja.content.decode()
+
+    def assertSameHtml(self, url, user=None):
+        django, jinja = self.render_both(url, user)
+        self.assertEqual(jinja, django)
+
+    def test_index(self):
+        self.assertSameHtml(reverse('posts:index'))
+        self.assertSameHtml(reverse('posts:index') + '?page=2', self.author)
+
+    def test_group(self):
+        self.assertSameHtml(reverse('posts:group', args=['group']),
+                            self.staff)
+
+    def test_profile(self):
+        url = reverse('posts:profile', args=['leo'])
+        self.assertSameHtml(url)
+        self.assertSameHtml(url, self.reader)
+        self.assertSameHtml(url, self.author)
+
+    def test_follow_index(self):
+        self.assertSameHtml(reverse('posts:follow_index'), self.reader)
+
+    def test_page_shells(self):
+        with self.settings(PAGE_SHELLS=True):
+            self.assertSameHtml(reverse('posts:index'), self.author)
+            self.assertSameHtml(reverse('posts:profile', args=['leo']),
+                                self.reader)
+
+    def test_page_content_is_rendered(self):
+        """Сравнение не сводится к двум одинаково пустым страницам."""
+        _, jinja = self.render_both(reverse('posts:index'), self.author)
+        self.assertIn('&lt;script&gt;&amp;&#39;&quot;', jinja)
+        self.assertIn('<br>', jinja)
+        self.assertIn('<img class="card-img"', jinja)
+        self.assertIn('Комментарий &quot;в кавычках&quot;', jinja)
+        self.assertIn('Редактировать', jinja)
+        self.assertIn('class="pagination"', jinja)
+
+    def test_index_fragment_is_shared(self):
+        """Фрагмент index_page, закешированный одним движком, отдаётся
+        другим."""
+        cache.clear()
+        self.client.get(reverse('posts:index'))
+        Post.objects.create(text='Новая запись', author=self.author)
+        with self.settings(TEMPLATES=[settings.JINJA2_ENGINE]
+                           + settings.TEMPLATES):
+            response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('Новая запись', response.content.decode())
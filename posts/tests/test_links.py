@@ -0,0 +1,62 @@
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse, set_script_prefix
+from django.urls.exceptions import NoReverseMatch
+
+from posts import links
+from posts.models import Group, Post, User
+
+ARGS = {
+    'group': ['slug-1'],
+    'profile': ['leo'],
+    'profile_follow': ['leo'],
+    'profile_unfollow': ['leo'],
+    'post': ['leo', 7],
+    'post_edit': ['leo', '7'],
+    'add_comment': ['leo', 7],
+    'post_comments': ['leo', 7],
+}
+
+
+class LinksTest(SimpleTestCase):
+    def tearDown(self):
+        set_script_prefix('/')
+
+    def test_every_posts_route_matches_reverse(self):
+        names = links.patterns('yatube.urls')
+        self.assertIn('post_edit', names)
+        for name in names:
+            args = ARGS.get(name, [])
+            with self.subTest(name=name):
+                self.assertEqual(links.url(f'posts:{name}', *args),
+                                 reverse(f'posts:{name}', args=args))
+
+    def test_arguments_are_quoted_like_reverse(self):
+        for username in ('лев', 'a b', 'x?y#z', 'a%20'):
+            with self.subTest(username=username):
+                self.assertEqual(links.url('posts:profile', username),
+                                 reverse('posts:profile', args=[username]))
+
+    def test_script_prefix(self):
+        set_script_prefix('/yatube/')
+        self.assertEqual(links.url('posts:post', 'leo', 7),
+                         '/yatube/leo/7/')
+
+    def test_other_routes_fall_back_to_reverse(self):
+        self.assertEqual(links.url('about:author'), reverse('about:author'))
+        with self.assertRaises(NoReverseMatch):
+            links.url('posts:post', 'leo')
+
+
+class CardTemplateTest(TestCase):
+    def test_card_links(self):
+        author = User.objects.create_user(username='leo')
+        group = Group.objects.create(title='Группа', slug='group')
+        post = Post.objects.create(text='Запись', author=author,
+                                   group=group)
+        self.client.force_login(author)
+        response = self.client.get(reverse('posts:index'))
+        for url in (reverse('posts:profile', args=['leo']),
+                    reverse('posts:group', args=['group']),
+                    reverse('posts:post', args=['leo', post.id]),
+                    reverse('posts:post_edit', args=['leo', post.id])):
+            self.assertContains(response, f'href="{url}"')
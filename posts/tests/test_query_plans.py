@@ -0,0 +1,99 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+POST_TABLES = ('"posts_post"', '"posts_comment"', '"posts_follow"')
+
+
+class QueryPlanTest(TestCase):
+    """Запросы лент обслуживаются индексами: EXPLAIN QUERY PLAN не должен
+    показывать полного сканирования таблиц posts и сортировки основной
+    выборки во временном B-дереве."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='leo')
+        cls.author = User.objects.create(username='author')
+        cls.group = Group.objects.create(title='Тестовая группа',
+                                         slug='test-slug',
+                                         description='Описание')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(15):
+            post = Post.objects.create(text=f'Пост {i}', author=cls.author,
+                                       group=cls.group)
+            Comment.objects.create(post=post, author=cls.user,
+                                   text='Комментарий')
+        cls.post = post
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def plans_for(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [
+            (query['sql'], self.explain(query['sql']))
+            for query in context.captured_queries
+            if any(table in query['sql'] for table in POST_TABLES)
+            and query['sql'].startswith('SELECT')
+        ]
+
+    def assert_uses_indexes(self, url, sorted_by, sort_in_index=True):
+        found_listing = False
+        for sql, plan in self.plans_for(url):
+            for step in plan:
+                if step.startswith('SCAN') and any(
+                        table.strip('"') in step for table in POST_TABLES):
+                    self.assertIn('USING', step, f'{sql}\n{plan}')
+            if sorted_by in sql and 'LIMIT' in sql:
+                found_listing = True
+                if not sort_in_index:
+                    self.assertTrue(
+                        any('USING INDEX post_author_pub_date_idx' in step
+                            for step in plan),
+                        f'{sql}\n{plan}'
+                    )
+                    continue
+                self.assertFalse(
+                    any('TEMP B-TREE FOR ORDER BY' in step for step in plan),
+                    f'{sql}\n{plan}'
+                )
+        self.assertTrue(found_listing, f'Не найден запрос ленты для {url}')
+
+    def test_index_query_plan(self):
+        self.assert_uses_indexes(reverse('posts:index'),
+                                 'ORDER BY "posts_post"."pub_date" DESC')
+
+    def test_group_query_plan(self):
+        self.assert_uses_indexes(
+            reverse('posts:group', kwargs={'slug': self.group.slug}),
+            'ORDER BY "posts_post"."pub_date" DESC')
+
+    def test_profile_query_plan(self):
+        self.assert_uses_indexes(
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}),
+            'ORDER BY "posts_post"."pub_date" DESC')
+
+    def test_follow_index_query_plan(self):
+        """Лента подписок сливает записи нескольких авторов, поэтому
+        сортировка неизбежна, но каждый автор читается по индексу."""
+        self.assert_uses_indexes(reverse('posts:follow_index'),
+                                 'ORDER BY "posts_post"."pub_date" DESC',
+                                 sort_in_index=False)
+
+    def test_post_comments_query_plan(self):
+        self.assert_uses_indexes(
+            reverse('posts:post', kwargs={'username': self.author.username,
+                                          'post_id': self.post.id}),
+            'ORDER BY "posts_comment"."created" DESC')
@@ -0,0 +1,160 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import connections
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Post, User
+from yatube.middleware import REPLICA_PIN_COOKIE
+from yatube.routers import ReplicaRouter, read_from_replica, reset_state
+
+WITH_REPLICA = {
+    **settings.DATABASES,
+    'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+}
+
+
+@override_settings(DATABASES=WITH_REPLICA)
+class ReplicaRouterTest(TestCase):
+    def setUp(self):
+        reset_state()
+        self.router = ReplicaRouter()
+        self.factory = RequestFactory()
+
+    def route_inside_view(self, pinned=False, write=False):
+        @read_from_replica
+        def view(request):
+            if write:
+                self.router.db_for_write(Post)
+            return self.router.db_for_read(Post)
+
+        request = self.factory.get('/')
+        request.replica_pinned = pinned
+        return view(request)
+
+    def test_reads_in_decorated_view_go_to_replica(self):
+        """Чтения во view с read_from_replica идут в реплику."""
+        self.assertEqual(self.route_inside_view(), 'replica')
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    def test_pinned_user_reads_from_default(self):
+        """Недавно писавший пользователь читает с основной базы."""
+        self.assertEqual(self.route_inside_view(pinned=True), 'default')
+
+    def test_reads_after_write_go_to_default(self):
+        """После записи в том же запросе чтения идут в default."""
+        self.assertEqual(self.route_inside_view(write=True), 'default')
+
+    def test_sessions_and_users_are_read_from_default(self):
+        """Из реплики читаются только модели REPLICA_APPS."""
+        @read_from_replica
+        def view(request):
+            return [self.router.db_for_read(model)
+                    for model in (Session, User, Post)]
+
+        self.assertEqual(view(self.factory.get('/')),
+                         ['default', 'default', 'replica'])
+
+    def test_no_migrations_on_replica(self):
+        """Миграции не применяются к реплике."""
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+
+
+class ReplicaPinMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='leo')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    def test_write_pins_user_to_default(self):
+        """После записи пользователь получает cookie привязки к default."""
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('posts:add_comment',
+                    kwargs={'username': self.user.username,
+                            'post_id': self.post.id}),
+            {'text': 'Комментарий'}
+        )
+        self.assertIn(REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_read_does_not_pin(self):
+        """Анонимное чтение ленты не привязывает к основной базе."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertNotIn(REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_session_and_last_login_writes_do_not_pin(self):
+        """Вход пишет сессию и last_login, но не привязывает к default."""
+        User.objects.create_user(username='reader',
+                                 password='secret-password')
+        response = self.client.post(reverse('login'), {
+            'username': 'reader', 'password': 'secret-password'})
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn(REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_pin_outlasts_replica_lag(self):
+        """Привязка длится дольше наибольшего отставания реплики."""
+        self.assertGreater(settings.REPLICA_PIN_SECONDS,
+                           settings.REPLICA_SYNC_SECONDS
+                           + settings.REPLICA_CONN_MAX_AGE)
+
+
+class LaggingReplicaTest(TestCase):
+    """Реплика - отдельный файл, снятый до входа пользователя."""
+
+    @classmethod
+    def setUpClass(cls):
+        # Копия снимается до транзакции теста: в ней схема без строк
+        cls.directory = tempfile.mkdtemp()
+        path = os.path.join(cls.directory, 'replica.sqlite3')
+        connections['default'].ensure_connection()
+        target = sqlite3.connect(path)
+        connections['default'].connection.backup(target)
+        target.close()
+        cls.replica = {**settings.DATABASES['default'], 'NAME': path,
+                       'TEST': {'NAME': path}}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.directory)
+
+    def setUp(self):
+        connections.databases['replica'] = self.replica
+        settings_override = override_settings(
+            DATABASES={**settings.DATABASES, 'replica': self.replica})
+        settings_override.enable()
+
+        def remove_replica():
+            settings_override.disable()
+            connections['replica'].close()
+            del connections.databases['replica']
+            delattr(connections._connections, 'replica')
+
+        self.addCleanup(remove_replica)
+        User.objects.create_user(username='reader',
+                                 password='secret-password')
+
+    def test_fresh_login_is_not_lost_on_replica_reads(self):
+        response = self.client.post(reverse('login'), {
+            'username': 'reader', 'password': 'secret-password'})
+        self.assertEqual(response.status_code, 302)
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.wsgi_request.user.username, 'reader')
+        self.assertNotIn('sessionid', response.cookies)
+
+    def test_viewer_reads_fresh_session_and_follows(self):
+        author = User.objects.create_user(username='leo')
+        self.client.force_login(User.objects.get(username='reader'))
+        Follow.objects.create(user=User.objects.get(username='reader'),
+                              author=author)
+        response = self.client.get(reverse('posts:viewer'),
+                                   {'author': 'leo'})
+        self.assertEqual(response.json(), {
+            'user': 'reader', 'staff': False, 'following': True})
@@ -0,0 +1,129 @@
+from django.contrib.messages import INFO, get_messages
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post, User
+from yatube.middleware import REPLICA_PIN_COOKIE
+
+
+@override_settings(PAGE_SHELLS=True)
+class PageShellTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='leo')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.staff = User.objects.create_user(username='staff',
+                                             is_staff=True)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(text='Запись', author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url, user=None):
+        if user is None:
+            self.client.logout()
+        else:
+            self.client.force_login(user)
+        return self.client.get(url)
+
+    def test_shell_is_shared_by_all_users(self):
+        urls = (reverse('posts:index'),
+                reverse('posts:group', args=['group']),
+                reverse('posts:profile', args=['leo']))
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.get(url, self.reader)
+                self.assertNotContains(first, 'reader')
+                self.assertContains(first, 'js-viewer')
+                self.assertIn('public', first['Cache-Control'])
+                for user in (self.author, self.staff, None):
+                    self.assertEqual(self.get(url, user).content,
+                                     first.content)
+
+    def test_shell_carries_no_request_state(self):
+        """В общий кеш не попадают cookie, сессия, CSRF-токен и
+        сообщения пользователя, открывшего страницу первым."""
+        request = RequestFactory().get('/')
+        storage = CookieStorage(request)
+        storage.add(INFO, 'Сообщение')
+        carrier = HttpResponse()
+        storage.update(carrier)
+        self.client.force_login(self.reader)
+        self.client.cookies['messages'] = carrier.cookies['messages'].value
+        for url in (reverse('posts:index'),
+                    reverse('posts:group', args=['group'])):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertFalse(response.cookies)
+                self.assertNotIn('Cookie', response.get('Vary', ''))
+                self.assertNotContains(response, 'csrfmiddlewaretoken')
+                self.assertNotContains(response, 'Сообщение')
+        response = self.client.get(reverse('about:author'))
+        self.assertEqual(
+            [str(message)
+             for message in get_messages(response.wsgi_request)],
+            ['Сообщение'])
+
+    def test_cached_shell_does_not_run_view(self):
+        url = reverse('posts:group', args=['group'])
+        self.get(url, self.reader)
+        self.client.force_login(self.author)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_per_user_parts_are_hidden_in_shell(self):
+        response = self.get(reverse('posts:profile', args=['leo']),
+                            self.author)
+        self.assertContains(response, 'd-none js-owner" data-owner="leo"')
+        self.assertContains(response, 'd-none js-follow" data-author="leo"')
+        self.assertContains(
+            response, reverse('posts:profile_unfollow', args=['leo']))
+        self.assertContains(response, reverse('posts:viewer'))
+
+    def test_pinned_user_gets_personal_page(self):
+        """После записи в БД пользователь видит страницу без кеша."""
+        url = reverse('posts:index')
+        self.get(url, self.author)
+        self.client.cookies[REPLICA_PIN_COOKIE] = '9999999999'
+        response = self.client.get(url)
+        self.assertContains(response, 'Пользователь:')
+        self.assertContains(response, '>leo</a>')
+        self.assertNotIn('public', response.get('Cache-Control', ''))
+
+    @override_settings(PAGE_SHELLS=False)
+    def test_shells_are_opt_in(self):
+        response = self.get(reverse('posts:index'), self.author)
+        self.assertContains(response, '>leo</a>')
+        self.assertNotContains(response, 'js-viewer')
+
+
+class ViewerTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='leo')
+        cls.reader = User.objects.create_user(username='reader',
+                                              is_staff=True)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def test_guest(self):
+        response = self.client.get(reverse('posts:viewer'))
+        self.assertEqual(response.json(), {'user': None})
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_user_and_follow_state(self):
+        self.client.force_login(self.reader)
+        url = reverse('posts:viewer')
+        self.assertEqual(self.client.get(url).json(),
+                         {'user': 'reader', 'staff': True})
+        self.assertEqual(
+            self.client.get(url, {'author': 'leo'}).json()['following'],
+            True)
+        self.assertEqual(
+            self.client.get(url, {'author': 'reader'}).json()['following'],
+            False)
@@ -0,0 +1,81 @@
+import re
+
+from django.contrib.messages import INFO, get_messages
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, User
+
+
+def squeeze(html):
+    return re.sub(r'\s+', ' ', html)
+
+
+class StreamingListingTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='leo')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.posts = [Post.objects.create(text=f'Запись {number}',
+                                         author=cls.author, group=cls.group)
+                     for number in range(12)]
+        Comment.objects.create(post=cls.posts[-1], author=cls.author,
+                               text='Комментарий')
+        cls.urls = (reverse('posts:index'),
+                    reverse('posts:group', args=['group']),
+                    reverse('posts:profile', args=['leo']) + '?page=2')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.author)
+
+    def test_streamed_page_matches_regular_page(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                regular = self.client.get(url)
+                self.assertFalse(regular.streaming)
+                cache.clear()
+                with self.settings(STREAMING_LISTINGS=True):
+                    streamed = self.client.get(url)
+                self.assertTrue(streamed.streaming)
+                html = b''.join(streamed.streaming_content).decode()
+                self.assertEqual(squeeze(html),
+                                 squeeze(regular.content.decode()))
+
+    @override_settings(STREAMING_LISTINGS=True)
+    def test_head_is_sent_before_posts_are_read(self):
+        response = self.client.get(reverse('posts:index'))
+        content = iter(response.streaming_content)
+        with self.assertNumQueries(0):
+            head = next(content).decode()
+        self.assertIn('</nav>', head)
+        self.assertNotIn('card-body', head)
+        self.assertIn('Запись 11', next(content).decode())
+        rest = b''.join(content).decode()
+        self.assertIn('class="pagination"', rest)
+        self.assertNotIn('stream:posts', rest)
+
+    @override_settings(STREAMING_LISTINGS=True, PAGE_SHELLS=True)
+    def test_page_shells_are_not_streamed(self):
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.streaming)
+
+    @override_settings(STREAMING_LISTINGS=True)
+    def test_queued_messages_survive_streamed_page(self):
+        request = RequestFactory().get('/')
+        storage = CookieStorage(request)
+        storage.add(INFO, 'Сообщение')
+        carrier = HttpResponse()
+        storage.update(carrier)
+        self.client.cookies['messages'] = (
+            carrier.cookies['messages'].value)
+        response = self.client.get(reverse('posts:index'))
+        b''.join(response.streaming_content)
+        response = self.client.get(reverse('about:author'))
+        self.assertEqual(
+            [str(message)
+             for message in get_messages(response.wsgi_request)],
+            ['Сообщение'])
@@ -1,5 +1,7 @@
 import shutil
 import tempfile
+import threading
+from unittest import mock
 
 from django import forms
 from django.conf import settings
@@ -8,7 +10,10 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from posts.live import PostChannel
 from posts.models import Comment, Follow, Group, Post, User
+from posts.prefetch import prefetch_latest_comments
+from yatube.routers import ReplicaRouter
 from yatube.settings import BASE_DIR
 
 SMALL_GIF = (
@@ -418,3 +423,146 @@ class TestFollowTape(TestCase):
         response = self.authorized_client.get(reverse('posts:follow_index'))
         cnt_posts = len(response.context['page'])
         self.assertEqual(cnt_posts, 0)
+
+
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='leo')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+        for i in range(25):
+            Comment.objects.create(post=cls.post, author=cls.user,
+                                   text=f'Комментарий {i}')
+        cls.kwargs = {'username': cls.user.username, 'post_id': cls.post.id}
+
+    def test_post_view_shows_first_page_of_newest_comments(self):
+        """На странице поста первая порция самых новых комментариев."""
+        response = self.client.get(reverse('posts:post', kwargs=self.kwargs))
+        comments = list(response.context['comments'])
+        self.assertEqual(len(comments), 20)
+        self.assertEqual(comments[0].text, 'Комментарий 24')
+        self.assertIsNotNone(response.context['next_cursor'])
+
+    def test_load_more_returns_remaining_comments(self):
+        """Фрагмент «Показать ещё» отдаёт оставшиеся комментарии."""
+        response = self.client.get(reverse('posts:post', kwargs=self.kwargs))
+        cursor = response.context['next_cursor']
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs=self.kwargs),
+            {'after': cursor}
+        )
+        comments = list(response.context['comments'])
+        self.assertEqual(len(comments), 5)
+        self.assertEqual(comments[-1].text, 'Комментарий 0')
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_comment_authors_are_joined(self):
+        """Авторы комментариев не загружаются отдельными запросами."""
+        url = reverse('posts:post_comments', kwargs=self.kwargs)
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+
+class LatestCommentsPreviewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='leo')
+        cls.posts = [
+            Post.objects.create(text=f'Пост {i}', author=cls.user)
+            for i in range(4)
+        ]
+        for post in cls.posts:
+            for i in range(5):
+                Comment.objects.create(post=post, author=cls.user,
+                                       text=f'Комментарий {i}')
+
+    def test_preview_contains_latest_comments(self):
+        """В карточке поста последние комментарии, от новых к старым."""
+        posts = prefetch_latest_comments(Post.objects.all(), 3)
+        for post in posts:
+            with self.subTest(post=post.text):
+                self.assertEqual(
+                    [comment.text for comment in post.latest_comments],
+                    ['Комментарий 4', 'Комментарий 3', 'Комментарий 2']
+                )
+
+    def test_preview_uses_one_query(self):
+        """Превью комментариев для страницы загружается одним запросом."""
+        posts = list(Post.objects.all())
+        with self.assertNumQueries(1):
+            posts = prefetch_latest_comments(posts, 3)
+            for post in posts:
+                for comment in post.latest_comments:
+                    comment.author.username
+
+    def test_preview_without_window_functions(self):
+        """Без оконных функций используется коррелированный подзапрос."""
+        with mock.patch('posts.prefetch.supports_window_functions',
+                        return_value=False):
+            posts = prefetch_latest_comments(Post.objects.all(), 2)
+        self.assertEqual(
+            [comment.text for comment in posts[0].latest_comments],
+            ['Комментарий 4', 'Комментарий 3']
+        )
+
+
+@override_settings(LONG_POLL_TIMEOUT=0.01)
+class NewPostsLongPollTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='leo')
+        cls.author = User.objects.create(username='author')
+        cls.old_post = Post.objects.create(text='Старый', author=cls.author)
+
+    def test_returns_count_of_newer_posts(self):
+        """Если новые записи уже есть, ответ приходит сразу."""
+        Post.objects.create(text='Новый', author=self.author)
+        response = self.client.get(reverse('posts:new_posts'),
+                                   {'since': self.old_post.pk})
+        self.assertEqual(response.json()['count'], 1)
+
+    def test_timeout_without_news(self):
+        """Без новых записей запрос завершается по таймауту."""
+        response = self.client.get(reverse('posts:new_posts'),
+                                   {'since': self.old_post.pk})
+        self.assertEqual(response.json(),
+                         {'count': 0, 'latest': self.old_post.pk})
+
+    def test_follow_scope_ignores_other_authors(self):
+        """В ленте подписок не считаются записи чужих авторов."""
+        self.client.force_login(self.user)
+        Post.objects.create(text='Новый', author=self.author)
+        response = self.client.get(
+            reverse('posts:new_posts'),
+            {'since': self.old_post.pk, 'scope': 'follow'}
+        )
+        self.assertEqual(response.json()['count'], 0)
+
+    def test_reads_from_default_database(self):
+        """Пересчёт после пробуждения идёт не в отстающую реплику."""
+        replica = {**settings.DATABASES, 'replica': {
+            'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}}
+        aliases = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            aliases.append(db_for_read(router, model, **hints))
+            return aliases[-1]
+
+        with override_settings(DATABASES=replica), mock.patch.object(
+                ReplicaRouter, 'db_for_read', record):
+            self.client.get(reverse('posts:new_posts'),
+                            {'since': self.old_post.pk})
+        self.assertIn('default', aliases)
+        self.assertNotIn('replica', aliases)
+
+    def test_channel_wakes_waiting_request(self):
+        """Публикация в канал будит ожидающий поток."""
+        channel = PostChannel()
+        timer = threading.Timer(0.05, channel.publish, (10, self.author.pk))
+        timer.start()
+        self.assertTrue(channel.wait(5, {self.author.pk}, timeout=5))
+        self.assertFalse(channel.wait(10, timeout=0.01))
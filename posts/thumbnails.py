@@ -0,0 +1,21 @@
+from sorl.thumbnail.base import ThumbnailBackend
+
+from yatube.metrics import registry
+
+
+class CountingThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl, который считает запрошенные и сгенерированные
+    миниатюры для эндпоинта метрик. Доля генераций показывает, успевает
+    ли задача posts.warm_thumbnail прогревать миниатюры заранее."""
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        registry.inc('yatube_thumbnail_requests_total',
+                     {'geometry': geometry_string})
+        return super().get_thumbnail(file_, geometry_string, **options)
+
+    def _create_thumbnail(self, source_image, geometry_string, options,
+                          thumbnail):
+        registry.inc('yatube_thumbnails_generated_total',
+                     {'geometry': geometry_string})
+        return super()._create_thumbnail(source_image, geometry_string,
+                                         options, thumbnail)
@@ -1,15 +1,37 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.cache import never_cache
 
-from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post
+from jobs.queue import enqueue
+from yatube.routers import read_from_replica
+
+from .cards import attach_cards
+from .forms import CommentForm, DigestForm, PostForm
+from .live import channel
+from .models import Digest, Follow, Group, Post
+from .paginators import keyset_page
+from .shells import page_shell
+from .streaming import stream_listing, streams
 
 User = get_user_model()
 
+COMMENTS_PER_PAGE = 20
+LATEST_COMMENTS_PREVIEW = 3
+
+
+def latest_post_id():
+    # Передаётся в шаблон функцией: на главной вызывается только при
+    # промахе кеша, вместе с закешированным списком записей
+    return Post.objects.aggregate(latest=Max('pk'))['latest'] or 0
 
-def page_not_found(request, exception):
+
+def page_not_found(request, exception=None):
     return render(
         request,
         "misc/404.html",
@@ -22,39 +44,48 @@ def server_error(request):
     return render(request, "misc/500.html", status=500)
 
 
+@page_shell
+@read_from_replica
 def index(request):
     """Главная страница со списком постов."""
-    posts = Post.objects.all()
+    posts = Post.objects.select_related('author', 'group')
     paginator = Paginator(posts, 10)
     page_number = request.GET.get('page')
     page = paginator.get_page(page_number)
-    return render(
-        request,
-        'index.html',
-        {
-            'page': page,
-            'posts': posts,
-            'paginator': paginator
-        }
-    )
+    context = {
+        'page': page,
+        'posts': posts,
+        'paginator': paginator,
+        'latest_post_id': latest_post_id,
+    }
+    if streams(request):
+        return stream_listing(request, 'index.html', context,
+                              LATEST_COMMENTS_PREVIEW)
+    page.object_list = attach_cards(page.object_list,
+                                    LATEST_COMMENTS_PREVIEW)
+    return render(request, 'index.html', context)
 
 
+@page_shell
+@read_from_replica
 def group_posts(request, slug):
     """Страница с постами группы"""
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    posts = group.posts.select_related('author', 'group')
     paginator = Paginator(posts, 10)
     page_number = request.GET.get('page')
     page = paginator.get_page(page_number)
-    return render(
-        request,
-        'group.html',
-        {
-            'group': group,
-            'page': page,
-            'paginator': paginator
-        }
-    )
+    context = {
+        'group': group,
+        'page': page,
+        'paginator': paginator
+    }
+    if streams(request):
+        return stream_listing(request, 'group.html', context,
+                              LATEST_COMMENTS_PREVIEW)
+    page.object_list = attach_cards(page.object_list,
+                                    LATEST_COMMENTS_PREVIEW)
+    return render(request, 'group.html', context)
 
 
 @login_required
@@ -66,6 +97,8 @@ def new_post(request):
     post = form.save(commit=False)
     post.author = request.user
     post.save()
+    if post.image:
+        enqueue('posts.warm_thumbnail', post_id=post.id)
     return redirect('posts:index')
 
 
@@ -89,35 +122,47 @@ def post_edit(request, username, post_id):
             }
         )
     form.save()
+    if 'image' in form.changed_data and post.image:
+        enqueue('posts.warm_thumbnail', post_id=post.id)
     return redirect('posts:post', post.author, post.id)
 
 
+@page_shell
+@read_from_replica
 def profile(request, username):
     """Страница профиля пользователя."""
     author_posts = get_object_or_404(User, username=username)
-    posts = author_posts.posts.all()
+    posts = author_posts.posts.select_related('author', 'group')
     paginator = Paginator(posts, 10)
     page_number = request.GET.get('page')
     page = paginator.get_page(page_number)
     following = Follow.objects.filter(user__username=request.user,
                                       author=author_posts).exists()
-    return render(
-        request,
-        'profile.html',
-        {
-            'page': page,
-            'author_posts': author_posts,
-            'paginator': paginator,
-            'following': following,
-        }
-    )
+    context = {
+        'page': page,
+        'author_posts': author_posts,
+        'paginator': paginator,
+        'following': following,
+    }
+    if streams(request):
+        return stream_listing(request, 'profile.html', context,
+                              LATEST_COMMENTS_PREVIEW)
+    page.object_list = attach_cards(page.object_list,
+                                    LATEST_COMMENTS_PREVIEW)
+    return render(request, 'profile.html', context)
 
 
+@read_from_replica
 def post_view(request, username, post_id):
     """Станица просмотра отдельного поста."""
     form = CommentForm(request.POST or None)
-    post = get_object_or_404(Post, id=post_id, author__username=username)
-    comments = post.comments.all()
+    post = get_object_or_404(Post.objects.select_related('author', 'group'),
+                             id=post_id, author__username=username)
+    comments, next_cursor = keyset_page(
+        post.comments.select_related('author'),
+        request.GET.get('after'),
+        COMMENTS_PER_PAGE
+    )
     following = Follow.objects.filter(user__username=request.user,
                                       author=post.author).exists()
     return render(
@@ -127,6 +172,7 @@ def post_view(request, username, post_id):
             'post': post,
             'author_posts': post.author,
             'comments': comments,
+            'next_cursor': next_cursor,
             'form': form,
             'following': following,
             'display_add_comment': True
@@ -134,6 +180,27 @@ def post_view(request, username, post_id):
     )
 
 
+@read_from_replica
+def post_comments(request, username, post_id):
+    """Фрагмент со следующей порцией комментариев для «Показать ещё»."""
+    post = get_object_or_404(Post.objects.select_related('author'),
+                             id=post_id, author__username=username)
+    comments, next_cursor = keyset_page(
+        post.comments.select_related('author'),
+        request.GET.get('after'),
+        COMMENTS_PER_PAGE
+    )
+    return render(
+        request,
+        'includes/comment_list.html',
+        {
+            'post': post,
+            'comments': comments,
+            'next_cursor': next_cursor,
+        }
+    )
+
+
 @login_required
 def add_comment(request, username, post_id):
     """Форма добавления комментария к отдельному посту"""
@@ -143,27 +210,97 @@ def add_comment(request, username, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        # Комментарий и счётчик Post.comment_count меняются вместе
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post', post.author, post.id)
 
 
 @login_required
 def follow_index(request):
     """Страница с постами авторов на которые подписан пользователь"""
-    posts = Post.objects.filter(author__following__user=request.user)
+    posts = Post.objects.filter(
+        author__following__user=request.user
+    ).select_related('author', 'group')
     paginator = Paginator(posts, 10)
     page_number = request.GET.get('page')
     page = paginator.get_page(page_number)
+    page.object_list = attach_cards(page.object_list,
+                                    LATEST_COMMENTS_PREVIEW)
     return render(
         request,
         'follow.html',
         {
             'page': page,
             'paginator': paginator,
+            'latest_post_id': latest_post_id,
         }
     )
 
 
+def new_posts(request):
+    """Long-poll: держит запрос, пока не появятся записи новее since.
+
+    Отвечает сразу, если такие записи уже есть, иначе ждёт уведомления
+    из канала или LONG_POLL_TIMEOUT секунд и один раз пересчитывает
+    записи. Читает с основной базы: канал будит запрос при коммите в
+    неё, и реплика ещё не видела бы новую запись.
+
+    Ожидающий запрос занимает поток воркера, поэтому сервер нужен с
+    запасом потоков (gunicorn --threads) под открытые вкладки. Канал
+    живёт внутри процесса и не слышит записи из других процессов - там
+    запрос ждёт весь таймаут и работает как опрос раз в
+    LONG_POLL_TIMEOUT секунд; поэтому таймаут короткий.
+    """
+    try:
+        since = int(request.GET.get('since', 0))
+    except ValueError:
+        since = 0
+    posts = Post.objects.filter(pk__gt=since)
+    authors = None
+    if request.GET.get('scope') == 'follow' and request.user.is_authenticated:
+        authors = set(Follow.objects.filter(
+            user=request.user).values_list('author_id', flat=True))
+        posts = posts.filter(author_id__in=authors)
+    if not posts.exists():
+        channel.wait(since, authors, settings.LONG_POLL_TIMEOUT)
+    news = posts.aggregate(count=Count('pk'), latest=Max('pk'))
+    return JsonResponse({
+        'count': news['count'],
+        'latest': news['latest'] or since,
+    })
+
+
+@never_cache
+def viewer(request):
+    """Данные пользователя для страниц-оболочек (posts.shells): имя,
+    сотрудник ли он и, если передан author, подписан ли на автора.
+
+    Читает с default: сессия и подписки только что вошедшего или
+    подписавшегося пользователя могут ещё не дойти до реплики.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return JsonResponse({'user': None})
+    data = {'user': user.username, 'staff': user.is_staff}
+    author = request.GET.get('author')
+    if author:
+        data['following'] = Follow.objects.filter(
+            user=user, author__username=author).exists()
+    return JsonResponse(data)
+
+
+@login_required
+def digest_settings(request):
+    """Страница настройки рассылки новых записей избранных авторов"""
+    digest, _ = Digest.objects.get_or_create(user=request.user)
+    form = DigestForm(request.POST or None, instance=digest)
+    if form.is_valid():
+        form.save()
+        return redirect('posts:follow_index')
+    return render(request, 'posts/digest.html', {'form': form})
+
+
 @login_required
 def profile_follow(request, username):
     """Функция для подписки на автора"""
@@ -0,0 +1,52 @@
+"""Запись реальных запросов для воспроизведения командой replay_requests.
+
+RequestCaptureMiddleware пишет долю CAPTURE_SAMPLE_RATE запросов GET и
+HEAD к маршрутам пространств имён CAPTURE_NAMESPACES строкой JSON в
+логгер yatube.capture. Ключи короткие, потому что строк много:
+
+    {"t": 1700000000.123, "m": "GET", "r": "posts:profile",
+     "k": {"username": "leo"}, "q": {"page": "2"}, "u": "user",
+     "s": 200, "ms": 12.3}
+
+t - время начала запроса, r и k - имя маршрута и его аргументы для
+reverse, q - только параметры из CAPTURE_QUERY_PARAMS, u - класс
+пользователя (anonymous, user, staff) без идентификатора. Тела запросов,
+cookie и заголовки не записываются.
+"""
+import json
+import logging
+
+from django.conf import settings
+
+logger = logging.getLogger('yatube.capture')
+
+ANONYMOUS = 'anonymous'
+USER = 'user'
+STAFF = 'staff'
+CAPTURED_METHODS = ('GET', 'HEAD')
+
+
+def user_class(user):
+    if not user.is_authenticated:
+        return ANONYMOUS
+    return STAFF if user.is_staff else USER
+
+
+def should_capture(request, route):
+    return (request.method in CAPTURED_METHODS and route is not None
+            and route.split(':')[0] in settings.CAPTURE_NAMESPACES)
+
+
+def log_request(request, route, started, response, elapsed):
+    query = {key: request.GET[key] for key in settings.CAPTURE_QUERY_PARAMS
+             if key in request.GET}
+    logger.info(json.dumps({
+        't': round(started, 3),
+        'm': request.method,
+        'r': route,
+        'k': request.resolver_match.kwargs,
+        'q': query,
+        'u': user_class(request.user),
+        's': response.status_code,
+        'ms': round(elapsed * 1000, 1),
+    }, ensure_ascii=False, separators=(',', ':')))
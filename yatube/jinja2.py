@@ -0,0 +1,90 @@
+"""Окружение Jinja2 для списков записей (настройка JINJA2_TEMPLATES).
+
+Шаблоны в templates/jinja2 - построчные копии шаблонов Django для
+главной, группы, профиля и ленты подписок вместе с base.html и их
+include. Глобальные функции и фильтры повторяют теги Django, а finalize
+экранирует значения функцией Django, поэтому HTML совпадает байт в байт
+(см. posts/tests/test_jinja2.py): markupsafe экранирует кавычки иначе.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache.utils import make_template_fragment_key
+from django.template import defaultfilters
+from django.templatetags.static import static
+from django.utils import timezone
+from django.utils.html import conditional_escape
+from django.utils.timezone import template_localtime
+from jinja2 import Environment
+from markupsafe import Markup
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.conf import settings as thumbnail_settings
+
+from posts import links
+from posts.cards import fragment_cache
+from users.templatetags.user_filters import addclass
+
+logger = logging.getLogger(__name__)
+
+
+def url(name, *args):
+    return links.url(name, *args)
+
+
+def now(format_string):
+    return defaultfilters.date(timezone.localtime()
+                               if settings.USE_TZ else timezone.now(),
+                               format_string)
+
+
+def thumbnail(file_, geometry, **options):
+    """Миниатюра как у {% thumbnail %}: None, если файла нет или его не
+    удалось обработать, - тогда блок {% if %} не выводится."""
+    if not file_:
+        return None
+    try:
+        return get_thumbnail(file_, geometry, **options)
+    except Exception:
+        if thumbnail_settings.THUMBNAIL_DEBUG:
+            raise
+        logger.exception('Thumbnail failed for %s', file_)
+        return None
+
+
+def cache(timeout, fragment_name, *vary_on, caller):
+    """{% call cache(20, 'index_page') %}...{% endcall %} - фрагмент с
+    тем же ключом, что у {% cache %}: шаблоны Django и Jinja2 делят его."""
+    fragments = fragment_cache()
+    key = make_template_fragment_key(fragment_name, vary_on)
+    value = fragments.get(key)
+    if value is None:
+        value = caller()
+        fragments.set(key, value, timeout)
+    return Markup(value)
+
+
+def date(value, format_string=None):
+    return defaultfilters.date(template_localtime(value), format_string)
+
+
+def linebreaksbr(value):
+    return defaultfilters.linebreaksbr(value, autoescape=True)
+
+
+def environment(**options):
+    options.setdefault('keep_trailing_newline', True)
+    env = Environment(finalize=conditional_escape, **options)
+    env.globals.update({
+        'url': url,
+        'static': static,
+        'now': now,
+        'thumbnail': thumbnail,
+        'cache': cache,
+    })
+    env.filters.update({
+        'addclass': addclass,
+        'date': date,
+        'linebreaksbr': linebreaksbr,
+        'truncatechars': defaultfilters.truncatechars,
+    })
+    return env
@@ -0,0 +1,17 @@
+"""Файловые журналы замеров (LOGGING в settings)."""
+import logging.handlers
+import os
+
+
+class WatchedFileHandler(logging.handlers.WatchedFileHandler):
+    """Журнал, который создаёт свой каталог при первой записи.
+
+    Файл пишут все процессы сервера, поэтому ротация внешняя (logrotate
+    с create или mv): WatchedFileHandler замечает, что файл подменили,
+    и открывает новый. RotatingFileHandler в нескольких процессах
+    переименовывал бы файл каждый сам по себе и терял строки.
+    """
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
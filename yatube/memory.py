@@ -0,0 +1,146 @@
+"""Выборочные замеры памяти запросов через tracemalloc.
+
+Для доли MEMORY_SAMPLE_RATE запросов MemorySamplingMiddleware включает
+tracemalloc на время запроса и пишет строку JSON в логгер yatube.memory:
+
+- peak_kb - пик памяти, выделенной во время запроса;
+- retained_kb - сколько из выделенного осталось живым после запроса
+  (после сборки мусора): кеш фрагментов, lru_cache, глобальные списки -
+  то, из чего складывается рост воркера;
+- sites - места выделения с наибольшим остатком вместе с ближайшим
+  кадром кода проекта (caller).
+
+tracemalloc общий на процесс, поэтому одновременно замеряется не больше
+одного запроса, а в многопоточном сервере в замер попадают и соседние
+потоки. Сводку по журналу строит команда memory_report.
+"""
+import gc
+import json
+import logging
+import os
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+from django.conf import settings
+
+logger = logging.getLogger('yatube.memory')
+
+_lock = threading.Lock()
+FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+)
+
+
+class Sample:
+    """Замер одного запроса: with Sample() as sample: ..."""
+
+    def __init__(self, top=None):
+        self.top = top or settings.MEMORY_TOP_SITES
+        self.peak = 0
+        self.retained = 0
+        self.sites = []
+
+    def __enter__(self):
+        self.started_here = not tracemalloc.is_tracing()
+        if self.started_here:
+            tracemalloc.start(settings.MEMORY_TRACE_FRAMES)
+        self.before = tracemalloc.take_snapshot().filter_traces(FILTERS)
+        tracemalloc.reset_peak()
+        self.baseline = tracemalloc.get_traced_memory()[0]
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            self.peak = tracemalloc.get_traced_memory()[1] - self.baseline
+            gc.collect()
+            after = tracemalloc.take_snapshot().filter_traces(FILTERS)
+            differences = after.compare_to(self.before, 'traceback')
+            self.retained = sum(stat.size_diff for stat in differences)
+            sizes, counts = Counter(), Counter()
+            for stat in differences:
+                key = (location(stat.traceback[-1]),
+                       caller(stat.traceback))
+                sizes[key] += stat.size_diff
+                counts[key] += stat.count_diff
+            self.sites = []
+            for (where, project_frame), size in sizes.most_common(self.top):
+                if size > 0:
+                    self.sites.append({
+                        'site': where, 'caller': project_frame,
+                        'size_kb': round(size / 1024, 1),
+                        'count': counts[where, project_frame]})
+        finally:
+            self.before = None
+            if self.started_here:
+                tracemalloc.stop()
+
+
+def location(frame):
+    filename = frame.filename
+    base = str(settings.BASE_DIR)
+    if filename.startswith(base):
+        filename = os.path.relpath(filename, base)
+    elif 'site-packages' in filename:
+        filename = filename.split('site-packages' + os.sep, 1)[1]
+    return f'{filename}:{frame.lineno}'
+
+
+def caller(traceback):
+    """Ближайший к выделению кадр кода проекта: место выделения часто
+    внутри Django (создание объектов модели), а отвечает за него view."""
+    base = str(settings.BASE_DIR)
+    for frame in reversed(traceback):
+        if (frame.filename.startswith(base)
+                and 'site-packages' not in frame.filename):
+            return location(frame)
+    return None
+
+
+def try_lock():
+    return _lock.acquire(blocking=False)
+
+
+def release():
+    _lock.release()
+
+
+def log_sample(view, path, status, sample):
+    logger.info(json.dumps({
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'view': view,
+        'path': path,
+        'status': status,
+        'peak_kb': round(sample.peak / 1024, 1),
+        'retained_kb': round(sample.retained / 1024, 1),
+        'sites': sample.sites,
+    }, ensure_ascii=False))
+
+
+def summarize(records):
+    """Сводка по view: число замеров, средний и наибольший пик, суммарный
+    и средний остаток и места выделения с наибольшим остатком."""
+    views = {}
+    for record in records:
+        entry = views.setdefault(record.get('view') or record['path'], {
+            'view': record.get('view') or record['path'],
+            'samples': 0, 'peak_kb': 0.0, 'max_peak_kb': 0.0,
+            'retained_kb': 0.0, 'sites': Counter(),
+        })
+        entry['samples'] += 1
+        entry['peak_kb'] += record['peak_kb']
+        entry['max_peak_kb'] = max(entry['max_peak_kb'], record['peak_kb'])
+        entry['retained_kb'] += record['retained_kb']
+        for allocation in record.get('sites') or ():
+            entry['sites'][(allocation['site'],
+                            allocation.get('caller'))] += (
+                allocation['size_kb'])
+    for entry in views.values():
+        entry['average_peak_kb'] = entry['peak_kb'] / entry['samples']
+        entry['average_retained_kb'] = (entry['retained_kb']
+                                        / entry['samples'])
+    return list(views.values())
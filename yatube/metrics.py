@@ -0,0 +1,237 @@
+"""Реестр метрик в формате Prometheus, общий для всех воркеров.
+
+Каждый процесс копит гистограммы и счётчики в памяти и раз в
+METRICS_FLUSH_SECONDS сбрасывает свой снимок в METRICS_DIR/<pid>.json.
+Эндпоинт метрик складывает снимки всех процессов, поэтому gunicorn с
+несколькими воркерами отдаёт общие цифры. Значения кумулятивные:
+снимки завершившихся процессов при сборе переносятся в общий
+dead.json и продолжают входить в сумму, как в multiprocess-режиме
+prometheus_client, а их файлы удаляются.
+
+Без METRICS_DIR (по умолчанию, в том числе в тестах и командах
+manage.py) снимки не пишутся, и эндпоинт отдаёт метрики своего процесса.
+"""
+import atexit
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from glob import glob
+
+from django.conf import settings
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                   5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                 0.25, 1.0)
+
+# Имя -> (тип, описание, границы корзин гистограммы)
+METRICS = {
+    'yatube_request_duration_seconds': (
+        'histogram', 'Время обработки запроса по имени маршрута.',
+        REQUEST_BUCKETS),
+    'yatube_db_query_duration_seconds': (
+        'histogram', 'Время SQL-запроса по отпечатку запроса.',
+        QUERY_BUCKETS),
+    'yatube_db_query_info': (
+        'gauge', 'Текст SQL для отпечатка из '
+        'yatube_db_query_duration_seconds.', None),
+    'yatube_cache_requests_total': (
+        'counter', 'Обращения к кешу: попадания и промахи.', None),
+    'yatube_thumbnail_requests_total': (
+        'counter', 'Запрошенные миниатюры.', None),
+    'yatube_thumbnails_generated_total': (
+        'counter', 'Миниатюры, сгенерированные при запросе.', None),
+}
+
+SQL_INFO_LENGTH = 300
+DEAD_SNAPSHOT = 'dead.json'
+
+
+def _key(labels):
+    return json.dumps(sorted(labels.items()), ensure_ascii=False)
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+        self.flushed = time.monotonic()
+
+    def observe(self, name, labels, value):
+        """Добавляет значение в гистограмму name."""
+        buckets = METRICS[name][2]
+        with self.lock:
+            series = self.values.setdefault(name, {}).setdefault(
+                _key(labels), {'buckets': [0] * (len(buckets) + 1),
+                               'sum': 0.0})
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    series['buckets'][index] += 1
+                    break
+            else:
+                series['buckets'][-1] += 1
+            series['sum'] += value
+        self.maybe_flush()
+
+    def inc(self, name, labels, amount=1):
+        with self.lock:
+            series = self.values.setdefault(name, {})
+            key = _key(labels)
+            series[key] = series.get(key, 0) + amount
+        self.maybe_flush()
+
+    def set(self, name, labels, value):
+        with self.lock:
+            self.values.setdefault(name, {})[_key(labels)] = value
+
+    def maybe_flush(self):
+        if (time.monotonic() - self.flushed
+                >= settings.METRICS_FLUSH_SECONDS):
+            self.flush()
+
+    def flush(self):
+        """Атомарно записывает снимок процесса в METRICS_DIR."""
+        with self.lock:
+            self.flushed = time.monotonic()
+            data = json.dumps(self.values, ensure_ascii=False)
+        directory = settings.METRICS_DIR
+        if directory is None:
+            return
+        os.makedirs(directory, exist_ok=True)
+        _write(os.path.join(directory, f'{os.getpid()}.json'), data)
+
+
+registry = Registry()
+
+
+@atexit.register
+def _flush_on_exit():
+    if registry.values and settings.METRICS_DIR is not None:
+        registry.flush()
+
+
+def _write(path, data):
+    descriptor, temporary = tempfile.mkstemp(
+        dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(descriptor, 'w', encoding='utf-8') as target:
+        target.write(data)
+    os.replace(temporary, path)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@lru_cache(maxsize=1024)
+def query_id(fingerprint):
+    """Короткая метка для отпечатка SQL: сам текст слишком длинный для
+    метки каждой корзины и отдаётся один раз в yatube_db_query_info."""
+    value = hashlib.sha1(fingerprint.encode()).hexdigest()[:12]
+    registry.set('yatube_db_query_info',
+                 {'query': value, 'sql': fingerprint[:SQL_INFO_LENGTH]}, 1)
+    return value
+
+
+def collect():
+    """Сумма снимков всех процессов."""
+    directory = settings.METRICS_DIR
+    if directory is None:
+        with registry.lock:
+            return json.loads(json.dumps(registry.values))
+    prune(directory)
+    return merge(glob(os.path.join(directory, '*.json')))
+
+
+def prune(directory):
+    """Переносит снимки завершившихся процессов в DEAD_SNAPSHOT и
+    удаляет их файлы. Сборы из разных процессов не должны сложить один
+    снимок дважды, поэтому перенос идёт под блокировкой файла."""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, 'prune.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        dead = [
+            path for path in glob(os.path.join(directory, '*.json'))
+            if os.path.basename(path)[:-5].isdigit()
+            and not _alive(int(os.path.basename(path)[:-5]))
+        ]
+        if not dead:
+            return
+        path = os.path.join(directory, DEAD_SNAPSHOT)
+        _write(path, json.dumps(merge([path] + dead), ensure_ascii=False))
+        for snapshot in dead:
+            os.remove(snapshot)
+
+
+def merge(paths):
+    total = {}
+    for path in paths:
+        try:
+            with open(path, encoding='utf-8') as source:
+                snapshot = json.load(source)
+        except (OSError, ValueError):
+            continue
+        for name, series in snapshot.items():
+            merged = total.setdefault(name, {})
+            for key, value in series.items():
+                if isinstance(value, dict):
+                    current = merged.setdefault(
+                        key, {'buckets': [0] * len(value['buckets']),
+                              'sum': 0.0})
+                    current['buckets'] = [
+                        a + b for a, b in zip(current['buckets'],
+                                              value['buckets'])]
+                    current['sum'] += value['sum']
+                elif METRICS.get(name, ('counter',))[0] == 'gauge':
+                    merged[key] = value
+                else:
+                    merged[key] = merged.get(key, 0) + value
+    return total
+
+
+def _labels(pairs, extra=()):
+    pairs = list(pairs) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"')
+         .replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"'
+                          for name, value in escaped) + '}'
+
+
+def render(values):
+    """Текстовый формат экспозиции Prometheus 0.0.4."""
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        series = values.get(name)
+        if not series:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for key, value in sorted(series.items()):
+            pairs = json.loads(key)
+            if kind != 'histogram':
+                lines.append(f'{name}{_labels(pairs)} {value}')
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), value['buckets']):
+                cumulative += count
+                lines.append(f'{name}_bucket'
+                             f'{_labels(pairs, [("le", bound)])} '
+                             f'{cumulative}')
+            lines.append(f'{name}_sum{_labels(pairs)} {value["sum"]}')
+            lines.append(f'{name}_count{_labels(pairs)} {cumulative}')
+    return '\n'.join(lines) + '\n'
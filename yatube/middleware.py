@@ -0,0 +1,324 @@
+import json
+import logging
+import os
+import random
+import time
+from contextlib import ExitStack, contextmanager, nullcontext
+from datetime import datetime
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import capture, memory, template_profiler, timing
+from .metrics import query_id, registry
+from .routers import needs_pin, reset_state
+from .slow_queries import SlowQueryLog
+
+REPLICA_PIN_COOKIE = 'replica_pin'
+
+timing_logger = logging.getLogger('yatube.timing')
+
+
+class ReplicaPinMiddleware:
+    """Read-your-writes для реплики.
+
+    Если запрос записал в модели из REPLICA_APPS, пользователь
+    получает cookie и следующие REPLICA_PIN_SECONDS секунд читает с
+    основной базы, пока реплика не догонит.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reset_state()
+        try:
+            pinned_until = float(request.COOKIES.get(REPLICA_PIN_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+        request.replica_pinned = pinned_until > time.time()
+        response = self.get_response(request)
+        if needs_pin():
+            pin = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(REPLICA_PIN_COOKIE, str(time.time() + pin),
+                                max_age=pin, httponly=True)
+        reset_state()
+        return response
+
+
+class ServerTimingMiddleware:
+    """Время запроса по составляющим: заголовок Server-Timing, строка
+    JSON в логгер yatube.timing с именем маршрута и гистограммы в
+    реестре метрик (yatube.metrics).
+
+    Считает число и время SQL-запросов по всем базам, время рендера
+    шаблонов, попадания и промахи кеша, время view и всего запроса.
+    Заголовок раскрывает любому клиенту число запросов и работу кеша,
+    поэтому отдаётся только с настройкой SERVER_TIMING_HEADER = True; лог
+    пишется всегда. У потокового ответа лог и метрики пишутся, когда
+    тело дочитано (measure_stream).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        timing.install()
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        timings = timing.Timings()
+        request.view_started = None
+        with self.measuring(timings):
+            response = self.get_response(request)
+        view = (time.perf_counter() - request.view_started
+                if request.view_started is not None else 0.0)
+        if getattr(settings, 'SERVER_TIMING_HEADER', False):
+            # У потокового ответа заголовок уходит до тела: в нём только
+            # замеры до возврата из view, полные - в логе и метриках
+            response['Server-Timing'] = self.header(
+                timings, view, time.perf_counter() - started,
+                response.streaming)
+
+        def finish():
+            self.log(request, response, timings, view,
+                     time.perf_counter() - started)
+
+        if response.streaming:
+            measure_stream(response, finish,
+                           lambda: self.measuring(timings))
+        else:
+            finish()
+        return response
+
+    @staticmethod
+    @contextmanager
+    def measuring(timings):
+        timing.start(timings)
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(timings))
+                yield
+        finally:
+            timing.stop()
+
+    @staticmethod
+    def header(timings, view, total, streaming):
+        entries = [
+            f'sql;dur={timings.sql_time * 1000:.1f};'
+            f'desc="{timings.sql_count} queries"',
+            f'tpl;dur={timings.template_time * 1000:.1f}',
+            f'cache;desc="hits={timings.cache_hits} '
+            f'misses={timings.cache_misses}"',
+            f'view;dur={view * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ]
+        if streaming:
+            entries.append('stream;desc="body not included"')
+        return ', '.join(entries)
+
+    @staticmethod
+    def log(request, response, timings, view, total):
+        name = url_name(request)
+        record_metrics(name, request.method, total, timings)
+        timing_logger.info(json.dumps({
+            'url_name': name,
+            'method': request.method,
+            'status': response.status_code,
+            'streamed': response.streaming,
+            'sql_count': timings.sql_count,
+            'sql_ms': round(timings.sql_time * 1000, 2),
+            'template_ms': round(timings.template_time * 1000, 2),
+            'cache_hits': timings.cache_hits,
+            'cache_misses': timings.cache_misses,
+            'view_ms': round(view * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+        }))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.view_started = time.perf_counter()
+
+
+class SlowQueryMiddleware:
+    """Выборочный журнал медленных запросов к БД (yatube.slow_queries)
+    с именем view, которое их выполнило."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.slow_query_logs = [
+            SlowQueryLog(connections[alias], request.path)
+            for alias in connections]
+        with self.logging(request.slow_query_logs):
+            response = self.get_response(request)
+        if response.streaming:
+            measure_stream(response, resume=lambda: self.logging(
+                request.slow_query_logs))
+        return response
+
+    @staticmethod
+    @contextmanager
+    def logging(logs):
+        with ExitStack() as stack:
+            for log in logs:
+                stack.enter_context(log.connection.execute_wrapper(log))
+            yield
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        for log in request.slow_query_logs:
+            log.view = url_name(request)
+
+
+class TemplateProfilerMiddleware:
+    """Профиль рендера шаблонов каждого запроса в формате folded:
+    файл TEMPLATE_PROFILE_DIR/<маршрут>-<время>.folded. Без настройки
+    TEMPLATE_PROFILE_DIR выключается целиком."""
+
+    def __init__(self, get_response):
+        if not settings.TEMPLATE_PROFILE_DIR:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        os.makedirs(settings.TEMPLATE_PROFILE_DIR, exist_ok=True)
+
+    def __call__(self, request):
+        with template_profiler.profiling() as profiler:
+            response = self.get_response(request)
+        if response.streaming:
+            measure_stream(response, lambda: self.save(request, profiler),
+                           lambda: template_profiler.profiling(profiler))
+        else:
+            self.save(request, profiler)
+        return response
+
+    @staticmethod
+    def save(request, profiler):
+        folded = profiler.folded()
+        if folded:
+            name = (url_name(request) or 'unresolved').replace(':', '.')
+            stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+            path = os.path.join(settings.TEMPLATE_PROFILE_DIR,
+                                f'{name}-{stamp}.folded')
+            with open(path, 'w', encoding='utf-8') as target:
+                target.write(folded)
+
+
+class MemorySamplingMiddleware:
+    """Замер памяти (пик и остаток) для доли MEMORY_SAMPLE_RATE
+    запросов, см. yatube.memory. При нулевой доле выключается целиком."""
+
+    def __init__(self, get_response):
+        if not settings.MEMORY_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (random.random() >= settings.MEMORY_SAMPLE_RATE
+                or not memory.try_lock()):
+            return self.get_response(request)
+        with ExitStack() as stack:
+            stack.callback(memory.release)
+            sample = stack.enter_context(memory.Sample())
+            response = self.get_response(request)
+            # Замер потокового ответа заканчивается с концом тела
+            sampling = stack.pop_all()
+
+        def finish():
+            sampling.close()
+            memory.log_sample(url_name(request), request.path,
+                              response.status_code, sample)
+
+        if response.streaming:
+            measure_stream(response, finish)
+        else:
+            finish()
+        return response
+
+
+class RequestCaptureMiddleware:
+    """Запись доли CAPTURE_SAMPLE_RATE запросов для воспроизведения,
+    см. yatube.capture. При нулевой доле выключается целиком."""
+
+    def __init__(self, get_response):
+        if not settings.CAPTURE_SAMPLE_RATE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.CAPTURE_SAMPLE_RATE:
+            return self.get_response(request)
+        started = time.time()
+        response = self.get_response(request)
+        route = url_name(request)
+        if not capture.should_capture(request, route):
+            return response
+
+        def finish():
+            capture.log_request(request, route, started, response,
+                                time.time() - started)
+
+        if response.streaming:
+            measure_stream(response, finish)
+        else:
+            finish()
+        return response
+
+
+class MeasuredStream:
+    """Тело потокового ответа (posts.streaming) читается уже после
+    возврата из middleware, когда её обёртки и счётчики сняты. Каждый
+    кусок читается внутри resume(), который заново их включает, а
+    finish() вызывается один раз - когда тело прочитано или ответ закрыт.
+    """
+
+    def __init__(self, content, finish, resume):
+        self.content = iter(content)
+        self.finish = finish
+        self.resume = resume
+        self.finished = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            with self.resume():
+                return next(self.content)
+        except StopIteration:
+            self.close()
+            raise
+
+    def close(self):
+        if not self.finished:
+            self.finished = True
+            self.finish()
+
+
+def measure_stream(response, finish=lambda: None, resume=nullcontext):
+    response.streaming_content = MeasuredStream(
+        response.streaming_content, finish, resume)
+
+
+def record_metrics(name, method, total, timings):
+    registry.observe('yatube_request_duration_seconds',
+                     {'url_name': name or 'unresolved', 'method': method},
+                     total)
+    for sql, seconds in timings.queries:
+        registry.observe('yatube_db_query_duration_seconds',
+                         {'query': query_id(timing.fingerprint(sql))},
+                         seconds)
+    for result, count in (('hit', timings.cache_hits),
+                          ('miss', timings.cache_misses)):
+        if count:
+            registry.inc('yatube_cache_requests_total', {'result': result},
+                         count)
+
+
+def url_name(request):
+    """Имя маршрута в том виде, в каком его передают в reverse:
+    пространство имён приложения, а не экземпляра."""
+    match = request.resolver_match
+    if match is None:
+        return None
+    return ':'.join(match.app_names + [match.url_name or match.view_name])
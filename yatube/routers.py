@@ -0,0 +1,80 @@
+import threading
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+
+REPLICA = 'replica'
+
+_state = threading.local()
+
+
+def reset_state():
+    _state.use_replica = False
+    _state.wrote = False
+    _state.pin = False
+
+
+def has_written():
+    return getattr(_state, 'wrote', False)
+
+
+def needs_pin():
+    """Писал ли запрос в модели приложений из REPLICA_APPS.
+
+    Служебные записи на обычном чтении - сессия, last_login, хранилище
+    миниатюр sorl - не должны привязывать пользователя к default.
+    """
+    return getattr(_state, 'pin', False)
+
+
+def read_from_replica(view):
+    """Декоратор view: чтения внутри него идут в реплику.
+
+    Не действует, если пользователь недавно писал в БД (см.
+    ReplicaPinMiddleware) - тогда он читает с основной базы и видит
+    свои изменения.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads(request):
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def replica_reads(request):
+    """Чтения внутри блока идут в реплику, как во view с
+    read_from_replica; нужен коду, который читает после возврата из view
+    (потоковый ответ)."""
+    _state.use_replica = not getattr(request, 'replica_pinned', False)
+    try:
+        yield
+    finally:
+        _state.use_replica = False
+
+
+class ReplicaRouter:
+    """Чтения моделей REPLICA_APPS из view с read_from_replica - в
+    реплику, всё остальное и любые чтения после записи в том же запросе -
+    в default."""
+
+    def db_for_read(self, model, **hints):
+        if (getattr(_state, 'use_replica', False) and not has_written()
+                and model._meta.app_label in settings.REPLICA_APPS
+                and REPLICA in settings.DATABASES):
+            return REPLICA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        if model._meta.app_label in settings.REPLICA_APPS:
+            _state.pin = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплика - копия default, схему в неё приносит синхронизация
+        return db != REPLICA
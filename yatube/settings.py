@@ -23,7 +23,7 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SECRET_KEY = '6e(30u#dc$bjqiy4f!8s@o4293y%p66tqu0(y@z%2o8rhtbp5f'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get("DEBUG", "1") == "1"
 
 ALLOWED_HOSTS = [
     "localhost",
@@ -61,13 +61,21 @@ INSTALLED_APPS = [
     'debug_toolbar',
     'sorl.thumbnail',
     'rest_framework.authtoken',
+    'jobs',
     'posts',
     'users',
     'about',
+    'perf',
 ]
 
 MIDDLEWARE = [
+    'yatube.middleware.MemorySamplingMiddleware',
+    'yatube.middleware.ServerTimingMiddleware',
+    'yatube.middleware.RequestCaptureMiddleware',
+    'yatube.middleware.SlowQueryMiddleware',
+    'yatube.middleware.TemplateProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'yatube.middleware.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -100,19 +108,72 @@ TEMPLATES = [
     },
 ]
 
+# Jinja2 для списков записей (yatube.jinja2): движок ставится первым, и
+# главная, группа, профиль и лента подписок берутся из templates/jinja2,
+# а остальные шаблоны - из шаблонов Django
+JINJA2_ENGINE = {
+    'BACKEND': 'django.template.backends.jinja2.Jinja2',
+    'DIRS': [os.path.join(TEMPLATES_DIR, "jinja2")],
+    'APP_DIRS': False,
+    'OPTIONS': {
+        'environment': 'yatube.jinja2.environment',
+        'context_processors': [
+            'django.contrib.auth.context_processors.auth',
+        ],
+    },
+}
+JINJA2_TEMPLATES = os.environ.get("JINJA2_TEMPLATES") == "1"
+if JINJA2_TEMPLATES:
+    TEMPLATES.insert(0, JINJA2_ENGINE)
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# yatube.sqlite - стандартный sqlite3 плюс PRAGMA для конкурентной работы
+# (WAL, synchronous=NORMAL, mmap, busy_timeout) и BEGIN IMMEDIATE, см.
+# yatube/sqlite/base.py. Соединения живут между запросами CONN_MAX_AGE
+# секунд. Замер: manage.py bench_sqlite.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'yatube.sqlite',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
     }
 }
 
+# Реплика для чтения: локально это копия db.sqlite3, которую создаёт и
+# обновляет manage.py sync_replica (и периодическая задача воркера).
+# Пока копии нет, все запросы идут в default.
+REPLICA_PATH = os.path.join(BASE_DIR, 'db.replica.sqlite3')
+# как часто воркер обновляет копию-реплику
+REPLICA_SYNC_SECONDS = 30
+# Файл реплики подменяется целиком, а открытое соединение продолжает
+# читать старый файл, поэтому соединения с репликой не переиспользуются
+REPLICA_CONN_MAX_AGE = 0
+if os.path.exists(REPLICA_PATH):
+    DATABASES['replica'] = {
+        'ENGINE': 'yatube.sqlite',
+        'NAME': REPLICA_PATH,
+        'CONN_MAX_AGE': REPLICA_CONN_MAX_AGE,
+        # файл реплики подменяется целиком, поэтому без WAL-журнала
+        'OPTIONS': {'pragmas': {'journal_mode': 'DELETE'}},
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['yatube.routers.ReplicaRouter']
+# Сколько секунд после записи пользователь читает с основной базы: не
+# меньше наибольшего отставания реплики - интервал синхронизации плюс
+# время жизни соединения - и запас на саму синхронизацию и ожидание
+# воркера
+REPLICA_PIN_SECONDS = REPLICA_SYNC_SECONDS + REPLICA_CONN_MAX_AGE + 10
+# Из реплики читаются только модели этих приложений, и только записи в
+# них привязывают пользователя к default. Сессии, пользователи,
+# contenttypes и хранилище миниатюр всегда читаются с default: иначе
+# только что вошедший пользователь не нашёл бы свою сессию в реплике
+REPLICA_APPS = ('posts',)
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -171,7 +232,135 @@ LOGIN_REDIRECT_URL = "posts:index"
 # LOGOUT_REDIRECT_URL = "index"
 
 
-#  подключаем движок filebased.EmailBackend
-EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
+#  письма ставятся в очередь фоновых задач (manage.py worker), а воркер
+#  отправляет их через движок filebased.EmailBackend. Все письма, включая
+#  сброс пароля, уходят только при запущенном воркере: без него они
+#  копятся в очереди jobs.Job
+EMAIL_BACKEND = "jobs.backends.QueuedEmailBackend"
+JOBS_EMAIL_BACKEND = "django.core.mail.backends.filebased.EmailBackend"
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, "sent_emails")
+# адрес сайта для ссылок в письмах рассылки
+SITE_URL = "http://127.0.0.1:8000"
+
+# Сколько секунд posts:new_posts ждёт новую запись, занимая поток воркера
+LONG_POLL_TIMEOUT = 5
+
+# Сколько секунд живёт закешированная карточка записи (posts.cards): её
+# ключ меняется при правке записи и новых комментариях, а переименование
+# автора или сообщества видно только после истечения срока
+POST_CARD_TIMEOUT = 60 * 60
+
+# Страницы-оболочки (posts.shells): главная, группа и профиль
+# кешируются одни на всех пользователей, а данные пользователя страница
+# получает запросом к posts:viewer. Вместе с 20-секундным фрагментом
+# index_page новая запись видна на главной с задержкой до
+# PAGE_SHELL_TIMEOUT + 20 секунд
+PAGE_SHELLS = os.environ.get("PAGE_SHELLS") == "1"
+PAGE_SHELL_TIMEOUT = 20
+
+# Потоковый рендер главной, группы и профиля (posts.streaming): начало
+# страницы уходит сразу, карточки - порциями по STREAM_CHUNK_SIZE записей
+STREAMING_LISTINGS = os.environ.get("STREAMING_LISTINGS") == "1"
+STREAM_CHUNK_SIZE = 5
+
+# Время запросов по составляющим (yatube.middleware.ServerTimingMiddleware):
+# строка JSON на запрос в LOG_DIR и, если включить, заголовок Server-Timing.
+# Заголовок видят все клиенты, поэтому по умолчанию он выключен
+SERVER_TIMING_HEADER = False
+# Каталог создаётся при первой записи, ротацию журналов делает logrotate
+LOG_DIR = os.path.join(BASE_DIR, "logs")
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        # Строки копятся в памяти и пишутся пачкой: запись в файл на
+        # каждый запрос стоила бы больше, чем сами замеры
+        "timing": {
+            "class": "logging.handlers.MemoryHandler",
+            "capacity": 200,
+            "target": "timing_file",
+        },
+        "timing_file": {
+            "class": "yatube.logs.WatchedFileHandler",
+            "filename": os.path.join(LOG_DIR, "timing.log"),
+            "delay": True,
+        },
+        # Медленных запросов мало, поэтому они пишутся сразу
+        "slow_queries": {
+            "class": "yatube.logs.WatchedFileHandler",
+            "filename": os.path.join(LOG_DIR, "slow_queries.log"),
+            "delay": True,
+        },
+        "capture": {
+            "class": "logging.handlers.MemoryHandler",
+            "capacity": 200,
+            "target": "capture_file",
+        },
+        "capture_file": {
+            "class": "yatube.logs.WatchedFileHandler",
+            "filename": os.path.join(LOG_DIR, "capture.log"),
+            "delay": True,
+        },
+        "memory": {
+            "class": "yatube.logs.WatchedFileHandler",
+            "filename": os.path.join(LOG_DIR, "memory.log"),
+            "delay": True,
+        },
+    },
+    "loggers": {
+        "yatube.timing": {
+            "handlers": ["timing"],
+            "level": "INFO",
+            "propagate": False,
+        },
+        "yatube.capture": {
+            "handlers": ["capture"],
+            "level": "INFO",
+            "propagate": False,
+        },
+        "yatube.memory": {
+            "handlers": ["memory"],
+            "level": "INFO",
+            "propagate": False,
+        },
+        "yatube.slow_queries": {
+            "handlers": ["slow_queries"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+    },
+}
+
+# Журнал медленных запросов (yatube.slow_queries): запросы дольше
+# SLOW_QUERY_MS попадают в него с вероятностью SLOW_QUERY_SAMPLE_RATE
+SLOW_QUERY_MS = 100
+SLOW_QUERY_SAMPLE_RATE = 1.0
+SLOW_QUERY_LOG = LOGGING["handlers"]["slow_queries"]["filename"]
+
+# Метрики Prometheus (yatube.metrics): снимки процессов в METRICS_DIR,
+# эндпоинт /metrics/ для сотрудников или сборщика с METRICS_TOKEN. Без
+# METRICS_DIR снимки не пишутся, и каждый процесс отдаёт только свои
+# метрики: задавайте каталог для сервера с несколькими воркерами
+METRICS_DIR = os.environ.get("METRICS_DIR")
+METRICS_FLUSH_SECONDS = 5
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+THUMBNAIL_BACKEND = "posts.thumbnails.CountingThumbnailBackend"
+
+# Профиль рендера шаблонов по узлам (yatube.template_profiler): если
+# задан каталог, в него пишется файл .folded на каждый запрос
+TEMPLATE_PROFILE_DIR = os.environ.get("TEMPLATE_PROFILE_DIR")
+
+# Замеры памяти запросов через tracemalloc (yatube.memory): доля
+# запросов, глубина стека выделений и число мест в записи журнала
+MEMORY_SAMPLE_RATE = float(os.environ.get("MEMORY_SAMPLE_RATE", 0))
+MEMORY_TRACE_FRAMES = 25
+MEMORY_TOP_SITES = 10
+MEMORY_LOG = LOGGING["handlers"]["memory"]["filename"]
+
+# Запись запросов для replay_requests (yatube.capture): доля запросов,
+# какие маршруты и какие параметры строки запроса записывать
+CAPTURE_SAMPLE_RATE = float(os.environ.get("CAPTURE_SAMPLE_RATE", 0))
+CAPTURE_NAMESPACES = ("posts", "about")
+CAPTURE_QUERY_PARAMS = ("page", "after", "since", "scope")
+CAPTURE_LOG = LOGGING["handlers"]["capture_file"]["filename"]
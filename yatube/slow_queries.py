@@ -0,0 +1,174 @@
+"""Выборочный журнал медленных SQL-запросов.
+
+SlowQueryLog - execute_wrapper, который SlowQueryMiddleware ставит на
+каждое соединение на время запроса. Запрос дольше SLOW_QUERY_MS с
+вероятностью SLOW_QUERY_SAMPLE_RATE пишется строкой JSON в логгер
+yatube.slow_queries: отпечаток SQL, параметры, view, место вызова,
+стек шаблонов и план из EXPLAIN QUERY PLAN. Сводку по журналу строит
+команда slow_queries.
+"""
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from glob import glob
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.template.base import Node
+
+from .timing import fingerprint
+
+logger = logging.getLogger('yatube.slow_queries')
+
+PARAM_LENGTH = 100
+# Параметры запросов к этим таблицам в журнал не пишутся: там хеши
+# паролей и данные сессий
+SENSITIVE_TABLES = re.compile(r'"?(auth_user|django_session)"?\b')
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def template_stack(frame):
+    """Цепочка узлов шаблонов, внутри которых выполняется код frame:
+    от внешнего шаблона к внутреннему, в виде «имя:строка {% тег %}»."""
+    stack = []
+    while frame is not None:
+        node = frame.f_locals.get('self')
+        if (frame.f_code.co_name == 'render_annotated'
+                and isinstance(node, Node)):
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            name = getattr(origin, 'template_name', None) or origin
+            if token is not None:
+                stack.append(f'{name}:{token.lineno} '
+                             f'{token.contents[:60]}')
+        frame = frame.f_back
+    return stack[::-1]
+
+
+def call_site(frame, skip=()):
+    """Ближайший к запросу кадр из кода проекта: не Django, не пакет
+    yatube с его обёртками и не каталоги из skip."""
+    base = str(settings.BASE_DIR)
+    skip = (PACKAGE_DIR,) + tuple(skip)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if (filename.startswith(base) and not filename.startswith(skip)
+                and 'site-packages' not in filename):
+            return (f'{os.path.relpath(filename, base)}:{frame.f_lineno} '
+                    f'in {frame.f_code.co_name}')
+        frame = frame.f_back
+    return '?'
+
+
+class SlowQueryLog:
+    """execute_wrapper одного соединения на время одного запроса."""
+
+    def __init__(self, connection, path):
+        self.connection = connection
+        self.path = path
+        self.view = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        elapsed = time.perf_counter() - started
+        if (elapsed * 1000 >= settings.SLOW_QUERY_MS
+                and random.random() < settings.SLOW_QUERY_SAMPLE_RATE):
+            self.log(sql, params, many, elapsed, sys._getframe(1))
+        return result
+
+    def log(self, sql, params, many, elapsed, frame):
+        logger.warning(json.dumps({
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'view': self.view,
+            'path': self.path,
+            'duration_ms': round(elapsed * 1000, 2),
+            'sample_rate': settings.SLOW_QUERY_SAMPLE_RATE,
+            'fingerprint': fingerprint(sql),
+            'sql': sql,
+            'params': self.format_params(sql, params, many),
+            'call_site': call_site(frame),
+            'templates': template_stack(frame),
+            'plan': None if many else self.explain(sql, params),
+        }, ensure_ascii=False))
+
+    @staticmethod
+    def format_params(sql, params, many):
+        if many or params is None:
+            return None
+        if SENSITIVE_TABLES.search(sql):
+            return '***'
+        if isinstance(params, dict):
+            params = params.values()
+        return [repr(value)[:PARAM_LENGTH] for value in params]
+
+    def explain(self, sql, params):
+        """План запроса SELECT; курсор берётся в обход execute_wrapper,
+        чтобы EXPLAIN не попал ни в этот журнал, ни в счётчики запросов."""
+        if not sql.lstrip().upper().startswith('SELECT'):
+            return None
+        try:
+            prefix = self.connection.ops.explain_query_prefix()
+            cursor = self.connection.create_cursor()
+            try:
+                cursor.execute(f'{prefix} {sql}', params)
+                return [str(row[-1]) for row in cursor.fetchall()]
+            finally:
+                cursor.close()
+        except DatabaseError:
+            return None
+
+
+def read_log(path):
+    """Записи журнала path и его ротированных копий path.1, path.2...
+    от старых к новым."""
+    rotated = [name for name in glob(f'{path}.*')
+               if name[len(path) + 1:].isdigit()]
+    paths = sorted(rotated, key=lambda name: -int(name[len(path) + 1:]))
+    paths.append(path)
+    for name in paths:
+        try:
+            source = open(name, encoding='utf-8')
+        except OSError:
+            continue
+        with source:
+            for line in source:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def summarize(records):
+    """Сводка по отпечаткам SQL. Каждая запись весит 1 / sample_rate,
+    поэтому count и total_ms - оценки полного числа и времени."""
+    offenders = {}
+    for record in records:
+        weight = 1 / (record.get('sample_rate') or 1)
+        entry = offenders.setdefault(record['fingerprint'], {
+            'fingerprint': record['fingerprint'],
+            'count': 0.0, 'total_ms': 0.0, 'max_ms': 0.0,
+            'views': Counter(), 'call_sites': Counter(),
+            'templates': Counter(), 'sql': None, 'params': None,
+            'plan': None,
+        })
+        duration = record['duration_ms']
+        entry['count'] += weight
+        entry['total_ms'] += duration * weight
+        entry['views'][record.get('view') or record.get('path')] += 1
+        entry['call_sites'][record.get('call_site')] += 1
+        if record.get('templates'):
+            entry['templates'][record['templates'][-1]] += 1
+        if duration >= entry['max_ms']:
+            entry['max_ms'] = duration
+            entry['sql'] = record.get('sql')
+            entry['params'] = record.get('params')
+        if record.get('plan'):
+            entry['plan'] = record['plan']
+    return list(offenders.values())
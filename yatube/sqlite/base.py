@@ -0,0 +1,47 @@
+"""SQLite-бэкенд с профилем для продакшена.
+
+Отличается от django.db.backends.sqlite3 тем, что на каждом новом
+соединении выставляет PRAGMA из OPTIONS['pragmas'] (по умолчанию WAL,
+synchronous=NORMAL, mmap и busy_timeout) и открывает транзакции как
+BEGIN IMMEDIATE: пишущая транзакция сразу берёт блокировку записи и
+ждёт её по busy_timeout, а не падает с «database is locked» при попытке
+повысить блокировку чтения посреди транзакции.
+"""
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    'foreign_keys': 'ON',
+}
+
+
+def apply_pragmas(connection, pragmas):
+    cursor = connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+    finally:
+        cursor.close()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        options = self.settings_dict['OPTIONS']
+        params.pop('pragmas', None)
+        params.pop('transaction_mode', None)
+        self.pragmas = {**DEFAULT_PRAGMAS, **options.get('pragmas', {})}
+        self.transaction_mode = options.get('transaction_mode', 'IMMEDIATE')
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        apply_pragmas(connection, self.pragmas)
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}'.strip())
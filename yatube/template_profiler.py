@@ -0,0 +1,139 @@
+"""Профилировщик рендера шаблонов по узлам.
+
+Пока профилировщик активен в потоке, каждый рендер шаблона и каждого
+тега ({% include %}, {% for %}, {% block %}, {% extends %}...) становится
+кадром стека. Для каждого кадра копится полное время (cumulative) и
+собственное время без вложенных кадров (self); текст и переменные
+отдельными кадрами не считаются и входят в self своего тега.
+
+Результат - таблица по узлам и стеки в формате folded (строка
+«кадр;кадр;кадр микросекунды»), который понимают flamegraph.pl и
+speedscope. Включается настройкой TEMPLATE_PROFILE_DIR (файл на каждый
+запрос, см. TemplateProfilerMiddleware) или командой profile_templates.
+"""
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+from django.template.base import Node, Template, TextNode, VariableNode
+
+_state = threading.local()
+_installed = False
+NAME_LENGTH = 80
+
+
+class Profiler:
+    def __init__(self):
+        self.stack = []
+        self.children = []
+        self.self_times = Counter()
+        self.cumulative = Counter()
+        self.calls = Counter()
+
+    def enter(self, name):
+        self.stack.append(name.replace(';', ','))
+        self.children.append(0.0)
+        return time.perf_counter()
+
+    def exit(self, started):
+        elapsed = time.perf_counter() - started
+        path = tuple(self.stack)
+        name = self.stack.pop()
+        self.self_times[path] += elapsed - self.children.pop()
+        self.calls[name] += 1
+        # Рекурсивный кадр (шаблон включает сам себя) считается один раз
+        if name not in self.stack:
+            self.cumulative[name] += elapsed
+        if self.children:
+            self.children[-1] += elapsed
+
+    def folded(self):
+        """Строки формата folded, время в микросекундах."""
+        lines = []
+        for path, seconds in sorted(self.self_times.items()):
+            microseconds = round(seconds * 1_000_000)
+            if microseconds > 0:
+                lines.append(f'{";".join(path)} {microseconds}')
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def table(self):
+        """[(узел, вызовов, cumulative, self)] по убыванию self, в
+        секундах."""
+        own = Counter()
+        for path, seconds in self.self_times.items():
+            own[path[-1]] += seconds
+        return sorted(
+            ((name, self.calls[name], self.cumulative[name], own[name])
+             for name in self.calls),
+            key=lambda row: row[3], reverse=True)
+
+
+def current():
+    return getattr(_state, 'profiler', None)
+
+
+@contextmanager
+def profiling(profiler=None):
+    """Профилирует рендер шаблонов в текущем потоке внутри блока with."""
+    install()
+    profiler = profiler or Profiler()
+    previous = current()
+    _state.profiler = profiler
+    try:
+        yield profiler
+    finally:
+        _state.profiler = previous
+
+
+def template_name(template):
+    return (getattr(template.origin, 'template_name', None)
+            or template.name or '<string>')
+
+
+def node_name(node):
+    origin = getattr(node, 'origin', None)
+    where = getattr(origin, 'template_name', None) or '<string>'
+    contents = ' '.join(node.token.contents.split())
+    return f'{{% {contents} %}} {where}:{node.token.lineno}'[:NAME_LENGTH]
+
+
+def _profiled_render(render):
+    @wraps(render)
+    def wrapper(self, context):
+        profiler = current()
+        if profiler is None:
+            return render(self, context)
+        started = profiler.enter(template_name(self))
+        try:
+            return render(self, context)
+        finally:
+            profiler.exit(started)
+    return wrapper
+
+
+def _profiled_render_annotated(render_annotated):
+    @wraps(render_annotated)
+    def wrapper(self, context):
+        profiler = current()
+        if (profiler is None or isinstance(self, (TextNode, VariableNode))
+                or getattr(self, 'token', None) is None):
+            return render_annotated(self, context)
+        started = profiler.enter(node_name(self))
+        try:
+            return render_annotated(self, context)
+        finally:
+            profiler.exit(started)
+    return wrapper
+
+
+def install():
+    """Один раз оборачивает Template.render и Node.render_annotated."""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    Template.render = _profiled_render(Template.render)
+    Node.render_annotated = _profiled_render_annotated(
+        Node.render_annotated)
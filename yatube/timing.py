@@ -0,0 +1,134 @@
+"""Счётчики времени запроса: SQL, шаблоны, кеш.
+
+Счётчики живут в thread-local и собираются, только пока запрос
+обрабатывается ServerTimingMiddleware; вне запроса (воркер, команды)
+обёртки ничего не делают.
+"""
+import re
+import threading
+import time
+from functools import lru_cache, wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.base import Template
+
+_state = threading.local()
+_installed = False
+_MISSING = object()
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s")
+REPEATED = re.compile(r'\?(?:\s*,\s*\?)+')
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql):
+    """SQL без значений: литералы и плейсхолдеры заменены на ?, списки
+    IN (...) любой длины сведены к одному виду."""
+    return REPEATED.sub('?, ...', LITERALS.sub('?', sql))
+
+
+class Timings:
+    def __init__(self):
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        """execute_wrapper для connection."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.sql_count += 1
+            self.sql_time += elapsed
+            self.queries.append((sql, elapsed))
+
+
+def start(timings=None):
+    """Включает счётчики в текущем потоке; timings продолжает уже
+    начатый замер (тело потокового ответа)."""
+    _state.timings = timings or Timings()
+    return _state.timings
+
+
+def stop():
+    _state.timings = None
+
+
+def current():
+    return getattr(_state, 'timings', None)
+
+
+def _timed_render(render):
+    """Время рендера шаблонов; include внутри шаблона не считается
+    второй раз."""
+    @wraps(render)
+    def wrapper(self, *args, **kwargs):
+        timings = current()
+        if timings is None or timings.template_depth:
+            return render(self, *args, **kwargs)
+        timings.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            timings.template_time += time.perf_counter() - started
+            timings.template_depth -= 1
+    return wrapper
+
+
+def _counted_get(get):
+    @wraps(get)
+    def wrapper(self, key, default=None, version=None):
+        value = get(self, key, _MISSING, version)
+        timings = current()
+        if timings is not None:
+            if value is _MISSING:
+                timings.cache_misses += 1
+            else:
+                timings.cache_hits += 1
+        return default if value is _MISSING else value
+    return wrapper
+
+
+def _counted_get_many(get_many):
+    @wraps(get_many)
+    def wrapper(self, keys, version=None):
+        keys = list(keys)
+        timings = current()
+        # BaseCache.get_many вызывает get по ключу - не считаем дважды
+        _state.timings = None
+        try:
+            found = get_many(self, keys, version)
+        finally:
+            _state.timings = timings
+        if timings is not None:
+            timings.cache_hits += len(found)
+            timings.cache_misses += len(keys) - len(found)
+        return found
+    return wrapper
+
+
+def install():
+    """Один раз оборачивает Template.render (и шаблонов Jinja2, если он
+    установлен) и get/get_many классов настроенных кешей."""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    Template.render = _timed_render(Template.render)
+    try:
+        from django.template.backends import jinja2
+    except ImportError:
+        pass
+    else:
+        jinja2.Template.render = _timed_render(jinja2.Template.render)
+    for backend in {type(caches[alias]) for alias in settings.CACHES}:
+        backend.get = _counted_get(backend.get)
+        backend.get_many = _counted_get_many(backend.get_many)
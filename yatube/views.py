@@ -0,0 +1,28 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from . import metrics as registry_metrics
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def metrics(request):
+    """Метрики всех воркеров в текстовом формате Prometheus.
+
+    Доступны сотрудникам (is_staff) и сборщику с заголовком
+    Authorization: Bearer <METRICS_TOKEN>.
+    """
+    if not (request.user.is_staff or has_metrics_token(request)):
+        return HttpResponseForbidden()
+    registry_metrics.registry.flush()
+    return HttpResponse(
+        registry_metrics.render(registry_metrics.collect()),
+        content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+def has_metrics_token(request):
+    token = settings.METRICS_TOKEN
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(token) and hmac.compare_digest(header, f'Bearer {token}')